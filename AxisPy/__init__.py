@@ -1,4 +1,19 @@
 __all__ = [
-    'camera'
+    'async_camera',
+    'auth',
+    'batch',
+    'cache',
+    'camera',
+    'cassette',
+    'fleet',
+    'inventory',
+    'metrics',
+    'resilience',
+    'restart',
+    'rollout',
+    'simulator',
+    'sweep',
+    'tracing',
+    'upload'
 ]
 version = "1.0.0"
\ No newline at end of file
@@ -0,0 +1,381 @@
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+from json.decoder import JSONDecodeError
+
+import httpx
+
+from AxisPy.batch import parse_parameter_list
+from AxisPy.camera import AxisConfigure, CONFIGURATION_GROUPS
+from AxisPy.cassette import create_cassette_transport
+from AxisPy.resilience import CameraUnavailable, backoff_delay
+from AxisPy.tracing import HttpxPhaseRecorder, trace_public_methods
+from AxisPy.upload import AsyncMultipartFileBody, MultipartFileBody
+
+
+def create_async_client(pool_size=10, max_connections=None, proxy=None, cassette=None):
+    """Create an async HTTP client for talking to Axis cameras
+
+    httpx keeps a separate keep-alive pool per host, so one client can be
+    shared by every AsyncAxisConfigure on an event loop.
+
+    Parameters
+    ----------
+    pool_size: int
+        Max number of idle connections kept alive
+    max_connections: int, optional
+        Max number of open connections across all cameras, unlimited if None
+    proxy: str, optional
+        Proxy URL to send every request through
+    cassette: Cassette, optional
+        record every exchange to this cassette, or answer from it when it replays
+
+    Returns
+    -------
+    httpx.AsyncClient
+        pooled async client
+    """
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=pool_size)
+    if cassette is not None:
+        # A custom transport takes the pool limits and proxy in place of the client
+        transport = httpx.AsyncHTTPTransport(limits=limits, proxy=proxy)
+        return httpx.AsyncClient(transport=create_cassette_transport(cassette, transport))
+    return httpx.AsyncClient(limits=limits, proxy=proxy)
+
+
+def _try_catch(func):
+    @functools.wraps(func)
+    async def inner(self, *args, **kwargs):
+        try:
+            return await func(self, *args, **kwargs)
+        except JSONDecodeError:
+            return None
+        except SyntaxError:
+            # xml.etree.ElementTree.ParseError
+            return []
+        except IndexError:
+            return []
+    return inner
+
+
+class AsyncCameraUnavailable(CameraUnavailable, httpx.TransportError):
+    """CameraUnavailable raised by AsyncAxisConfigure
+
+    Also an httpx.TransportError, so code that handles httpx transport errors
+    handles an open breaker the same way. request is the request that wasn't
+    sent.
+    """
+
+    def __init__(self, message, *, request=None):
+        super().__init__(message)
+        self.request = request
+
+
+@trace_public_methods
+class AsyncAxisConfigure(AxisConfigure):
+    """asyncio version of AxisConfigure
+
+    Every API method is a coroutine with the same arguments and return value
+    as the AxisConfigure method of the same name, except that raw responses
+    are httpx.Response objects. A camera whose breaker is open raises
+    AsyncCameraUnavailable, which is both a CameraUnavailable and an
+    httpx.TransportError.
+
+    Example
+    -------
+    async with AsyncAxisConfigure('192.168.0.90', password='pass') as camera:
+        await camera.set_wdr(True)
+        details = await camera.get_configuration_details()
+    """
+
+    def __init__(self, ip, username='root', password='pass', port=80, debug=False, timeout=0.5, proxies=None,
+                 pool_size=10, client=None, cache_ttl=None, cache_size=128, retries=0, adaptive_timeout=False,
+                 failure_threshold=None, reset_timeout=30, metrics=None, metrics_labels=None, tracer=None,
+                 cassette=None):
+        super().__init__(ip, username=username, password=password, port=port, debug=debug, timeout=timeout,
+                         proxies=proxies, pool_size=pool_size, cache_ttl=cache_ttl, cache_size=cache_size,
+                         retries=retries, adaptive_timeout=adaptive_timeout, failure_threshold=failure_threshold,
+                         reset_timeout=reset_timeout, metrics=metrics, metrics_labels=metrics_labels,
+                         tracer=tracer, cassette=cassette)
+        self.__username = username
+        self.__proxy = proxies.get('http') if proxies else None
+        self.__pool_size = pool_size
+        self.__owns_client = client is None
+        self.__client = client
+        self.__digest_auth = None
+        self.__digest_password = None
+        self.__challenged = False
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncAxisConfigure, closing it has to be awaited")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Close the keep-alive connections to the camera
+
+        A client passed in by the caller is left open since it may be shared
+        with other cameras.
+        """
+
+        if self.__owns_client and self.__client is not None:
+            await self.__client.aclose()
+            self.__client = None
+
+    def __get_client(self):
+        if self.__client is None:
+            self.__client = create_async_client(self.__pool_size, proxy=self.__proxy, cassette=self.cassette)
+        return self.__client
+
+    def __get_digest_auth(self):
+        # httpx.DigestAuth reuses its last challenge, so keep one per camera
+        if self.__digest_auth is None or self.__digest_password != self.password:
+            self.__digest_auth = httpx.DigestAuth(self.__username, self.password)
+            self.__digest_password = self.password
+            self.__challenged = False
+        return self.__digest_auth
+
+    async def _send_request(self, method, endpoint, auth=True, check=True, cache=False, breaker=True, **kwargs):
+        if self._queue_in_batch(endpoint, kwargs):
+            return None
+
+        cache_key = self._cache_key(method, endpoint, auth, kwargs) if cache else None
+        response = self._cache_lookup(cache_key)
+        if response is None:
+            request_kwargs = dict(kwargs)
+            explicit_timeout = 'timeout' in request_kwargs
+            timeout = request_kwargs.pop('timeout') if explicit_timeout else None
+            if isinstance(timeout, tuple):
+                # requests style (connect, read) timeout
+                timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+            if isinstance(request_kwargs.get('data'), str):
+                # httpx wants pre-encoded bodies passed as content
+                request_kwargs['content'] = request_kwargs.pop('data')
+            elif isinstance(request_kwargs.get('data'), MultipartFileBody):
+                request_kwargs['content'] = AsyncMultipartFileBody(request_kwargs.pop('data'))
+
+            digest_auth = self.__get_digest_auth() if auth else None
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        self._before_attempt(breaker)
+                    except CameraUnavailable as e:
+                        raise AsyncCameraUnavailable(str(e), request=httpx.Request(
+                            method, self._format_url(endpoint))) from None
+                    if not explicit_timeout:
+                        # Learned again on every try, a timeout makes the next one longer
+                        timeout = self._request_timeout(endpoint)
+                    started = time.perf_counter()
+                    try:
+                        with self._trace_span(f"{method} {endpoint}", 'http', attempt=attempt) as span:
+                            if span is not None:
+                                request_kwargs['extensions'] = {'trace': HttpxPhaseRecorder()}
+                            response = await self.__get_client().request(method, self._format_url(endpoint),
+                                                                         auth=digest_auth, timeout=timeout,
+                                                                         **request_kwargs)
+                    except httpx.HTTPError as e:
+                        # Every failed exchange counts against the breaker, only transport problems are retried
+                        self._record_attempt(endpoint, kwargs, started, error=e,
+                                             timed_out=isinstance(e, httpx.TimeoutException))
+                        delay = self._after_failure(endpoint, kwargs, timeout,
+                                                    isinstance(e, httpx.TimeoutException), attempt,
+                                                    isinstance(e, httpx.TransportError), breaker)
+                        if delay is None:
+                            raise
+                        await asyncio.sleep(delay)
+                        attempt += 1
+                        continue
+                    except BaseException:
+                        self._abandon_attempt(breaker)
+                        raise
+                    if digest_auth is not None and 'Authorization' in response.request.headers:
+                        self.__challenged = True
+                    self._record_attempt(endpoint, kwargs, started, response=response)
+                    self._after_success(endpoint, None if explicit_timeout else time.perf_counter() - started)
+                    break
+            finally:
+                if not cache:
+                    self._cache_invalidate(endpoint, kwargs)
+            self._cache_store(cache_key, endpoint, kwargs, response)
+
+        if check:
+            return self._checked(response, endpoint, kwargs)
+        else:
+            return response
+
+    @asynccontextmanager
+    async def batch(self, only_if_changed=False):
+        """Gather param.cgi updates and send them as a single request
+
+        Works like AxisConfigure.batch, the set_* calls inside the block still
+        have to be awaited but return None straight away.
+
+        Example
+        -------
+        async with camera.batch() as batch:
+            await camera.set_wdr(True)
+            await camera.set_fps(25)
+        """
+
+        param_batch, outermost = self._start_batch()
+        if not outermost:
+            yield param_batch
+            return
+
+        try:
+            yield param_batch
+        finally:
+            self._finish_batch()
+        if not param_batch:
+            return
+
+        changed = param_batch.params
+        if only_if_changed:
+            current = parse_parameter_list((await self.get_parameter_list(list(changed), cache=False)).text)
+            changed = param_batch.changed_params(current)
+        param_batch.parse_response(await self.update_parameters(changed) if changed else None)
+
+    @asynccontextmanager
+    async def deferred_restart(self, wait=True, deadline=300):
+        """Restart the camera once for every change in the block that needs it
+
+        Works like AxisConfigure.deferred_restart.
+
+        Example
+        -------
+        async with camera.deferred_restart() as restart:
+            await camera.set_capture_mode(1)
+            await camera.restart()
+        """
+
+        pending_restart, outermost = self._start_deferred_restart()
+        if not outermost:
+            yield pending_restart
+            return
+
+        try:
+            yield pending_restart
+        finally:
+            self._finish_deferred_restart()
+        if pending_restart.requested:
+            pending_restart.result = bool(await self.restart(wait=wait, deadline=deadline))
+
+    async def get_parameters(self, groups):
+        return parse_parameter_list((await self.get_parameter_list(groups)).text)
+
+    @_try_catch
+    async def get_serial_and_product(self):
+        response = (await self.get_device_information()).json()
+        # SerialNumber and ProductName
+        SN = response['data']['propertyList']['SerialNumber']
+        PN = response['data']['propertyList']['ProdShortName']
+        return SN, PN
+
+    @_try_catch
+    async def get_illumination_state(self):
+        return (await self.get_light_information()).json()['data']['items'][0]['enabled']
+
+    @_try_catch
+    async def get_sd_card_filesystem(self):
+        return self._parse_sd_card_filesystem((await self.get_disk_list()).text)
+
+    async def set_capture_mode(self, mode, restart=True, wait=False, deadline=300):
+        response = await super().set_capture_mode(mode, restart=False)
+        if restart and not self._defer_restart('capture mode'):
+            await self.restart(wait=wait, deadline=deadline)
+        return response
+
+    async def restart(self, wait=False, deadline=300):
+        if self._defer_restart('restart'):
+            return True
+
+        since = time.time()
+        response = await self._send_request("GET", self._restart_endpoint)
+        if wait and response:
+            return await self.wait_until_ready(deadline, since=since)
+        return response
+
+    async def wait_until_ready(self, deadline=300, since=None, poll_timeout=10, initial_delay=0.5, max_delay=15):
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        attempt = 0
+        while True:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                return False
+            poll = min(poll_timeout, int(remaining))
+            started = loop.time()
+            try:
+                if self._is_system_ready(await self.get_system_ready(timeout=poll, max_wait=remaining), since):
+                    return True
+            except (httpx.HTTPError, CameraUnavailable, ValueError):
+                pass
+            if poll and loop.time() - started >= poll * 0.8:
+                attempt = 0
+                continue
+            await asyncio.sleep(min(backoff_delay(attempt, initial_delay, max_delay), max(end - loop.time(), 0)))
+            attempt += 1
+
+    async def upgrade_firmware(self, firmware_file, progress=None, chunk_size=64 * 1024, use_mmap=False,
+                               timeout=300):
+        fields = {'data': self._firmware_request('upgrade')}
+        with MultipartFileBody(firmware_file, fields, chunk_size=chunk_size, progress=progress,
+                               use_mmap=use_mmap) as body:
+            if self._needs_challenge():
+                await self._send_request('POST', self._firmware_endpoint, check=False,
+                                         json=self._firmware_request('status'))
+            return await self._send_request('POST', self._firmware_endpoint, check=False, data=body,
+                                            timeout=timeout, headers={'Content-Type': body.content_type,
+                                                                      'Content-Length': str(len(body))})
+
+    @_try_catch
+    async def get_dynamic_overlays(self):
+        return (await self.get_overlay_list()).json()['data']['textOverlays']
+
+    @_try_catch
+    async def get_time_zone(self):
+        date_time = (await self.get_date_time()).json()
+        return date_time['data']['timeZone']
+
+    @_try_catch
+    async def get_users(self):
+        return (await self.get_user_groups()).text.split('\r\n')[-2].split('"')[1].split(',')
+
+    async def get_configuration_details(self, concurrent=True, section_timeout=None):
+        sections = (self.__get_configuration_definitions, self.get_illumination_state, self.get_sd_card_filesystem,
+                    self.get_time_zone, self.get_users, self.get_dynamic_overlays, self.get_system_ready)
+        if concurrent:
+            loop = asyncio.get_running_loop()
+            end = None if section_timeout is None else loop.time() + section_timeout
+            first = list()
+            if self._needs_challenge():
+                # Take the digest challenge with one section so the others don't each get a 401
+                first.append(await self.__with_timeout(sections[0](), section_timeout))
+                sections = sections[1:]
+            remaining = None if end is None else max(end - loop.time(), 0)
+            values = first + await asyncio.gather(*(self.__with_timeout(section(), remaining)
+                                                    for section in sections))
+        else:
+            values = [await section() for section in sections]
+        return self._merge_configuration_details(*values)
+
+    def _needs_challenge(self):
+        return not self.__challenged or self.__digest_password != self.password
+
+    async def __get_configuration_definitions(self):
+        return (await self.get_parameter_definitions(CONFIGURATION_GROUPS)).text
+
+    @staticmethod
+    async def __with_timeout(coroutine, timeout):
+        # A section that misses the timeout is left out, like in the threaded version
+        try:
+            return await asyncio.wait_for(coroutine, timeout)
+        except asyncio.TimeoutError:
+            return None
@@ -0,0 +1,54 @@
+import threading
+
+from requests.auth import HTTPDigestAuth
+
+
+class VapixDigestAuth(HTTPDigestAuth):
+    """Digest auth that keeps one nonce per camera and reuses it
+
+    requests' HTTPDigestAuth already answers from a saved nonce, but it keeps
+    that nonce per thread and a new object is normally built for every call,
+    so each call pays a 401 round trip. This keeps a single challenge for all
+    threads using the camera and increments the nonce count on every request.
+    A new challenge is only taken when the camera rejects the nonce (stale or
+    expired), which requests handles with one retry.
+    """
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        self.__lock = threading.Lock()
+        self.__chal = {}
+        self.__last_nonce = ''
+        self.__nonce_count = 0
+
+    @property
+    def has_challenge(self):
+        """A challenge was taken, so requests are answered without a 401 first"""
+
+        return bool(self.__chal)
+
+    def init_per_thread_state(self):
+        if not hasattr(self._thread_local, 'init'):
+            super().init_per_thread_state()
+            self._thread_local.synced_chal = None
+
+    def build_digest_header(self, method, url):
+        with self.__lock:
+            state = self._thread_local
+            # handle_401 swaps in a new challenge dict, anything else is a stale copy
+            if state.chal and state.chal is not state.synced_chal:
+                self.__chal = state.chal
+
+            state.chal = state.synced_chal = self.__chal
+            state.last_nonce = self.__last_nonce
+            state.nonce_count = self.__nonce_count
+            header = super().build_digest_header(method, url)
+            self.__last_nonce = state.last_nonce
+            self.__nonce_count = state.nonce_count
+            return header
+
+    def __call__(self, r):
+        self.init_per_thread_state()
+        with self.__lock:
+            self._thread_local.last_nonce = self.__last_nonce
+        return super().__call__(r)
@@ -1,27 +1,380 @@
+import ipaddress
+import queue
+import socket
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import TYPE_CHECKING
 
-from zeroconf import ServiceBrowser, ServiceListener, Zeroconf
+if TYPE_CHECKING:
+    from zeroconf import Zeroconf
 
 
-def get_only_axis_devices():
-    overall_devices = run_scan()
+class AxisDevice:
+    """A device found on the network
+
+    Attributes
+    ----------
+    name: str
+        mDNS instance name, i.e. 'AXIS M3106-L Mk II - ACCC8E123456'
+    addresses: list
+        every IP address the device advertised
+    properties: dict
+        TXT record of the service
+    serial: str
+        serial number, taken from the TXT record or the end of the name until
+        the device has been identified
+    product: str
+        short product name, i.e. 'M3106-L Mk II', None until identified
+    firmware: str
+        firmware version, None until identified
+    port: int
+        HTTP port the device advertised
+    """
+
+    def __init__(self, name, addresses, properties=None, port=80):
+        self.name = name
+        self.addresses = list(addresses)
+        self.properties = properties or dict()
+        self.port = port
+        self.serial = self.properties.get('macaddress') or self.__serial_from_name(name)
+        self.product = None
+        self.firmware = None
+        self.__best_ip = None
+        self.__failed = set()
+
+    def select_address(self, timeout=1.0, refresh=False):
+        """Race a connection to every advertised address and keep the fastest
+
+        The choice is cached, so later calls return it straight away until
+        refresh is set or address_failed is called.
+
+        Parameters
+        ----------
+        timeout: float
+            seconds to wait for any address to accept a connection
+        refresh: bool
+            race the addresses again even if one was already chosen
+
+        Returns
+        -------
+        str
+            the address that connected first, None if none of them did
+        """
+
+        if self.__best_ip is not None and not refresh:
+            return self.__best_ip
+        candidates = [ip for ip in self.addresses if ip not in self.__failed]
+        if not candidates:
+            # Every address has failed once, give them all another chance
+            self.__failed.clear()
+            candidates = self.addresses
+        self.__best_ip = fastest_address(candidates, self.port, timeout)
+        return self.__best_ip
+
+    def address_failed(self, ip=None):
+        """Forget the chosen address after a connection to it failed
+
+        The next select_address call races the remaining addresses again.
+
+        Parameters
+        ----------
+        ip: str, optional
+            address that failed, the chosen one if not given
+        """
+
+        ip = ip or self.__best_ip
+        if ip is not None:
+            self.__failed.add(ip)
+        if ip == self.__best_ip:
+            self.__best_ip = None
+
+    def identify(self, timeout=2):
+        """Fill in serial, product and firmware from basicdeviceinfo.cgi
+
+        Uses the unauthenticated getAllUnrestrictedProperties call, so no
+        credentials are needed.
+
+        Parameters
+        ----------
+        timeout: float
+            seconds to wait for the device to answer
+
+        Returns
+        -------
+        bool
+            the device answered with its properties
+        """
+
+        # Imported here so discovery alone doesn't pull in requests
+        from AxisPy.camera import AxisConfigure
+
+        # A second try goes to another address if the chosen one stopped answering
+        for _ in range(2):
+            ip = self.ip
+            if ip is None:
+                return False
+            with AxisConfigure(ip, port=self.port, timeout=timeout, pool_size=1) as camera:
+                try:
+                    properties = camera.get_device_information(auth=False).json()['data']['propertyList']
+                except OSError:
+                    self.address_failed(ip)
+                    continue
+                except (ValueError, KeyError, TypeError):
+                    return False
+            self.update_from_properties(properties)
+            return True
+        return False
+
+    def update_from_properties(self, properties):
+        """Fill in serial, product and firmware from basicdeviceinfo.cgi properties
+
+        Parameters
+        ----------
+        properties: dict
+            propertyList of a getAllUnrestrictedProperties reply
+        """
+
+        self.serial = properties.get('SerialNumber', self.serial)
+        self.product = properties.get('ProdShortName')
+        self.firmware = properties.get('Version')
+
+    @classmethod
+    def from_properties(cls, ip, properties):
+        """Build a device from basicdeviceinfo.cgi properties instead of an mDNS record
+
+        The name follows the one Axis devices announce over mDNS.
+
+        Parameters
+        ----------
+        ip: str
+            address the device answered on
+        properties: dict
+            propertyList of a getAllUnrestrictedProperties reply
+
+        Returns
+        -------
+        AxisDevice
+            the device
+        """
+
+        product = properties.get('ProdShortName') or properties.get('ProdNbr') or ''
+        if not product.lower().startswith('axis'):
+            product = f"AXIS {product}".strip()
+        name = f"{product} - {properties['SerialNumber']}" if properties.get('SerialNumber') else product
+        device = cls(name, [ip])
+        device.update_from_properties(properties)
+        return device
+
+    @property
+    def is_axis(self):
+        return 'axis' in self.name.lower()
+
+    @property
+    def ip(self):
+        # The raced address if there is one, otherwise guess from the advertised ones
+        if self.__best_ip is not None:
+            return self.__best_ip
+        return get_local_ip_from_list([ip for ip in self.addresses if ip not in self.__failed])
+
+    def matches(self, name=None, serial=None):
+        """Check the device against a target name and/or serial number
+
+        Parameters
+        ----------
+        name: str, optional
+            text the mDNS name has to contain, case insensitive
+        serial: str, optional
+            serial number the device must have, case insensitive
+
+        Returns
+        -------
+        bool
+            the device matches every target given
+        """
+
+        if name is not None and name.lower() not in self.name.lower():
+            return False
+        if serial is not None and (self.serial or '').lower() != serial.lower():
+            return False
+        return True
+
+    @staticmethod
+    def __serial_from_name(name):
+        # Axis names end in ' - <serial>' unless someone renamed the device
+        tail = name.rsplit(' - ', 1)[-1].strip()
+        if len(tail) == 12 and all(c in '0123456789abcdefABCDEF' for c in tail):
+            return tail.upper()
+        return None
+
+    def __repr__(self):
+        return (f"AxisDevice(name={self.name!r}, addresses={self.addresses!r}, serial={self.serial!r}, "
+                f"product={self.product!r}, firmware={self.firmware!r})")
+
+
+def get_only_axis_devices(deadline=10, idle_timeout=None, count=None, name=None, serial=None):
     # This function only sees bonjour clients that have AXIS in their name
     axis_devices = dict()
-    for name, ip_addresses in overall_devices.items():
-        if 'axis' in name.lower():
-            axis_devices[name] = get_local_ip_from_list(ip_addresses)
+    for device in iter_scan(deadline=deadline, idle_timeout=idle_timeout, count=count, name=name, serial=serial):
+        axis_devices[device.name] = device.ip
     return axis_devices
 
 
-def run_scan():
+def run_scan(deadline=10, idle_timeout=None):
+    overall_devices = dict()
+    for device in iter_scan(deadline=deadline, idle_timeout=idle_timeout, axis_only=False):
+        overall_devices[device.name] = device.addresses
+    return overall_devices
+
+
+def iter_scan(deadline=10, idle_timeout=None, count=None, name=None, serial=None, axis_only=True, identify=False,
+              max_workers=32):
+    """Discover devices, yielding each one as soon as it resolves
+
+    The scan stops at the first of: the deadline passing, no new device for
+    idle_timeout seconds, count devices found, or the device matching name
+    and/or serial being found.
+
+    Parameters
+    ----------
+    deadline: float
+        seconds the scan runs at most
+    idle_timeout: float, optional
+        stop once no new device has shown up for this many seconds
+    count: int, optional
+        stop once this many devices have been yielded
+    name: str, optional
+        stop once a device whose name contains this is found
+    serial: str, optional
+        stop once the device with this serial number is found
+    axis_only: bool
+        only yield devices with AXIS in their name
+    identify: bool
+        ask each device for its serial, product and firmware before yielding it
+    max_workers: int
+        number of services resolved (and identified) at the same time
+
+    Yields
+    ------
+    AxisDevice
+        each device as it is found
+    """
+
+    # zeroconf is slow to import, so only load it once a scan is actually run
+    from zeroconf import ServiceBrowser, Zeroconf
+
+    found = queue.Queue()
+    end = time.monotonic() + deadline
+    yielded = 0
+    seen = set()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
     zeroconf = Zeroconf()
-    listener = MyListener()
+    listener = MyListener(on_device=found.put, executor=executor, identify=identify, axis_only=axis_only)
     browser = ServiceBrowser(zeroconf, "_http._tcp.local.", listener)
     try:
-        time.sleep(10)
+        last_seen = time.monotonic()
+        while True:
+            now = time.monotonic()
+            wait = end - now
+            if idle_timeout is not None:
+                wait = min(wait, last_seen + idle_timeout - now)
+            if wait <= 0:
+                return
+            try:
+                device = found.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+            if device.name in seen:
+                # Updates to a device already found come through here as well
+                continue
+            seen.add(device.name)
+            last_seen = time.monotonic()
+            if axis_only and not device.is_axis:
+                continue
+            yield device
+            yielded += 1
+            if count is not None and yielded >= count:
+                return
+            if (name is not None or serial is not None) and device.matches(name, serial):
+                return
     finally:
+        browser.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
         zeroconf.close()
-    return listener.overall_devices
+
+
+def find_device(name=None, serial=None, deadline=10):
+    """Discover the device with the given name or serial number
+
+    Returns as soon as the device answers instead of waiting out the deadline.
+
+    Returns
+    -------
+    AxisDevice
+        the device, None if it wasn't found before the deadline
+    """
+
+    # Identify devices so the real serial is matched, not just the one in the name
+    for device in iter_scan(deadline=deadline, name=name, serial=serial, identify=serial is not None):
+        if device.matches(name, serial):
+            return device
+    return None
+
+
+def fastest_address(addresses, port=80, timeout=1.0):
+    """Connect to every address at once and return the one that connects first
+
+    Happy eyeballs style, so an address on an unreachable VLAN costs nothing
+    as long as another one answers. Link-local addresses are only tried when
+    the device advertised nothing else.
+
+    Parameters
+    ----------
+    addresses: list
+        IPv4 and/or IPv6 addresses of one device
+    port: int
+        TCP port to connect to
+    timeout: float
+        seconds to wait for any address to accept the connection
+
+    Returns
+    -------
+    str
+        the address with the lowest connect latency, None if none connected
+    """
+
+    candidates = [ip for ip in addresses if not _is_link_local(ip)] or list(addresses)
+    if len(candidates) <= 1:
+        # Nothing to race, the connection is made when the device is used
+        return candidates[0] if candidates else None
+
+    executor = ThreadPoolExecutor(max_workers=len(candidates))
+    try:
+        futures = {executor.submit(_connect, ip, port, timeout): ip for ip in candidates}
+        for future in as_completed(futures, timeout=timeout + 0.1):
+            if future.result():
+                return futures[future]
+    except FutureTimeoutError:
+        pass
+    finally:
+        # Losers finish in the background, at most timeout later
+        executor.shutdown(wait=False)
+    return None
+
+
+def _connect(ip, port, timeout):
+    try:
+        socket.create_connection((ip, port), timeout=timeout).close()
+    except OSError:
+        return False
+    return True
+
+
+def _is_link_local(ip):
+    try:
+        return ipaddress.ip_address(ip.split('%')[0]).is_link_local
+    except ValueError:
+        return False
 
 
 def get_local_ip_from_list(ip_list):
@@ -57,21 +410,86 @@ def get_selected_device(device_list, selected_device):
             return f"[{count}] {name}: {ip_address}"
 
 
-class MyListener(ServiceListener):
+class MyListener:
+    """zeroconf ServiceListener collecting every resolved service
+
+    Doesn't inherit from zeroconf.ServiceListener so importing this module
+    doesn't import zeroconf, the browser only needs the three callbacks.
+
+    Parameters
+    ----------
+    on_device: callable, optional
+        called with an AxisDevice as soon as each service resolves
+    executor: concurrent.futures.Executor, optional
+        resolve services on this executor so a slow device doesn't hold up
+        the others, otherwise they are resolved one at a time in the callback
+    identify: bool
+        call AxisDevice.identify before handing the device on
+    axis_only: bool
+        only identify devices with AXIS in their name
+    on_remove: callable, optional
+        called with the instance name of every service that goes away
+    """
 
-    def __init__(self):
+    def __init__(self, on_device=None, executor=None, identify=False, axis_only=True, on_remove=None):
         self.overall_devices = dict()
+        self.on_device = on_device
+        self.executor = executor
+        self.identify = identify
+        self.axis_only = axis_only
+        self.on_remove = on_remove
 
-    def update_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        print(f"Service {name} updated")
+    def update_service(self, zc: 'Zeroconf', type_: str, name: str) -> None:
+        if self.on_device is None:
+            print(f"Service {name} updated")
+            return
+        # Addresses or TXT records changed, resolve again and report it like a new device
+        self.add_service(zc, type_, name)
 
-    def remove_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        print(f"Service {name} removed")
+    def remove_service(self, zc: 'Zeroconf', type_: str, name: str) -> None:
+        if self.on_remove is None:
+            print(f"Service {name} removed")
+            return
+        name = name.split("._http")[0]
+        self.overall_devices.pop(name, None)
+        self.on_remove(name)
+
+    def add_service(self, zc: 'Zeroconf', type_: str, name: str) -> None:
+        if self.executor is None:
+            self.__resolve(zc, type_, name)
+            return
+        try:
+            self.executor.submit(self.__resolve, zc, type_, name)
+        except RuntimeError:
+            # The scan finished while the browser was still reporting services
+            pass
 
-    def add_service(self, zc: Zeroconf, type_: str, name: str) -> None:
+    def __resolve(self, zc, type_, name):
         info = zc.get_service_info(type_, name)
+        if info is None:
+            # Didn't answer the resolve in time
+            return
         name = name.split("._http")[0]
         self.overall_devices[name] = info.parsed_addresses()
+        if self.on_device is None:
+            return
+
+        device = AxisDevice(name, self.overall_devices[name], self.__decode_properties(info.properties),
+                            port=info.port or 80)
+        if len(device.addresses) > 1 and (device.is_axis or not self.axis_only):
+            device.select_address()
+        if self.identify and (device.is_axis or not self.axis_only):
+            device.identify()
+        if self.on_device is not None:
+            self.on_device(device)
+
+    @staticmethod
+    def __decode_properties(properties):
+        decoded = dict()
+        for key, value in (properties or {}).items():
+            key = key.decode('utf-8', 'replace') if isinstance(key, bytes) else key
+            decoded[key] = value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+        return decoded
 
 
 if __name__ == '__main__':
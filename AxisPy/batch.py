@@ -0,0 +1,136 @@
+import re
+
+
+def parse_parameter_list(text):
+    """Parse the reply of a param.cgi list request
+
+    Parameters
+    ----------
+    text: str
+        body of the reply, one 'root.Group.Name=value' line per parameter
+
+    Returns
+    -------
+    dict
+        parameter name without the 'root.' prefix to its value as a string
+    """
+
+    parameters = dict()
+    for line in text.splitlines():
+        if line.startswith('#') or '=' not in line:
+            continue
+        name, value = line.split('=', 1)
+        parameters[_strip_root(name.strip())] = value.strip()
+    return parameters
+
+
+def _strip_root(name):
+    return name[len('root.'):] if name.startswith('root.') else name
+
+
+class ParamBatch:
+    """Collects param.cgi updates so they can be sent as one request
+
+    Attributes
+    ----------
+    params: dict
+        parameter name to value for every update gathered so far. A later
+        update of the same parameter replaces the earlier one
+    skipped: list
+        parameters that weren't sent because the camera already had the value
+    results: dict
+        parameter name to bool, filled in once the batch has been sent
+    """
+
+    # param.cgi reports failures as lines like "# Error: Error setting 'root.Image.I0.Stream.FPS' to '99'!"
+    __error_param = re.compile(r"'((?:root\.)?[A-Za-z0-9_.]+)'")
+
+    def __init__(self):
+        self.params = dict()
+        self.skipped = list()
+        self.results = dict()
+
+    def __len__(self):
+        return len(self.params)
+
+    def add(self, params):
+        """Queue the parameters of a single param.cgi update
+
+        Can also be used to queue a whole profile of parameters at once.
+
+        Parameters
+        ----------
+        params: dict
+            params of the update request, an 'action' key is ignored
+        """
+
+        for name, value in params.items():
+            if name != 'action' and value is not None:
+                self.params[name] = value
+
+    def changed_params(self, current):
+        """Work out which queued parameters differ from the camera's values
+
+        Parameters that already have the queued value are recorded in skipped.
+
+        Parameters
+        ----------
+        current: dict
+            current values, as returned by parse_parameter_list
+
+        Returns
+        -------
+        dict
+            parameter name to value for the parameters that need sending
+        """
+
+        changed = dict()
+        self.skipped = list()
+        for name, value in self.params.items():
+            current_value = current.get(_strip_root(name))
+            # Compare the way the value goes over the wire, the camera doesn't care about case for on/off/yes/no
+            if current_value is not None and current_value.lower() == str(value).lower():
+                self.skipped.append(name)
+            else:
+                changed[name] = value
+        return changed
+
+    def parse_response(self, response):
+        """Work out which parameters were accepted by the camera
+
+        Skipped parameters always count as accepted.
+
+        Parameters
+        ----------
+        response: requests.Response or httpx.Response
+            response to the combined update, None if nothing was sent
+
+        Returns
+        -------
+        dict
+            parameter name to bool
+        """
+
+        sent = [name for name in self.params if name not in self.skipped]
+        self.results = {name: True for name in self.skipped}
+
+        if response is None or response.status_code >= 400:
+            self.results.update((name, False) for name in sent)
+            return self.results
+
+        text = response.text.strip()
+        if text == 'OK':
+            self.results.update((name, True) for name in sent)
+            return self.results
+
+        failed = set()
+        for line in text.splitlines():
+            if line.startswith('#'):
+                failed.update(_strip_root(name) for name in self.__error_param.findall(line))
+
+        if failed:
+            self.results.update((name, _strip_root(name) not in failed) for name in sent)
+        else:
+            # Nothing we can attribute to a parameter, so none of them can be trusted
+            self.results.update((name, False) for name in sent)
+        return self.results
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Size bounded cache of camera responses that expire after a TTL
+
+    Entries remember the endpoint they were read from and, for param.cgi,
+    the parameter groups they cover, so a write can drop just the entries it
+    makes stale.
+
+    Parameters
+    ----------
+    ttl: float
+        seconds an entry stays valid
+    max_size: int
+        max number of entries, the least recently used one is evicted first
+    """
+
+    def __init__(self, ttl=30, max_size=128):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key):
+        """Get a cached value
+
+        Parameters
+        ----------
+        key: hashable
+            key the value was stored under
+
+        Returns
+        -------
+        object
+            the cached value, None if it is missing or expired
+        """
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            value, expires, endpoint, parameters = entry
+            if expires < time.monotonic():
+                del self.__entries[key]
+                return None
+            self.__entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, endpoint, parameters=None):
+        """Store a value
+
+        Parameters
+        ----------
+        key: hashable
+            key to store the value under
+        value: object
+            value to cache
+        endpoint: str
+            endpoint the value was read from
+        parameters: list, optional
+            param.cgi parameters or groups the value covers, None if it covers
+            the whole endpoint
+        """
+
+        if parameters is not None:
+            parameters = [self.__normalize(name) for name in parameters]
+        with self.__lock:
+            self.__entries[key] = (value, time.monotonic() + self.ttl, endpoint, parameters)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, endpoint, parameters=None):
+        """Drop the entries a write to an endpoint makes stale
+
+        Parameters
+        ----------
+        endpoint: str
+            endpoint that was written to
+        parameters: list, optional
+            param.cgi parameters that were updated, None drops every entry of
+            the endpoint
+        """
+
+        if parameters is not None:
+            parameters = [self.__normalize(name) for name in parameters]
+        with self.__lock:
+            for key, (value, expires, entry_endpoint, entry_parameters) in list(self.__entries.items()):
+                if entry_endpoint != endpoint:
+                    continue
+                if parameters is None or entry_parameters is None or self.__overlaps(parameters, entry_parameters):
+                    del self.__entries[key]
+
+    def clear(self):
+        """Drop every entry"""
+
+        with self.__lock:
+            self.__entries.clear()
+
+    @staticmethod
+    def __normalize(name):
+        name = name.strip().lower()
+        return name[len('root.'):] if name.startswith('root.') else name
+
+    @staticmethod
+    def __overlaps(updated, cached):
+        # A parameter overlaps a group when either one is a prefix of the other
+        for a in updated:
+            for b in cached:
+                if a == b or a.startswith(b + '.') or b.startswith(a + '.'):
+                    return True
+        return False
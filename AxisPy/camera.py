@@ -1,15 +1,103 @@
-from requests.auth import HTTPDigestAuth
-from requests import request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait as wait_futures
+from contextlib import contextmanager, nullcontext
+from AxisPy.auth import VapixDigestAuth
+from AxisPy.batch import ParamBatch, parse_parameter_list
+from AxisPy.cache import ResponseCache
+from AxisPy.cassette import CassetteAdapter
 from AxisPy.check_axis_response import check_response
+from AxisPy.resilience import AdaptiveTimeout, CircuitBreaker, backoff_delay, is_idempotent
+from AxisPy.restart import PendingRestart
+from AxisPy.tracing import TracingHTTPAdapter, run_in_context, trace_public_methods
+from AxisPy.upload import MultipartFileBody
 import requests
-import xml.etree.ElementTree as ET
+import functools
+import json
 from json.decoder import JSONDecodeError
-from xml.etree.ElementTree import ParseError
+from urllib.parse import parse_qs
 import logging
-
+import time
+
+
+# param.cgi groups read by get_configuration_details
+CONFIGURATION_GROUPS = (
+    "ImageSource.I0.DayNight.IrCutFilter,"
+    "ImageSource.I0.Sensor.Brightness,"
+    "ImageSource.I0.Sensor.CaptureMode,"
+    'ImageSource.I0.Sensor.ColorLevel'
+    'ImageSource.I0.Sensor.Contrast'
+    "ImageSource.I0.Sensor.Defog,"
+    "ImageSource.I0.Sensor.DefogEffect," 
+    "ImageSource.I0.Sensor.Exposure,"
+    "ImageSource.I0.Sensor.ExposureValue,"
+    "ImageSource.I0.Sensor.ExposureWindow,"
+    "ImageSource.I0.Sensor.LocalContrast,"
+    "ImageSource.I0.Sensor.Sharpness,"
+    "ImageSource.I0.Sensor.Stabilizer,"
+    "ImageSource.I0.Sensor.StabilizerMargin,"
+    "ImageSource.I0.Sensor.WDR,"
+    "ImageSource.I0.Sensor.WhiteBalance,"
+    "Image.I0.Appearance.Compression,"
+    "Image.I0.Appearance.Resolution,"
+    "Image.I0.MPEG.ZFPSMode,"
+    "Image.I0.MPEG.ZGOPMode,"
+    "Image.I0.MPEG.ZMaxGopLength,"
+    "Image.I0.MPEG.ZStrength,"
+    "Image.I0.RateControl.Mode,"
+    "Image.I0.Stream.FPS,"
+    "PTZ.Limit.L1.MaxZoom,"
+    "PTZ.Limit.L1.MinFocus,"
+    "PTZ.UserAdv.U1.AdjustableZoomSpeedEnabled,"
+    "PTZ.UserAdv.U1.ImageFreeze,"
+    "PTZ.Various.V1.MaxProportionalSpeed,"
+    "PTZ.Various.V1.ProportionalSpeedEnabled,"
+    "PTZ.Various.V1.ReturnToOverview,"
+    "Network.BootProto,"
+    "Network.DNSServer1,"
+    "Network.DNSServer2,"
+    "Network.DefaultRouter,"
+    "Network.IPAddress,"
+    "Network.SubnetMask,"
+    "Time.ObtainFromDHCP,"
+    "Time.SyncSource"
+)
+
+
+def create_session(pool_size=10, cassette=None):
+    """Create a keep-alive HTTP session for talking to Axis cameras
+
+    The same session can be handed to several AxisConfigure objects so they
+    share one connection pool.
+
+    Parameters
+    ----------
+    pool_size: int
+        Max number of connections kept alive per camera
+    cassette: Cassette, optional
+        record every exchange to this cassette, or answer from it when it replays
+
+    Returns
+    -------
+    requests.Session
+        session with a pooled adapter mounted for http and https
+    """
+
+    session = requests.Session()
+    if cassette is not None:
+        adapter = CassetteAdapter(cassette, pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = TracingHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+@trace_public_methods
 class AxisConfigure:
 
-    def __init__(self, ip, username='root', password='pass', port=80, debug=False, timeout=0.5, proxies=None):
+    def __init__(self, ip, username='root', password='pass', port=80, debug=False, timeout=0.5, proxies=None,
+                 pool_size=10, session=None, cache_ttl=None, cache_size=128, retries=0, adaptive_timeout=False,
+                 failure_threshold=None, reset_timeout=30, metrics=None, metrics_labels=None, tracer=None,
+                 cassette=None):
         self.ip = ip
         self.port = port
         self.__username = username
@@ -18,6 +106,27 @@ class AxisConfigure:
         self.__debug = debug
         self.__PROXIES = proxies
 
+        # Reuse one keep-alive session for every call instead of reconnecting each time
+        self.__owns_session = session is None
+        self.__session = session
+        self.__pool_size = pool_size
+        self.__digest_auth = None
+        self.__batch = None
+        self.__pending_restart = None
+        # Opt-in read-through cache, writes drop the entries they make stale
+        self.__cache = ResponseCache(cache_ttl, cache_size) if cache_ttl is not None else None
+        # Opt-in resilience: retries of idempotent calls, timeouts learned per endpoint and a circuit breaker
+        self.retries = retries
+        self.__timeouts = AdaptiveTimeout(timeout) if adaptive_timeout else None
+        self.__breaker = CircuitBreaker(failure_threshold, reset_timeout) if failure_threshold else None
+        # Optional RequestMetrics, usually shared by every camera of a fleet
+        self.metrics = metrics
+        self.metrics_labels = metrics_labels
+        # Optional Tracer, records a span per public method and HTTP attempt
+        self.tracer = tracer
+        # Optional Cassette, records the camera's answers or replays them without a camera
+        self.cassette = cassette
+
         # Axis API Endpoints
         self.__dynam_overlay = 'dynamicoverlay/dynamicoverlay.cgi'
         self.__general = 'param.cgi'
@@ -33,11 +142,42 @@ class AxisConfigure:
         self.__light_control = 'lightcontrol.cgi'
         self.__capture_mode = 'capturemode.cgi'
         self.__system_ready = 'systemready.cgi'
-        self.__restart_cgi = 'restart.cgi'
-        self.__firmware_upgrade = 'firmwareupgrade.cgi'
+        # Protected since the async client sends its own restart and firmware requests
+        self._restart_endpoint = 'restart.cgi'
+        self._firmware_endpoint = 'firmwaremanagement.cgi'
         self.__url = 'http://{}:{}/axis-cgi/{}'
         self.timeout = timeout
 
+        # Cached reads that go stale when an endpoint is written to, by default its own reads
+        self.__invalidates = {
+            self.__sd_card: (self.__sd_card, self.__list_sd),
+            self.__ntp: (self.__ntp, self.__time),
+        }
+        # param.cgi groups that show the settings these endpoints change
+        self.__parameter_groups = {
+            self.__ntp: ('Time',),
+            self.__time: ('Time',),
+            self.__zipstream: ('Image',),
+        }
+        self.__clears_cache = (self._restart_endpoint, self.__capture_mode, self._firmware_endpoint)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the keep-alive connections to the camera
+
+        A session passed in by the caller is left open since it may be shared
+        with other cameras.
+        """
+
+        if self.__owns_session and self.__session is not None:
+            self.__session.close()
+            self.__session = None
+
     def __debug(self, message):
         if self.__debug:
             print("[DEBUG]:\t\t" + message)
@@ -50,31 +190,379 @@ class AxisConfigure:
             self.__debug(func.__name__ + "\tWas NOT Successful")
     
     def __try_catch(func):
+        @functools.wraps(func)
         def inner(self, *args, **kwargs):
             try:
                 return func(self, *args, **kwargs)
             except JSONDecodeError:
                 return None
-            except ParseError:
+            except SyntaxError:
+                # xml.etree.ElementTree.ParseError, caught by its base so ElementTree is only imported when needed
                 return []
             except IndexError:
                 return []
         return inner
 
-    def __send_request(self, method, endpoint, auth=True, check=True, **kwargs):
-        formatted_url = self.__url.format(self.ip, self.port, endpoint)
-        digest_auth = None
-        
-        if auth:
-            digest_auth = HTTPDigestAuth(self.__username, self.password)
+    def __get_digest_auth(self):
+        # Keep the digest state between calls so the nonce is reused, only rebuilding it when the password changes
+        if self.__digest_auth is None or self.__digest_auth.password != self.password:
+            self.__digest_auth = VapixDigestAuth(self.__username, self.password)
+        return self.__digest_auth
+
+    def __get_session(self):
+        if self.__session is None:
+            self.__session = create_session(self.__pool_size, cassette=self.cassette)
+        return self.__session
+
+    def _send_request(self, method, endpoint, auth=True, check=True, cache=False, breaker=True, **kwargs):
+        if self._queue_in_batch(endpoint, kwargs):
+            return None
+
+        cache_key = self._cache_key(method, endpoint, auth, kwargs) if cache else None
+        response = self._cache_lookup(cache_key)
+        if response is None:
+            formatted_url = self._format_url(endpoint)
+            explicit_timeout = 'timeout' in kwargs
+            timeout = kwargs.pop('timeout') if explicit_timeout else None
+            digest_auth = None
+
+            if auth:
+                digest_auth = self.__get_digest_auth()
+
+            try:
+                attempt = 0
+                while True:
+                    self._before_attempt(breaker)
+                    if not explicit_timeout:
+                        # Learned again on every try, a timeout makes the next one longer
+                        timeout = self._request_timeout(endpoint)
+                    started = time.perf_counter()
+                    try:
+                        with self._trace_span(f"{method} {endpoint}", 'http', attempt=attempt):
+                            response = self.__get_session().request(method, formatted_url, auth=digest_auth,
+                                                                    timeout=timeout, proxies=self.__PROXIES,
+                                                                    **kwargs)
+                    except requests.RequestException as e:
+                        # Every failed exchange counts against the breaker, only connection problems are retried
+                        self._record_attempt(endpoint, kwargs, started, error=e,
+                                             timed_out=isinstance(e, requests.Timeout))
+                        delay = self._after_failure(endpoint, kwargs, timeout, isinstance(e, requests.Timeout),
+                                                    attempt, isinstance(e, (requests.ConnectionError,
+                                                                            requests.Timeout)), breaker)
+                        if delay is None:
+                            raise
+                        time.sleep(delay)
+                        attempt += 1
+                        continue
+                    except BaseException:
+                        self._abandon_attempt(breaker)
+                        raise
+                    self._record_attempt(endpoint, kwargs, started, response=response)
+                    self._after_success(endpoint, None if explicit_timeout else time.perf_counter() - started)
+                    break
+            finally:
+                if not cache:
+                    self._cache_invalidate(endpoint, kwargs)
+            self._cache_store(cache_key, endpoint, kwargs, response)
 
-        response = request(method, formatted_url, auth=digest_auth, timeout=self.timeout, proxies=self.__PROXIES,
-                           **kwargs)
         if check:
-            return check_response(response)
+            return self._checked(response, endpoint, kwargs)
         else:
             return response
 
+    def _trace_span(self, name, category, **args):
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(name, category, **args)
+
+    def _checked(self, response, endpoint, kwargs):
+        with self._trace_span('check_response', 'parse'):
+            result = check_response(response, endpoint, self._api_method(kwargs))
+        if not result and self.metrics is not None:
+            self.metrics.record_validation_failure(self.__metrics_camera(), endpoint, self.__metrics_method(kwargs),
+                                                   self.metrics_labels)
+        return result
+
+    def _record_attempt(self, endpoint, kwargs, started, response=None, error=None, timed_out=False):
+        if self.metrics is None:
+            return
+        seconds = time.perf_counter() - started
+        status = None
+        bytes_sent = bytes_received = auth_challenges = 0
+        if response is not None:
+            # Digest round trips show up in the history, their bodies were sent too
+            for exchange in (*response.history, response):
+                bytes_sent += int(exchange.request.headers.get('Content-Length') or 0)
+                auth_challenges += exchange is not response and exchange.status_code == 401
+            bytes_received = len(response.content)
+            status = response.status_code
+        self.metrics.record(self.__metrics_camera(), endpoint, self.__metrics_method(kwargs), seconds, status=status,
+                            bytes_sent=bytes_sent, bytes_received=bytes_received, auth_challenges=auth_challenges,
+                            error=type(error).__name__ if error is not None else None, timed_out=timed_out,
+                            labels=self.metrics_labels)
+
+    def __metrics_camera(self):
+        return self.ip if self.port == 80 else f"{self.ip}:{self.port}"
+
+    def __metrics_method(self, kwargs):
+        # JSON API method, otherwise the param.cgi style action
+        api_method = self._api_method(kwargs)
+        if api_method is not None:
+            return api_method
+        for values in (kwargs.get('json'), kwargs.get('params'), kwargs.get('data')):
+            if isinstance(values, dict) and 'action' in values:
+                return values['action']
+            if isinstance(values, str) and 'action=' in values:
+                return parse_qs(values).get('action', [None])[0]
+        return None
+
+    def _request_timeout(self, endpoint):
+        if self.__timeouts is None:
+            return self.timeout
+        self.__timeouts.default = self.timeout
+        return self.__timeouts.timeout(endpoint)
+
+    def _before_attempt(self, breaker=True):
+        # breaker is False for calls that have to reach a camera the breaker gave up on, like readiness polls
+        if self.__breaker is not None and breaker:
+            self.__breaker.before_call(self.ip)
+
+    def _after_success(self, endpoint, elapsed):
+        # elapsed is None for calls with their own timeout, like long polls and uploads
+        if self.__breaker is not None:
+            self.__breaker.record_success()
+        if self.__timeouts is not None and elapsed is not None:
+            self.__timeouts.record(endpoint, elapsed)
+
+    def _after_failure(self, endpoint, kwargs, timeout, timed_out, attempt, retryable=True, breaker=True):
+        # Returns how long to wait before trying again, None if the error should be raised
+        if self.__breaker is not None and breaker:
+            self.__breaker.record_failure()
+        if self.__timeouts is not None and timed_out and isinstance(timeout, (int, float)):
+            self.__timeouts.record_timeout(endpoint, timeout)
+        if not retryable or attempt >= self.retries or not is_idempotent(endpoint, kwargs):
+            return None
+        if self.__breaker is not None and self.__breaker.is_open:
+            return None
+        return backoff_delay(attempt)
+
+    def _abandon_attempt(self, breaker=True):
+        # The attempt ended without an answer either way (cancelled, or a local error), so a half-open
+        # breaker lets the next call try the camera instead of waiting on this one forever
+        if self.__breaker is not None and breaker:
+            self.__breaker.cancel_trial()
+
+    @staticmethod
+    def _api_method(kwargs):
+        body = kwargs.get('json')
+        return body.get('method') if isinstance(body, dict) else None
+
+    def clear_cache(self):
+        """Drop every cached response"""
+
+        if self.__cache is not None:
+            self.__cache.clear()
+
+    def _cache_key(self, method, endpoint, auth, kwargs):
+        if self.__cache is None:
+            return None
+        return method, endpoint, auth, json.dumps(kwargs, sort_keys=True, default=str)
+
+    def _cache_lookup(self, cache_key):
+        if cache_key is None:
+            return None
+        return self.__cache.get(cache_key)
+
+    def _cache_store(self, cache_key, endpoint, kwargs, response):
+        if cache_key is not None and response.status_code < 400:
+            self.__cache.put(cache_key, response, endpoint, self.__request_parameters(kwargs, 'group'))
+
+    def _cache_invalidate(self, endpoint, kwargs):
+        if self.__cache is None:
+            return
+        if endpoint in self.__clears_cache:
+            # Restarts and capture mode changes can change anything
+            self.__cache.clear()
+        elif endpoint == self.__general:
+            updated = self.__request_parameters(kwargs, 'update')
+            if updated:
+                self.__cache.invalidate(endpoint, updated)
+        else:
+            for stale in self.__invalidates.get(endpoint, (endpoint,)):
+                self.__cache.invalidate(stale)
+            if endpoint in self.__parameter_groups:
+                self.__cache.invalidate(self.__general, self.__parameter_groups[endpoint])
+
+    @staticmethod
+    def __request_parameters(kwargs, kind):
+        # param.cgi parameter names of an update, or the groups of a list, from either params or form data
+        for values in (kwargs.get('params'), kwargs.get('data')):
+            if isinstance(values, str):
+                values = {key: value[0] for key, value in parse_qs(values).items()}
+            if not isinstance(values, dict):
+                continue
+            if kind == 'group' and 'group' in values:
+                return values['group'].split(',')
+            if kind == 'update' and values.get('action') == 'update':
+                return [name for name in values if name != 'action']
+        return None
+
+    def _format_url(self, endpoint):
+        # IPv6 addresses need brackets in a URL
+        host = f"[{self.ip}]" if ':' in self.ip else self.ip
+        return self.__url.format(host, self.port, endpoint)
+
+    def _queue_in_batch(self, endpoint, kwargs):
+        # param.cgi updates made inside batch() are held back until the batch is sent
+        params = kwargs.get('params')
+        if self.__batch is None or endpoint != self.__general or not isinstance(params, dict):
+            return False
+        if params.get('action') != 'update':
+            return False
+        self.__batch.add(params)
+        return True
+
+    def _start_batch(self):
+        # Nested batches join the outer one, only the outermost sends
+        if self.__batch is not None:
+            return self.__batch, False
+        self.__batch = ParamBatch()
+        return self.__batch, True
+
+    def _finish_batch(self):
+        param_batch, self.__batch = self.__batch, None
+        return param_batch
+
+    @property
+    def restart_pending(self):
+        return self.__pending_restart is not None and self.__pending_restart.pending
+
+    def _defer_restart(self, reason):
+        # Inside deferred_restart() a restart is only recorded, the block restarts once at the end
+        if self.__pending_restart is None:
+            return False
+        self.__pending_restart.add(reason)
+        return True
+
+    def _start_deferred_restart(self):
+        if self.__pending_restart is not None:
+            return self.__pending_restart, False
+        self.__pending_restart = PendingRestart()
+        return self.__pending_restart, True
+
+    def _finish_deferred_restart(self):
+        pending_restart, self.__pending_restart = self.__pending_restart, None
+        return pending_restart
+
+    @contextmanager
+    def deferred_restart(self, wait=True, deadline=300):
+        """Restart the camera once for every change in the block that needs it
+
+        restart() and set_capture_mode() inside the block only mark a restart
+        as pending. When the block exits the camera is restarted a single
+        time and, if wait is set, waited for once. Nothing is restarted if the
+        block raises, the returned PendingRestart then stays pending.
+
+        Parameters
+        ----------
+        wait: bool
+            Wait for the camera to be back up after the restart
+        deadline: float
+            Seconds to wait for the camera at most
+
+        Example
+        -------
+        with camera.deferred_restart() as restart:
+            camera.set_capture_mode(1)
+            with camera.batch():
+                camera.set_wdr(True)
+            camera.restart()
+        restart.requested  # ['capture mode', 'restart']
+        restart.result  # True once the camera is back
+
+        Returns
+        -------
+        PendingRestart
+            the pending restart, its result is filled in once the block exits
+        """
+
+        pending_restart, outermost = self._start_deferred_restart()
+        if not outermost:
+            yield pending_restart
+            return
+
+        try:
+            yield pending_restart
+        finally:
+            self._finish_deferred_restart()
+        if pending_restart.requested:
+            pending_restart.result = bool(self.restart(wait=wait, deadline=deadline))
+
+    @contextmanager
+    def batch(self, only_if_changed=False):
+        """Gather param.cgi updates and send them as a single request
+
+        Every set_* call that updates param.cgi inside the block is queued and
+        returns None. The queued parameters are sent together when the block
+        exits. Nothing is sent if the block raises.
+
+        Parameters
+        ----------
+        only_if_changed: bool
+            Read the current values of the queued parameters in one list call first
+            and only send the ones that differ. The rest are listed in batch.skipped
+
+        Example
+        -------
+        with camera.batch(only_if_changed=True) as batch:
+            camera.set_wdr(True)
+            camera.set_fps(25)
+            batch.add({'Image.I0.Appearance.Compression': 30})
+        batch.results  # {'ImageSource.I0.Sensor.WDR': True, 'Image.I0.Stream.FPS': True, ...}
+        batch.skipped  # ['ImageSource.I0.Sensor.WDR']
+
+        Returns
+        -------
+        ParamBatch
+            the batch, its results are filled in once the block exits
+        """
+
+        param_batch, outermost = self._start_batch()
+        if not outermost:
+            yield param_batch
+            return
+
+        try:
+            yield param_batch
+        finally:
+            self._finish_batch()
+        if not param_batch:
+            return
+
+        changed = param_batch.params
+        if only_if_changed:
+            # Always read fresh values, a stale cached value could hide a needed write
+            current = parse_parameter_list(self.get_parameter_list(list(changed), cache=False).text)
+            changed = param_batch.changed_params(current)
+        param_batch.parse_response(self.update_parameters(changed) if changed else None)
+
+    def update_parameters(self, parameters):
+        """Update several param.cgi parameters in one request
+
+        Parameters
+        ----------
+        parameters: dict
+            parameter name to new value, i.e. {'Image.I0.Stream.FPS': 25}
+
+        Returns
+        -------
+        requests.Response
+            the response the camera gave from the API call
+        """
+
+        data = {'action': 'update', **parameters}
+        return self._send_request("POST", self.__general, check=False, data=data)
+
     def get_device_information(self, auth=True):
         """Gets Axis camera devices information
 
@@ -88,8 +576,8 @@ class AxisConfigure:
             'apiVersion': '1.2',
             'method': 'getAllUnrestrictedProperties'
         }
-        return self.__send_request(
-            "POST", self.__device_info, check=False, auth=auth, json=params)
+        return self._send_request(
+            "POST", self.__device_info, check=False, auth=auth, cache=True, json=params)
 
     @__try_catch
     def get_serial_and_product(self):
@@ -129,7 +617,7 @@ class AxisConfigure:
 
         params = {'action': 'update', 'Network.BootProto': 'none', 'Network.Resolver.ObtainFromDHCP': 'no', 'Network.IPAddress': new_ip,
                   'Network.DefaultRouter': gateway, 'Network.DNSServer1': dnsserver_1, 'Network.DNSServer2': dnsserver_2}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_sd_card_ext4(self):
         """Set Inserted SD Card to EXT4 file type
@@ -142,7 +630,7 @@ class AxisConfigure:
 
         params = {'schemaversion': 1,
                   'diskid': 'SD_DISK', 'filesystem': 'ext4'}
-        return self.__send_request("GET", self.__sd_card, params=params)
+        return self._send_request("GET", self.__sd_card, params=params)
 
     def add_user(self, user, pwd, group='users', auth=True):
         """Add user to Axis camera
@@ -162,7 +650,7 @@ class AxisConfigure:
 
         params = {'action': 'add', 'user': user, 'pwd': pwd, 'grp': group,
                   'strict_pwd': 1, 'sgrp': 'viewer:operator:admin:ptz'}
-        return self.__send_request("GET", self.__users, params=params, auth=auth)
+        return self._send_request("GET", self.__users, params=params, auth=auth)
 
     def set_ntp_server(self, ntp_server1, ntp_server2=None):
         """Set NTP server
@@ -180,7 +668,7 @@ class AxisConfigure:
 
         params = {"apiVersion": "1.1", "method": "setNTPClientConfiguration", "params": {
             "enabled": True, "serversSource": "static", "staticServers": [ntp_server1, ntp_server2]}}
-        return self.__send_request("POST", self.__ntp, json=params)
+        return self._send_request("POST", self.__ntp, json=params)
 
     def set_ntp_dhcp_mode(self, dhcp):
         """Set NTP DHCP mode
@@ -198,7 +686,7 @@ class AxisConfigure:
 
         stringState = "on" if dhcp else 'off'
         params = {'action': 'update', 'Time.ObtainFromDHCP': stringState}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_zoom_limit(self, limit):
         """Set the zoom limit for camera
@@ -217,7 +705,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'PTZ.Limit.L1.MaxZoom': limit}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_wdr(self, state):
         """Set WDR option to on or off
@@ -235,7 +723,7 @@ class AxisConfigure:
 
         stringState = "on" if state else 'off'
         params = {'action': 'update', 'ImageSource.I0.Sensor.WDR': stringState}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_ir_cut_filter(self, state):
         """Set IR cut filter to on or off
@@ -255,7 +743,7 @@ class AxisConfigure:
         # yes=on, no=off, auto=auto
         params = {'action': 'update',
                   'ImageSource.I0.DayNight.IrCutFilter': stringState}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_zipstream(self, strength=30):
         """Set Zipstream to low, medium, or high, higher, or extreme
@@ -272,7 +760,7 @@ class AxisConfigure:
         """
 
         params = {'strength': strength}
-        return self.__send_request("GET", self.__zipstream, params=params)
+        return self._send_request("GET", self.__zipstream, params=params)
 
     def set_time_to_home(self, seconds):
         """Set time to home of ptz
@@ -290,7 +778,7 @@ class AxisConfigure:
 
         params = {'action': 'update',
                   'PTZ.Various.V1.ReturnToOverview': seconds}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def create_dynamic_overlay(self, text):
         """Create a dynamic overlay on the video
@@ -310,7 +798,7 @@ class AxisConfigure:
 
         params = {"apiVersion": "1.0", "method": "addText",
                   "params": {"camera": 1, "text": text}}
-        return self.__send_request("POST", self.__dynam_overlay, json=params)
+        return self._send_request("POST", self.__dynam_overlay, json=params)
     
     def change_dynamic_overlay_outline(self, identity, outline_color):
         """Change a dynamic overlay's outline color
@@ -330,7 +818,7 @@ class AxisConfigure:
         """
         
         params = {'apiVersion': '1.0', 'method': 'setText', 'params': {'identity': identity, 'textOLColor': outline_color}}
-        return self.__send_request("POST", self.__dynam_overlay, json=params)
+        return self._send_request("POST", self.__dynam_overlay, json=params)
 
     def set_illumination_on(self, on=True):
         """Set illumination to on
@@ -351,7 +839,20 @@ class AxisConfigure:
 
         params = {'apiVersion': '1.0', 'method': method,
                   'params': {'lightID': 'led0'}}
-        return self.__send_request("POST", self.__light_control, json=params)
+        return self._send_request("POST", self.__light_control, json=params)
+
+    def get_light_information(self):
+        """Get information about the camera's lights
+
+        Returns
+        -------
+            requests.Response
+                Data returned from API call
+        """
+
+        params = {'apiVersion': '1.0',
+                  'method': 'getLightInformation', 'params': {}}
+        return self._send_request("POST", self.__light_control, check=False, cache=True, json=params)
 
     @__try_catch
     def get_illumination_state(self):
@@ -363,9 +864,19 @@ class AxisConfigure:
                 API call was successfull
         """
 
-        params = {'apiVersion': '1.0',
-                  'method': 'getLightInformation', 'params': {}}
-        return self.__send_request("POST", self.__light_control, check=False, json=params).json()['data']['items'][0]['enabled']
+        return self.get_light_information().json()['data']['items'][0]['enabled']
+
+    def get_disk_list(self):
+        """Get the storage disks of the camera
+
+        Returns
+        -------
+            requests.Response
+                Data returned from API call
+        """
+
+        params = {'diskid': 'all'}
+        return self._send_request("GET", self.__list_sd, check=False, cache=True, params=params)
 
     @__try_catch
     def get_sd_card_filesystem(self):
@@ -377,10 +888,13 @@ class AxisConfigure:
                 Filesystem type
         """
 
-        params = {'diskid': 'all'}
-        response = self.__send_request(
-            "GET", self.__list_sd, check=False, params=params)
-        xmlFile = ET.fromstring(response.text)
+        return self._parse_sd_card_filesystem(self.get_disk_list().text)
+
+    @__try_catch
+    def _parse_sd_card_filesystem(self, response_text):
+        import xml.etree.ElementTree as ET
+
+        xmlFile = ET.fromstring(response_text)
         for tag in xmlFile.iter('disk'):
             if tag.attrib['diskid'] == 'SD_DISK':
                 if tag.attrib['filesystem'] != 'vfat':
@@ -404,15 +918,22 @@ class AxisConfigure:
 
         params = {'action': 'update',
                   'ImageSource.I0.Sensor.Brightness': brightnessLevel}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
-    def set_capture_mode(self, mode):
+    def set_capture_mode(self, mode, restart=True, wait=False, deadline=300):
         """Set capture mode. Restarts the device upon completion
 
         Parameters
         ----------
         mode: int
             1 = 1080p 1920x1080 (16:9) @ 50/60 fps (no WDR), 0 = 1080p 1920x1080 (16:9) @ 25/30 fps
+        restart: bool
+            Restart the device so the new mode takes effect, inside
+            deferred_restart() the restart is left to the end of the block
+        wait: bool
+            Wait for the device to be back up after the restart
+        deadline: float
+            Seconds to wait for the device at most
 
         Returns
         -------
@@ -422,34 +943,125 @@ class AxisConfigure:
 
         params = {'apiVersion': '1.0',
                   'method': 'setCaptureMode', 'channel': 0, 'captureModeId': mode}
-        response = self.__send_request("POST", self.__capture_mode, json=params)
-        self.restart()
+        response = self._send_request("POST", self.__capture_mode, json=params)
+        if restart and not self._defer_restart('capture mode'):
+            self.restart(wait=wait, deadline=deadline)
         return response
 
-    def get_system_ready(self, check=False):
+    def get_system_ready(self, check=False, timeout=10, max_wait=None):
         """Get if the system is ready 
 
+        Isn't held back by the circuit breaker and doesn't count against it,
+        a camera that is rebooting fails these polls until it is back.
+
+        Parameters
+        ----------
+        timeout: int
+            Seconds the camera holds the request waiting for the system to
+            become ready before it answers
+        max_wait: float, optional
+            Seconds the request may take at most, connecting included. By
+            default timeout plus the connection timeout
+
         Returns
         -------
             requests.Response
                 Data returned from API call
         """
 
-        params = {'apiVersion': '1.0', 'method': 'systemready', 'params': {'timeout': 10}}
-        return self.__send_request("POST", self.__system_ready, auth=False, check=check, json=params)
-    
+        params = {'apiVersion': '1.0', 'method': 'systemready', 'params': {'timeout': timeout}}
+        # Long poll, so the read timeout has to outlast the camera's own timeout
+        connect_timeout, read_timeout = self.timeout, timeout + self.timeout
+        if max_wait is not None:
+            connect_timeout, read_timeout = min(connect_timeout, max_wait), min(read_timeout, max_wait)
+        return self._send_request("POST", self.__system_ready, auth=False, check=check, breaker=False, json=params,
+                                  timeout=(connect_timeout, read_timeout))
+
+    def wait_until_ready(self, deadline=300, since=None, poll_timeout=10, initial_delay=0.5, max_delay=15):
+        """Wait for the camera to report it is ready, i.e. after a restart
+
+        Each poll is a systemready.cgi long poll, so a camera that is up but
+        still starting answers the moment it is ready. A camera that doesn't
+        answer at all is polled again after an exponential backoff with full
+        jitter, so a fleet restarted at once isn't polled in lockstep.
+
+        Parameters
+        ----------
+        deadline: float
+            Seconds to wait at most
+        since: float, optional
+            time.time() of the restart. Only count the camera as ready once
+            its uptime shows it booted after this, otherwise a camera that
+            hasn't gone down yet would count as ready
+        poll_timeout: int
+            Seconds each long poll may be held by the camera
+        initial_delay: float
+            Backoff before the first retry of a camera that didn't answer
+        max_delay: float
+            Longest backoff between retries
+
+        Returns
+        -------
+        bool
+            The camera was ready before the deadline
+        """
+
+        end = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            # Under a second left, the camera answers straight away and the request stops at the deadline
+            poll = min(poll_timeout, int(remaining))
+            started = time.monotonic()
+            try:
+                if self._is_system_ready(self.get_system_ready(timeout=poll, max_wait=remaining), since):
+                    return True
+            except (requests.RequestException, ValueError):
+                pass
+            if poll and time.monotonic() - started >= poll * 0.8:
+                # The camera held the long poll, so it has already done the waiting for us
+                attempt = 0
+                continue
+            time.sleep(min(backoff_delay(attempt, initial_delay, max_delay), max(end - time.monotonic(), 0)))
+            attempt += 1
+
+    @staticmethod
+    def _is_system_ready(response, since=None):
+        # A proxy or a web server still starting can answer with any JSON, that isn't ready either
+        body = response.json()
+        data = body.get('data') if isinstance(body, dict) else None
+        if not isinstance(data, dict) or data.get('systemready') != 'yes':
+            return False
+        if since is None or data.get('uptime') is None:
+            return True
+        # A second of slack for the time the request took
+        return time.time() - float(data['uptime']) >= since - 1
+
+    def get_overlay_list(self):
+        """Get the list of dynamic overlays
+
+        Returns
+        -------
+        requests.Response
+            Response from API call
+        """
+
+        params = {'apiVersion': '1.0', 'method': 'list', 'params': {'camera': 1}}
+        return self._send_request('POST', self.__dynam_overlay, json=params, check=False, cache=True)
+
     @__try_catch
     def get_dynamic_overlays(self):
         """Get all dynamic overlays
 
         Returns
         -------
-        requests.Response
-            Response from API call
+        list
+            Text overlays on the camera
         """
         
-        params = {'apiVersion': '1.0', 'method': 'list', 'params': {'camera': 1}}
-        return self.__send_request('POST', self.__dynam_overlay, json=params, check=False).json()['data']['textOverlays']
+        return self.get_overlay_list().json()['data']['textOverlays']
 
     def remove_dynamic_overlay(self, identity):
 
@@ -462,18 +1074,34 @@ class AxisConfigure:
         }
 
         # TODO: add check function in check_axis_response
-        return self.__send_request('POST', self.__dynam_overlay, json=params, check=False)
+        return self._send_request('POST', self.__dynam_overlay, json=params, check=False)
     
-    def restart(self):
+    def restart(self, wait=False, deadline=300):
         """Restart device
 
+        Inside deferred_restart() the restart is only marked as pending.
+
+        Parameters
+        ----------
+        wait: bool
+            Wait for the device to be back up before returning
+        deadline: float
+            Seconds to wait for the device at most
+
         Returns
         -------
         bool
-            API call was successful
+            API call was successful, and the device came back if waited for
         """
-        
-        return self.__send_request("GET", self.__restart_cgi)
+
+        if self._defer_restart('restart'):
+            return True
+
+        since = time.time()
+        response = self._send_request("GET", self._restart_endpoint)
+        if wait and response:
+            return self.wait_until_ready(deadline, since=since)
+        return response
     
     def set_defog(self, on):
         """Set defog option
@@ -490,7 +1118,7 @@ class AxisConfigure:
         """
         
         params = {'action': 'update', 'ImageSource.IO.Sensor.Defog': on}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
     
     def set_defog_strength(self, strength):
         """Set defog strength
@@ -507,7 +1135,7 @@ class AxisConfigure:
         """
         
         params = {'action': 'update', 'ImageSource.IO.Sensor.DefogEffect': strength}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
     
     def set_exposure_mode(self, mode):
         """Set exposure mode
@@ -525,7 +1153,7 @@ class AxisConfigure:
         
         exposure_list = ['auto', 'hold', 'flickerfree50', 'flickerfree60', 'flickerreduced50', 'flickerreduced60']
         params = {'action': 'update', 'ImageSource.IO.Sensor.Exposure': exposure_list[mode]}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
     
     def set_exposure_level(self, amount):
         """Set exposure level amount
@@ -542,7 +1170,7 @@ class AxisConfigure:
         """
         
         params = {'action': 'update', 'ImageSource.IO.Sensor.ExposureValue': amount}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
     
     def set_exposure_zone(self, zone):
         """Set exposure zone
@@ -560,7 +1188,7 @@ class AxisConfigure:
         
         zone_list = ['auto', 'center', 'upper', 'lower', 'left', 'right', 'spot', 'custom']
         params = {'action': 'update', 'ImageSource.IO.Sensor.ExposureWindow': zone_list[zone]}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_local_contrast(self, contrast_value):
         """Set local contrast
@@ -577,7 +1205,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'ImageSource.IO.Sensor.LocalContrast': contrast_value}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_sharpness(self, sharpness_value):
         """Set sharpness for camera video
@@ -594,7 +1222,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'ImageSource.IO.Sensor.Sharpness': sharpness_value}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_eis(self, state):
         """Set Electronic Image Stabilization (EIS)
@@ -612,7 +1240,7 @@ class AxisConfigure:
 
         stringState = "on" if state else 'off'
         params = {'action': 'update', 'ImageSource.IO.Sensor.Stabilizer': stringState}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_stabilizer_margin(self, margin):
         """Set Stabilizer Margin for EIS
@@ -629,7 +1257,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'ImageSource.IO.Sensor.StabilizerMargin': margin}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
 
     def set_white_balance(self, mode):
@@ -649,7 +1277,7 @@ class AxisConfigure:
 
         mode_list = ['auto', 'auto_outdoor', 'hold', 'manual', 'fixed_outdoor1', 'fixed_outdoor2', 'fixed_indoor', 'fixed_flour1', 'fixed_flour2']
         params = {'action': 'update', 'ImageSource.IO.Sensor.WhiteBalance': mode_list[mode]}
-        return self.__send_request('GET', self.__general, params=params)
+        return self._send_request('GET', self.__general, params=params)
 
     def set_compression(self, value):
         """Set compression
@@ -666,7 +1294,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'Image.IO.Appearance.Compression': value}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_resolution(self, value):
         """Set resolution
@@ -684,7 +1312,7 @@ class AxisConfigure:
 
         resolution_list = ['1920x1080', '1280x720', '800x450', '480x270', '320x180']
         params = {'action': 'update', 'Image.IO.Appearance.Resolution': resolution_list[value]}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_zipstream_gop_mode_fixed(self, on=True):
         """Set the zipstream GOP mode to fixed
@@ -702,7 +1330,7 @@ class AxisConfigure:
 
         stringOnParameter = 'fixed' if on else 'dynamic'
         params = {'action': 'update', 'Image.IO.MPEG.ZGOPMode': stringOnParameter}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_zipstream_fps_mode_fixed(self, on=True):
         """Set the zipstream FPS mode to fixed
@@ -720,7 +1348,7 @@ class AxisConfigure:
 
         stringOnParameter = 'fixed' if on else 'dynamic'
         params = {'action': 'update', 'Image.IO.MPEG.ZFPSMode': stringOnParameter}
-        return self.__send_request('GET', self.__general, params=params)
+        return self._send_request('GET', self.__general, params=params)
 
     def set_max_gop_length(self, length):
         """Set max GOP length for Dynamic GOP
@@ -737,7 +1365,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'Image.IO.MPEG.ZMaxGopLength': length}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_bitrate_control(self, mode):
         """Set bitrate cotrol
@@ -755,7 +1383,7 @@ class AxisConfigure:
 
         mode_list = ['vbr', 'mbr', 'adr', 'cbr']
         params = {'action': 'update', 'root.Image.IO.RateControl.Mode': mode_list[mode]}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_fps(self, fps):
         """Set Frames Per Second
@@ -772,7 +1400,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'Image.I0.Stream.FPS': fps}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_near_focus_limit(self, limit):
         """Set near focus limit
@@ -790,7 +1418,7 @@ class AxisConfigure:
 
         limit_list = [1, 2381, 4762, 5714, 6428]
         params = {'action': 'update', 'PTZ.Limit.L1.MinFocus': limit_list[limit]}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_adjustable_zoom_speed_on(self, on=True):
         """Set Adjustable zoom speed to on
@@ -808,7 +1436,7 @@ class AxisConfigure:
 
         stringOnParameter = 'true' if on else 'false'
         params = {'action': 'update', 'PTZ.UserAdv.U1.AdjustableZoomSpeedEnabled': on}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_image_freeze_on(self, on=True):
         """Set Freeze image on PTZ to on
@@ -826,7 +1454,7 @@ class AxisConfigure:
 
         stringOnParameter = 'on' if on else 'off'
         params = {'action': 'update', 'PTZ.UserAdv.U1.ImageFreeze': stringOnParameter}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_proportional_speed(self, speed):
         """Set max proportional speed
@@ -843,7 +1471,7 @@ class AxisConfigure:
         """
 
         params = {'action': 'update', 'PTZ.Various.V1.MaxProportionalSpeed': speed}
-        return self.__send_request("GET", self.__general, params=params)
+        return self._send_request("GET", self.__general, params=params)
 
     def set_proportional_speed_on(self, on=True):
         """Set proportional speed on
@@ -861,7 +1489,7 @@ class AxisConfigure:
 
         stringOnParameter = 'true' if on else 'false'
         params = {'action': 'update', 'PTZ.Various.V1.ProportionalSpeedEnabled': stringOnParameter}
-        return self.__send_request('GET', self.__general, params=params)
+        return self._send_request('GET', self.__general, params=params)
 
     def get_date_time(self):
         """Get date, time, and timezone
@@ -873,7 +1501,7 @@ class AxisConfigure:
         """
 
         params = {"apiVersion": '1.0', 'method': 'getAll'}
-        return self.__send_request('POST', self.__time, json=params, check=False)
+        return self._send_request('POST', self.__time, json=params, check=False, cache=True)
 
     @__try_catch
     def get_time_zone(self):
@@ -903,7 +1531,19 @@ class AxisConfigure:
         """
 
         params = {'apiVersion': '1.0', 'method': 'setTimeZone', 'params': {'timeZone': time_zone}}
-        return self.__send_request('POST', self.__time, json=params)
+        return self._send_request('POST', self.__time, json=params)
+
+    def get_user_groups(self):
+        """Get camera user groups
+
+        Returns
+        -------
+        requests.Response
+            API response
+        """
+
+        params = {'action': 'get'}
+        return self._send_request("POST", self.__users, json=params, check=False, cache=True)
 
     @__try_catch
     def get_users(self):
@@ -915,93 +1555,191 @@ class AxisConfigure:
             List of all the usernames on the camera
         """
 
-        params = {'action': 'get'}
-        return self.__send_request("POST", self.__users, json=params, check=False).text.split('\r\n')[-2].split('"')[1].split(',')
+        return self.get_user_groups().text.split('\r\n')[-2].split('"')[1].split(',')
 
         
 
-    def get_configuration_details(self):
-        default_configs = (
-            "ImageSource.I0.DayNight.IrCutFilter,"
-            "ImageSource.I0.Sensor.Brightness,"
-            "ImageSource.I0.Sensor.CaptureMode,"
-            'ImageSource.I0.Sensor.ColorLevel'
-            'ImageSource.I0.Sensor.Contrast'
-            "ImageSource.I0.Sensor.Defog,"
-            "ImageSource.I0.Sensor.DefogEffect," 
-            "ImageSource.I0.Sensor.Exposure,"
-            "ImageSource.I0.Sensor.ExposureValue,"
-            "ImageSource.I0.Sensor.ExposureWindow,"
-            "ImageSource.I0.Sensor.LocalContrast,"
-            "ImageSource.I0.Sensor.Sharpness,"
-            "ImageSource.I0.Sensor.Stabilizer,"
-            "ImageSource.I0.Sensor.StabilizerMargin,"
-            "ImageSource.I0.Sensor.WDR,"
-            "ImageSource.I0.Sensor.WhiteBalance,"
-            "Image.I0.Appearance.Compression,"
-            "Image.I0.Appearance.Resolution,"
-            "Image.I0.MPEG.ZFPSMode,"
-            "Image.I0.MPEG.ZGOPMode,"
-            "Image.I0.MPEG.ZMaxGopLength,"
-            "Image.I0.MPEG.ZStrength,"
-            "Image.I0.RateControl.Mode,"
-            "Image.I0.Stream.FPS,"
-            "PTZ.Limit.L1.MaxZoom,"
-            "PTZ.Limit.L1.MinFocus,"
-            "PTZ.UserAdv.U1.AdjustableZoomSpeedEnabled,"
-            "PTZ.UserAdv.U1.ImageFreeze,"
-            "PTZ.Various.V1.MaxProportionalSpeed,"
-            "PTZ.Various.V1.ProportionalSpeedEnabled,"
-            "PTZ.Various.V1.ReturnToOverview,"
-            "Network.BootProto,"
-            "Network.DNSServer1,"
-            "Network.DNSServer2,"
-            "Network.DefaultRouter,"
-            "Network.IPAddress,"
-            "Network.SubnetMask,"
-            "Time.ObtainFromDHCP,"
-            "Time.SyncSource"
-        )
-
-        overall_params = 'action=listdefinitions&listformat=xmlschema&responseformat=rfc&responsecharset=utf8&group=' + default_configs
-        overall_response = self.__send_request("POST", self.__general, check=False, data=overall_params)
-        all_configurations = self.__parse_response_text_to_xml(overall_response.text)
-            
+    def get_parameter_list(self, groups, cache=True):
+        """Get the current values of param.cgi parameters
+
+        Parameters
+        ----------
+        groups: list
+            Parameters or parameter groups to list, i.e. ['Image.I0.Stream.FPS', 'Time']
+        cache: bool
+            Allow the answer to come from the response cache when it's turned on
+
+        Returns
+        -------
+        requests.Response
+            API response, one 'root.Group.Name=value' line per parameter
+        """
+
+        params = {'action': 'list', 'group': ','.join(groups)}
+        return self._send_request("GET", self.__general, check=False, cache=cache, params=params)
+
+    def get_parameters(self, groups):
+        """Get the current values of param.cgi parameters
+
+        Parameters
+        ----------
+        groups: list
+            Parameters or parameter groups to list, i.e. ['Image.I0.Stream.FPS', 'Time']
+
+        Returns
+        -------
+        dict
+            parameter name without the 'root.' prefix to its value
+        """
+
+        return parse_parameter_list(self.get_parameter_list(groups).text)
+
+    def get_parameter_definitions(self, groups):
+        """Get the definitions and current values of param.cgi parameters
+
+        Parameters
+        ----------
+        groups: str
+            Comma separated parameter groups, i.e. "Image.I0.Stream.FPS,Time.SyncSource"
+
+        Returns
+        -------
+        requests.Response
+            API response, an xml schema of the parameters
+        """
+
+        params = 'action=listdefinitions&listformat=xmlschema&responseformat=rfc&responsecharset=utf8&group=' + groups
+        return self._send_request("POST", self.__general, check=False, cache=True, data=params)
+
+    def get_configuration_details(self, concurrent=True, section_timeout=None):
+        """Get the current configuration of the camera
+
+        Parameters
+        ----------
+        concurrent: bool
+            Read the seven independent sections at the same time instead of one after another
+        section_timeout: float, optional
+            Seconds to wait for the sections when reading concurrently. A section that
+            isn't back in time is left out of the result
+
+        Returns
+        -------
+        list
+            dicts with the name and value of each setting
+        """
+
+        sections = (self.__get_configuration_definitions, self.get_illumination_state, self.get_sd_card_filesystem,
+                    self.get_time_zone, self.get_users, self.get_dynamic_overlays, self.get_system_ready)
+        if concurrent:
+            values = self.__run_concurrently(sections, section_timeout, first_alone=self._needs_challenge())
+        else:
+            values = [section() for section in sections]
+        return self._merge_configuration_details(*values)
+
+    def _needs_challenge(self):
+        # Concurrent authenticated calls on a fresh camera would each get a 401, the first one should take the
+        # digest challenge on its own so the others reuse its nonce
+        digest_auth = self.__digest_auth
+        return digest_auth is None or digest_auth.password != self.password or not digest_auth.has_challenge
+
+    def __get_configuration_definitions(self):
+        return self.get_parameter_definitions(CONFIGURATION_GROUPS).text
+
+    def __run_concurrently(self, funcs, timeout=None, first_alone=False):
+        # Returns the result of each func in order, None for any that missed the timeout. With first_alone the
+        # others only start once the first one is done
+        executor = ThreadPoolExecutor(max_workers=len(funcs))
+        try:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            # Sections run on other threads, keep them under the caller's span
+            futures = [executor.submit(run_in_context(funcs[0]))]
+            if first_alone:
+                wait_futures(futures, timeout=timeout)
+            futures += [executor.submit(run_in_context(func)) for func in funcs[1:]]
+            results = list()
+            for future in futures:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    results.append(future.result(timeout=remaining))
+                except FutureTimeoutError:
+                    results.append(None)
+            return results
+        finally:
+            # Don't hold the caller up on sections that timed out
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _merge_configuration_details(self, definitions_text, light_value, sd_value, time_zone, users,
+                                     dynamic_overlays, system_ready):
+        all_configurations = list()
+        if definitions_text is not None:
+            all_configurations = self._parse_parameter_definitions(definitions_text)
+
         # Get Illumination
-        light_value = self.get_illumination_state()
         if light_value:
             all_configurations.append({'name': 'Light', 'value': light_value})
         # Get SD Card
-        sd_value = self.get_sd_card_filesystem()
         if sd_value:
             all_configurations.append({'name': 'SD', 'value': sd_value})
         # Get Time Zone
-        time_zone = self.get_time_zone()
         if time_zone:
             all_configurations.append({'name': 'timeZone', 'value': time_zone})
         # Get valorence user
-        users = self.get_users()
-        if 'valorence' in users:
+        if users and 'valorence' in users:
             all_configurations.append({'name': 'AddValorence', 'value': 'valorence'})
         # Get Dynamic Overlays
-        dynamic_overlays = self.get_dynamic_overlays()
         all_configurations.append({'name': 'DynamicOverlay', 'value': dynamic_overlays})
         # Get Default User
-        all_configurations.append({'name': 'defaultUser', 'value': self.get_system_ready().json()['data']['needsetup']})
+        if system_ready is not None:
+            all_configurations.append({'name': 'defaultUser', 'value': system_ready.json()['data']['needsetup']})
         return all_configurations
 
     @__try_catch
-    def __parse_response_text_to_xml(self, response_text):
+    def _parse_parameter_definitions(self, response_text):
+        import xml.etree.ElementTree as ET
+
         parameterList = list()
         xmlFile = ET.fromstring(response_text)
         for parameter in xmlFile.iter("{http://www.axis.com/ParameterDefinitionsSchema}parameter"):
             parameterList.append(parameter.attrib)
         return parameterList
 
-    def upgrade_firmware(self, firmware_file):
+    def upgrade_firmware(self, firmware_file, progress=None, chunk_size=64 * 1024, use_mmap=False, timeout=300):
+        """Upload a firmware image and start the upgrade
 
-        params = {'file': open(firmware_file, 'rb'),
-                  'method': 'upgrade'}
-        data = {'method': 'upgrade'}
+        The image is streamed from disk a chunk at a time, so memory use stays
+        the same whatever the size of the image.
+
+        Parameters
+        ----------
+        firmware_file: str, os.PathLike, mmap.mmap or bytes-like
+            path of the .bin image, or a buffer already holding it
+        progress: callable, optional
+            called as progress(bytes_sent, total_bytes, bytes_per_second)
+            while the image is uploaded
+        chunk_size: int
+            bytes read from the image at a time
+        use_mmap: bool
+            memory-map the image instead of reading it
+        timeout: float
+            seconds the upload may take to connect and to get an answer, the
+            camera timeout is far too short for an upload
+
+        Returns
+        -------
+        requests.Response
+            reply of firmwaremanagement.cgi
+        """
 
-        return self.__send_request('POST', self.__firmware_upgrade, check=False, files=params, json=data)
+        fields = {'data': self._firmware_request('upgrade')}
+        with MultipartFileBody(firmware_file, fields, chunk_size=chunk_size, progress=progress,
+                               use_mmap=use_mmap) as body:
+            if self._needs_challenge():
+                # Get the digest challenge with a tiny request, otherwise the image is sent twice
+                self._send_request('POST', self._firmware_endpoint, check=False,
+                                   json=self._firmware_request('status'))
+            return self._send_request('POST', self._firmware_endpoint, check=False, data=body, timeout=timeout,
+                                      headers={'Content-Type': body.content_type, 'Content-Length': str(len(body))})
+
+    @staticmethod
+    def _firmware_request(method):
+        return {'apiVersion': '1.0', 'context': 'AxisPy', 'method': method}
@@ -0,0 +1,306 @@
+import base64
+import gzip
+import hashlib
+import io
+import json
+import threading
+import time
+
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+from AxisPy.tracing import TracingHTTPAdapter
+
+# Request bodies past this size are kept as a fingerprint only, a firmware image doesn't belong in a cassette
+_BODY_KEPT = 64 * 1024
+
+# Request headers worth keeping, credentials and nonces stay out of the file
+_REQUEST_HEADERS = ('Content-Type',)
+
+
+class CassetteMiss(LookupError):
+    """A replayed request has no recorded exchange left to answer it"""
+
+
+class Cassette:
+    """Recorded camera exchanges, for replaying a workflow without the camera
+
+    Recording keeps the request, the response and how long the camera took
+    for every HTTP exchange, 401 challenges included. Replaying answers each
+    request with the next unused exchange for the same method and URL,
+    preferring one with the same body and the same use of credentials, so a
+    replay is deterministic and needs no network at all.
+
+    Parameters
+    ----------
+    path: str
+        cassette file, gzip compressed when it ends in '.gz'
+    mode: str
+        'record' to capture exchanges with a camera, 'replay' to answer from
+        the file
+    pace: bool
+        replay at the recorded pace, waiting as long as the camera took for
+        every answer. Full speed otherwise
+
+    Example
+    -------
+    with Cassette('config.cassette.gz', mode='record') as cassette:
+        AxisConfigure('192.168.0.90', cassette=cassette).get_configuration_details()
+
+    camera = AxisConfigure('192.168.0.90', cassette=Cassette('config.cassette.gz'))
+    camera.get_configuration_details()
+    """
+
+    def __init__(self, path, mode='replay', pace=False):
+        if mode not in ('record', 'replay'):
+            raise ValueError("mode must be 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.pace = pace
+        self.exchanges = list()
+        self.__lock = threading.Lock()
+        self.__unused = dict()
+        if mode == 'replay':
+            self.exchanges = self.__load()
+            for exchange in self.exchanges:
+                self.__unused.setdefault((exchange['method'], exchange['url']), list()).append(exchange)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
+
+    @property
+    def remaining(self):
+        """Number of recorded exchanges not replayed yet"""
+
+        with self.__lock:
+            return sum(len(exchanges) for exchanges in self.__unused.values())
+
+    def record(self, method, url, headers, body, status, response_headers, content, elapsed):
+        """Add one exchange while recording
+
+        Parameters
+        ----------
+        method: str
+            HTTP method
+        url: str
+            full URL of the request
+        headers: dict
+            request headers, only Content-Type and whether credentials were
+            sent are kept
+        body: bytes or str, optional
+            request body, None for a streamed body
+        status: int
+            HTTP status of the response
+        response_headers: dict
+            response headers
+        content: bytes
+            response body
+        elapsed: float
+            seconds until the response was read
+        """
+
+        exchange = {'method': method, 'url': url,
+                    'headers': {name: headers[name] for name in _REQUEST_HEADERS if name in headers},
+                    'authorized': 'Authorization' in headers,
+                    'body': _fingerprint(body, headers), 'status': status,
+                    'response_headers': dict(response_headers), 'content': _encode(content),
+                    'elapsed': round(elapsed, 6)}
+        with self.__lock:
+            self.exchanges.append(exchange)
+
+    def play(self, method, url, headers, body):
+        """Take the recorded exchange that answers a request
+
+        Parameters
+        ----------
+        method: str
+            HTTP method
+        url: str
+            full URL of the request
+        headers: dict
+            request headers
+        body: bytes or str, optional
+            request body, None for a streamed body
+
+        Returns
+        -------
+        dict
+            status, response_headers, content (bytes) and elapsed
+
+        Raises
+        ------
+        CassetteMiss
+            nothing recorded is left for the method and URL
+        """
+
+        fingerprint = _fingerprint(body, headers)
+        authorized = 'Authorization' in headers
+        with self.__lock:
+            candidates = self.__unused.get((method, url))
+            if not candidates:
+                raise CassetteMiss(f"No recorded exchange left for {method} {url}")
+            # Bodies can differ between runs (multipart boundaries), fall back to the order they were sent in
+            chosen = (next((exchange for exchange in candidates
+                            if exchange['body'] == fingerprint and exchange['authorized'] == authorized), None)
+                      or next((exchange for exchange in candidates if exchange['body'] == fingerprint), None)
+                      or candidates[0])
+            candidates.remove(chosen)
+        return {'status': chosen['status'], 'response_headers': chosen['response_headers'],
+                'content': _decode(chosen['content']), 'elapsed': chosen['elapsed']}
+
+    def save(self):
+        """Write the recorded exchanges to the file, does nothing when replaying"""
+
+        if self.mode != 'record':
+            return
+        with self.__lock:
+            lines = [json.dumps(exchange, separators=(',', ':')) for exchange in self.exchanges]
+        with self.__open('wt') as f:
+            f.write('\n'.join(lines) + '\n' if lines else '')
+
+    def __load(self):
+        with self.__open('rt') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def __open(self, mode):
+        if str(self.path).endswith('.gz'):
+            return gzip.open(self.path, mode, encoding='utf-8')
+        return open(self.path, mode, encoding='utf-8')
+
+
+class CassetteAdapter(TracingHTTPAdapter):
+    """requests adapter that records exchanges to a cassette or answers from one
+
+    Parameters
+    ----------
+    cassette: Cassette
+        cassette to record to or replay from
+    **kwargs
+        passed on to the HTTPAdapter, i.e. pool_maxsize
+    """
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        if self.cassette.mode == 'replay':
+            played = self.cassette.play(request.method, request.url, CaseInsensitiveDict(request.headers),
+                                        request.body)
+            if self.cassette.pace:
+                time.sleep(played['elapsed'])
+            raw = HTTPResponse(body=io.BytesIO(played['content']), headers=_replayed_headers(played),
+                               status=played['status'], preload_content=False, decode_content=False)
+            return self.build_response(request, raw)
+
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content
+        self.cassette.record(request.method, request.url, CaseInsensitiveDict(request.headers), request.body,
+                             response.status_code, response.headers, content, time.perf_counter() - started)
+        return response
+
+
+def create_cassette_transport(cassette, transport):
+    """Wrap an httpx async transport so it records to or replays from a cassette
+
+    httpx is only imported by the async client, so the transport class is
+    built on first use.
+
+    Parameters
+    ----------
+    cassette: Cassette
+        cassette to record to or replay from
+    transport: httpx.AsyncBaseTransport
+        transport that reaches the camera while recording
+
+    Returns
+    -------
+    httpx.AsyncBaseTransport
+        the wrapping transport
+    """
+
+    return _cassette_transport_class()(cassette, transport)
+
+
+_transport_class = None
+
+
+def _cassette_transport_class():
+    global _transport_class
+    if _transport_class is not None:
+        return _transport_class
+
+    import asyncio
+    import httpx
+
+    class CassetteTransport(httpx.AsyncBaseTransport):
+
+        def __init__(self, cassette, transport):
+            self.cassette = cassette
+            self.transport = transport
+
+        async def handle_async_request(self, request):
+            try:
+                body = request.content
+            except httpx.RequestNotRead:
+                # A streamed upload, only its size is recorded
+                body = None
+
+            if self.cassette.mode == 'replay':
+                played = self.cassette.play(request.method, str(request.url), CaseInsensitiveDict(request.headers),
+                                            body)
+                if self.cassette.pace:
+                    await asyncio.sleep(played['elapsed'])
+                return httpx.Response(played['status'], headers=_replayed_headers(played),
+                                      content=played['content'], request=request)
+
+            started = time.perf_counter()
+            response = await self.transport.handle_async_request(request)
+            content = await response.aread()
+            await response.aclose()
+            self.cassette.record(request.method, str(request.url), CaseInsensitiveDict(request.headers), body,
+                                 response.status_code, response.headers, content, time.perf_counter() - started)
+            headers = _replayed_headers({'response_headers': response.headers, 'content': content})
+            return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+        async def aclose(self):
+            await self.transport.aclose()
+
+    _transport_class = CassetteTransport
+    return _transport_class
+
+
+def _replayed_headers(played):
+    # The recorded content is already decoded, so it goes out as a plain body of its own length
+    headers = {name: value for name, value in played['response_headers'].items()
+               if name.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')}
+    headers['Content-Length'] = str(len(played['content']))
+    return headers
+
+
+def _fingerprint(body, headers):
+    # Small bodies are kept as they are, large and streamed ones as their size and hash
+    if body is None or not isinstance(body, (bytes, str)):
+        length = headers.get('Content-Length') if headers else None
+        return {'size': int(length)} if length else None
+    data = body.encode() if isinstance(body, str) else body
+    if len(data) <= _BODY_KEPT:
+        return _encode(data)
+    return {'size': len(data), 'sha1': hashlib.sha1(data).hexdigest()}
+
+
+def _encode(data):
+    try:
+        return {'text': data.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(data).decode('ascii')}
+
+
+def _decode(value):
+    if 'text' in value:
+        return value['text'].encode('utf-8')
+    return base64.b64decode(value['base64'])
@@ -1,146 +1,234 @@
-import xml.etree.ElementTree as ET
-from xml.etree.ElementTree import ParseError
-from bs4 import BeautifulSoup
+import functools
 import json
 
 
-def check_response(response):
-    if response:
-        if response.text == "OK":
-            return True
-        elif check_response_as_xml(response):
-            return True
-        elif check_response_as_html(response):
-            return True
-        elif check_ntp_response(response):
-            return True
-        elif check_dynamic_overlay(response):
-            return True
-        elif check_illumination(response):
-            return True
-        elif check_capture_mode(response):
-            return True
-        elif check_get_dynamic_overlays(response):
-            return True
-        elif check_restart(response):
-            return True
-        elif check_time_response(response):
-            return True
-        elif check_system_ready(response):
-            return True
-        else:
-            return False
-
-
-def try_json(func):
-    def wrapper(*args, **kwargs):
-        try:
-            return func(*args, **kwargs)
-        except KeyError:
-            return False
-        except json.decoder.JSONDecodeError:
-            return False
-
-    return wrapper
-
-
-@try_json
-def check_ntp_response(response):
-    jsonResponse = response.json()
-    jsonResponse['apiVersion']
-    jsonResponse['data']
-    if jsonResponse['method'] == 'setNTPClientConfiguration':
-        return True
-    return False
-
-
-@try_json
-def check_time_response(response):
-    jsonResponse = response.json()
-    if jsonResponse['method'] == 'getAll':
-        if type(jsonResponse['data']) == type(dict()):
-            return True
-    return False
-
-
-@try_json
-def check_dynamic_overlay(response):
-    jsonResponse = response.json()
-    if jsonResponse['method'] == 'setText':
-        if type(jsonResponse['data']) == type(dict()):
-            return True
-    return False
-
-
-@try_json
-def check_illumination(response):
-    jsonResponse = response.json()
-    if jsonResponse['method'] == 'disableLight' or jsonResponse['method'] == 'enableLight':
-        if type(jsonResponse['data']) == type(dict()):
-            return True
-    return False
-
-
-@try_json
-def check_capture_mode(response):
-    jsonResponse = response.json()
-    if jsonResponse['method'] == 'setCaptureMode':
-        if type(jsonResponse['data']) == type(dict()):
-            return True
-    return False
-
-
-@try_json
-def check_get_dynamic_overlays(response):
-    jsonResponse = response.json()
-    if jsonResponse['method'] == 'list':
-        if type(jsonResponse['data']['textOverlays']) == type(list()):
-            return True
-
-    return False
-
-
-@try_json
-def check_system_ready(response):
-    jsonResponse = response.json()
-    if jsonResponse['method'] == 'systemready':
-        if isinstance(jsonResponse['data'], dict):
-            return True
-
-    return False
-
-
-def check_response_as_xml(response):
-    try:
-        xmlResponse = ET.fromstring(response.text)
-        if xmlResponse.find('./Success') or xmlResponse.find(
-                './{http://www.axis.com/vapix/http_cgi/zipstream1}Success'):
-            return True
-        elif xmlResponse.find('./Error'):
-            return False
-    except ParseError as e:
-        return False
+class VapixResult:
+    """Outcome of validating a response from the camera
+
+    Truthy when the camera accepted the call, so it can be used anywhere a
+    bool success flag was expected.
+
+    Attributes
+    ----------
+    success: bool
+        the camera accepted the call
+    data: object
+        the parsed body, a dict for JSON APIs, an Element for XML APIs and the
+        text otherwise
+    error: str
+        why the call was rejected, None on success
+    """
+
+    def __init__(self, success, data=None, error=None):
+        self.success = success
+        self.data = data
+        self.error = error
+
+    def __bool__(self):
+        return self.success
+
+    def __eq__(self, other):
+        if isinstance(other, bool):
+            return self.success == other
+        return NotImplemented
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        if self.success:
+            return "VapixResult(success=True)"
+        return f"VapixResult(success=False, error={self.error!r})"
+
+
+def check_response(response, endpoint=None, api_method=None):
+    """Validate a response from the camera
+
+    The body is parsed once and checked by the validator of the endpoint that
+    was called. Without an endpoint the validator is picked from the
+    Content-Type of the response.
+
+    Parameters
+    ----------
+    response: requests.Response or httpx.Response
+        response given by the camera
+    endpoint: str, optional
+        endpoint that was called, i.e. 'param.cgi'
+    api_method: str, optional
+        'method' of the JSON request, checked against the one the camera echoes
 
+    Returns
+    -------
+    VapixResult
+        success flag, parsed body and error message
+    """
 
-def check_response_as_html(response):
+    if response is None:
+        return VapixResult(False, error="No response")
+    if response.status_code >= 400:
+        return VapixResult(False, data=response.text, error=f"HTTP {response.status_code}")
+
+    validator = _ENDPOINT_VALIDATORS.get(endpoint) or _validator_for_content_type(response)
+    return validator(response, api_method)
+
+
+def check_ok_text(response, api_method=None):
+    text = response.text.strip()
+    if text == "OK":
+        return VapixResult(True, data=text)
+    errors = [line.lstrip('# ').strip() for line in text.splitlines() if line.startswith('#')]
+    return VapixResult(False, data=text, error='; '.join(errors) or text or "Empty response")
+
+
+def check_json(response, api_method=None):
     try:
-        parsingHtml = BeautifulSoup(response.text, 'html.parser')
-        body_string = parsingHtml.find('head').string
-        if "Created account" in body_string:
-            return True
-        return False
-    except AttributeError:
-        return False
-    except TypeError:
-        return False
-
-
-def check_restart(response):
+        jsonResponse = json.loads(response.text)
+    except json.decoder.JSONDecodeError:
+        return VapixResult(False, data=response.text, error="Response is not JSON")
+    if not isinstance(jsonResponse, dict):
+        return VapixResult(False, data=jsonResponse, error="Unexpected JSON response")
+
+    if 'error' in jsonResponse:
+        error = jsonResponse['error']
+        if isinstance(error, dict):
+            error = f"{error.get('code')}: {error.get('message')}"
+        return VapixResult(False, data=jsonResponse, error=str(error))
+
+    method = jsonResponse.get('method')
+    if api_method is not None and method != api_method:
+        return VapixResult(False, data=jsonResponse, error=f"Expected method {api_method}, got {method}")
+
+    expected_data = _JSON_DATA_CHECKS.get(method)
+    if expected_data is not None and not expected_data(jsonResponse.get('data')):
+        return VapixResult(False, data=jsonResponse, error=f"Unexpected data for {method}")
+    return VapixResult(True, data=jsonResponse)
+
+
+def check_xml(response, api_method=None):
+    # Imported here so plain JSON workloads never pay for loading ElementTree
+    import xml.etree.ElementTree as ET
+
     try:
-        parsingHTML = BeautifulSoup(response.text, 'html.parser')
-        if parsingHTML.find('[http-equiv]'):
-            return True
-        else:
-            return False
-    except AttributeError:
-        return False
+        xmlResponse = ET.fromstring(response.text)
+    except ET.ParseError:
+        return VapixResult(False, data=response.text, error="Response is not XML")
+
+    success = False
+    for element in xmlResponse.iter():
+        # Compare local names so namespaced responses (i.e. zipstream) match as well
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 'Error':
+            message = element.findtext('.//{*}ErrorDescription') or element.get('description') or "Error"
+            return VapixResult(False, data=xmlResponse, error=message)
+        if tag == 'Success':
+            success = True
+    if success:
+        return VapixResult(True, data=xmlResponse)
+    return VapixResult(False, data=xmlResponse, error="No Success element in response")
+
+
+def check_user_created(response, api_method=None):
+    if response.text.strip() == "OK":
+        return VapixResult(True, data=response.text)
+
+    parsingHtml = _parse_html(response.text)
+    if "Created account" in parsingHtml.head_text:
+        return VapixResult(True, data=response.text)
+    return VapixResult(False, data=response.text, error=parsingHtml.text or "Empty response")
+
+
+def check_restart(response, api_method=None):
+    # restart.cgi answers with a page that refreshes once the camera is back
+    parsingHtml = _parse_html(response.text)
+    if parsingHtml.has_http_equiv:
+        return VapixResult(True, data=response.text)
+    return VapixResult(False, data=response.text, error=parsingHtml.text or "Empty response")
+
+
+def _parse_html(text):
+    parser = _html_summary_class()()
+    parser.feed(text)
+    parser.close()
+    parser.head_text = ' '.join(parser.head_parts)
+    parser.text = ' '.join(parser.parts)
+    return parser
+
+
+@functools.lru_cache(maxsize=None)
+def _html_summary_class():
+    # The camera's HTML replies are tiny, the stdlib parser is plenty and loads far faster than BeautifulSoup
+    from html.parser import HTMLParser
+
+    class _HtmlSummary(HTMLParser):
+
+        def __init__(self):
+            super().__init__()
+            self.has_http_equiv = False
+            self.in_head = False
+            self.head_parts = list()
+            self.parts = list()
+
+        def handle_starttag(self, tag, attrs):
+            if tag == 'head':
+                self.in_head = True
+            elif tag == 'meta' and any(name == 'http-equiv' for name, value in attrs):
+                self.has_http_equiv = True
+
+        def handle_endtag(self, tag):
+            if tag == 'head':
+                self.in_head = False
+
+        def handle_data(self, data):
+            data = data.strip()
+            if data:
+                self.parts.append(data)
+                if self.in_head:
+                    self.head_parts.append(data)
+
+    return _HtmlSummary
+
+
+def _validator_for_content_type(response):
+    content_type = response.headers.get('Content-Type', '').lower()
+    if 'json' in content_type:
+        return check_json
+    if 'xml' in content_type:
+        return check_xml
+    if 'html' in content_type:
+        return check_restart if 'http-equiv' in response.text else check_user_created
+
+    # No useful header, go by the first character of the body
+    body = response.text.lstrip()
+    if body.startswith('{'):
+        return check_json
+    if body.startswith('<'):
+        return check_xml
+    return check_ok_text
+
+
+# What 'data' has to look like for a JSON method to count as a success
+_JSON_DATA_CHECKS = {
+    'setNTPClientConfiguration': lambda data: data is not None,
+    'getAll': lambda data: isinstance(data, dict),
+    'setText': lambda data: isinstance(data, dict),
+    'enableLight': lambda data: isinstance(data, dict),
+    'disableLight': lambda data: isinstance(data, dict),
+    'setCaptureMode': lambda data: isinstance(data, dict),
+    'list': lambda data: isinstance(data, dict) and isinstance(data.get('textOverlays'), list),
+    'systemready': lambda data: isinstance(data, dict),
+}
+
+_ENDPOINT_VALIDATORS = {
+    'param.cgi': check_ok_text,
+    'pwdgrp.cgi': check_user_created,
+    'restart.cgi': check_restart,
+    'disks/properties/setrequiredfs.cgi': check_xml,
+    'zipstream/setstrength.cgi': check_xml,
+    'ntp.cgi': check_json,
+    'time.cgi': check_json,
+    'lightcontrol.cgi': check_json,
+    'capturemode.cgi': check_json,
+    'systemready.cgi': check_json,
+    'dynamicoverlay/dynamicoverlay.cgi': check_json,
+    'basicdeviceinfo.cgi': check_json,
+    'firmwaremanagement.cgi': check_json,
+}
@@ -0,0 +1,194 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from AxisPy.camera import AxisConfigure
+
+
+class FleetResult:
+    """Outcome of running one operation on one camera
+
+    Attributes
+    ----------
+    ip: str
+        IP address of the camera, as 'ip:port' if the device set its own port
+    value: object
+        what the operation returned, None if it raised
+    error: Exception
+        exception raised by the operation, None if it succeeded
+    elapsed: float
+        seconds the operation took on this camera
+    """
+
+    def __init__(self, ip, value=None, error=None, elapsed=0.0):
+        self.ip = ip
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        outcome = f"error={self.error!r}" if self.error is not None else f"value={self.value!r}"
+        return f"FleetResult(ip={self.ip!r}, {outcome}, elapsed={self.elapsed:.3f})"
+
+
+class AxisFleet:
+    """Run AxisConfigure operations across many cameras with a bounded thread pool
+
+    Parameters
+    ----------
+    devices: list
+        IP addresses, or dicts of AxisConfigure arguments (must include 'ip')
+        for cameras that need their own credentials or port
+    username: str
+        username used for cameras that don't set their own
+    password: str
+        password used for cameras that don't set their own
+    max_workers: int
+        max number of cameras being worked on at once
+    **camera_kwargs
+        extra arguments passed to every AxisConfigure, i.e.
+        failure_threshold=3 so dead cameras fail straight away instead of
+        holding a worker until they time out
+    """
+
+    def __init__(self, devices, username='root', password='pass', max_workers=32, **camera_kwargs):
+        self.max_workers = max_workers
+        self.__cameras = dict()
+        for device in devices:
+            settings = {'username': username, 'password': password, **camera_kwargs}
+            if isinstance(device, dict):
+                settings.update(device)
+                key = f"{device['ip']}:{device['port']}" if 'port' in device else device['ip']
+            else:
+                settings['ip'] = key = device
+            self.__cameras[key] = settings
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.__cameras)
+
+    @property
+    def ips(self):
+        return list(self.__cameras)
+
+    def camera(self, ip):
+        """Get the AxisConfigure for a camera in the fleet
+
+        Cameras are created on first use and kept so later runs reuse their
+        keep-alive connections and digest nonce.
+
+        Parameters
+        ----------
+        ip: str
+            IP address of the camera, as 'ip:port' if the device set its own port
+
+        Returns
+        -------
+        AxisConfigure
+            camera object for the ip
+        """
+
+        camera = self.__cameras[ip]
+        if isinstance(camera, dict):
+            camera = self.__cameras[ip] = AxisConfigure(**camera)
+        return camera
+
+    def close(self):
+        """Close the connections of every camera that has been used"""
+
+        for camera in self.__cameras.values():
+            if isinstance(camera, AxisConfigure):
+                camera.close()
+
+    def run(self, operation, *args, **kwargs):
+        """Run an operation on every camera, yielding results as they complete
+
+        Parameters
+        ----------
+        operation: str or callable
+            name of an AxisConfigure method, or a callable that takes the
+            AxisConfigure as its first argument
+        *args, **kwargs
+            passed on to the operation
+
+        Yields
+        ------
+        FleetResult
+            result for each camera, in the order they finish
+        """
+
+        ips = iter(self.__cameras)
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                # Only keep a couple of jobs queued per worker so huge fleets don't pile up futures
+                for ip in ips:
+                    pending.add(executor.submit(self.__run_one, ip, operation, args, kwargs))
+                    if len(pending) >= self.max_workers * 2:
+                        break
+
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for ip in ips:
+                        pending.add(executor.submit(self.__run_one, ip, operation, args, kwargs))
+                        if len(pending) >= self.max_workers * 2:
+                            break
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def run_all(self, operation, *args, **kwargs):
+        """Run an operation on every camera and wait for all of them
+
+        Returns
+        -------
+        dict
+            ip to FleetResult
+        """
+
+        return {result.ip: result for result in self.run(operation, *args, **kwargs)}
+
+    def wait_until_ready(self, deadline=300, **kwargs):
+        """Wait for every camera to report it is ready, i.e. after a mass restart
+
+        The deadline is shared, so cameras that only get a worker late don't
+        get extra time. Give the fleet enough workers to poll every camera at
+        once, each one is held for up to a long poll at a time.
+
+        Parameters
+        ----------
+        deadline: float
+            Seconds to wait at most
+        **kwargs
+            passed on to AxisConfigure.wait_until_ready
+
+        Returns
+        -------
+        dict
+            ip to FleetResult, value is True for each camera that was ready
+        """
+
+        end = time.monotonic() + deadline
+        return self.run_all(lambda camera: camera.wait_until_ready(end - time.monotonic(), **kwargs))
+
+    def __run_one(self, ip, operation, args, kwargs):
+        start = time.perf_counter()
+        try:
+            camera = self.camera(ip)
+            if callable(operation):
+                value = operation(camera, *args, **kwargs)
+            else:
+                value = getattr(camera, operation)(*args, **kwargs)
+        except Exception as e:
+            return FleetResult(ip, error=e, elapsed=time.perf_counter() - start)
+        return FleetResult(ip, value=value, elapsed=time.perf_counter() - start)
@@ -0,0 +1,238 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from AxisPy.axis_discovery import AxisDevice, MyListener
+
+
+class DeviceInventory:
+    """Device inventory kept on disk and updated from discovery events
+
+    Devices are stored in SQLite keyed by serial number and mirrored in memory,
+    so lookups never touch the network or the disk. Once started, a zeroconf
+    browser keeps running in the background and adds, updates and removes
+    devices as they announce themselves or go away.
+
+    Parameters
+    ----------
+    path: str
+        SQLite database file, ':memory:' for an inventory that isn't kept
+    identify: bool
+        ask each new device for its serial, product and firmware over
+        basicdeviceinfo.cgi, otherwise only devices with a serial in their
+        name or TXT record can be stored
+    max_workers: int
+        number of devices resolved and identified at the same time
+
+    Example
+    -------
+    with DeviceInventory('axis.db') as inventory:
+        inventory.ip_for('ACCC8E123456')
+        inventory.by_product('M3106-L Mk II')
+    """
+
+    def __init__(self, path='axis_inventory.db', identify=True, max_workers=32):
+        self.identify = identify
+        self.max_workers = max_workers
+        self.__lock = threading.RLock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS devices ("
+            "serial TEXT PRIMARY KEY, name TEXT, addresses TEXT, port INTEGER, product TEXT, firmware TEXT, "
+            "properties TEXT, last_seen REAL)")
+        columns = [column[1] for column in self.__db.execute("PRAGMA table_info(devices)")]
+        if 'port' not in columns:
+            # Inventories written before the port was stored, their devices were all taken to be on 80
+            self.__db.execute("ALTER TABLE devices ADD COLUMN port INTEGER DEFAULT 80")
+        self.__db.commit()
+
+        self.__by_serial = dict()
+        self.__by_name = dict()
+        self.__by_product = dict()
+        for row in self.__db.execute(
+                "SELECT serial, name, addresses, port, product, firmware, properties, last_seen FROM devices"):
+            self.__index(self.__device_from_row(row))
+
+        self.__zeroconf = None
+        self.__browser = None
+        self.__executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.__by_serial)
+
+    def __iter__(self):
+        return iter(list(self.__by_serial.values()))
+
+    def __contains__(self, serial):
+        return serial.upper() in self.__by_serial
+
+    def start(self):
+        """Start listening for discovery events in the background"""
+
+        # zeroconf is slow to import, so only load it once the inventory is started
+        from zeroconf import ServiceBrowser, Zeroconf
+
+        if self.__browser is not None:
+            return
+        self.__executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.__zeroconf = Zeroconf()
+        listener = MyListener(on_device=self.add_or_update, executor=self.__executor, identify=self.identify,
+                              on_remove=self.remove_name)
+        self.__browser = ServiceBrowser(self.__zeroconf, "_http._tcp.local.", listener)
+
+    def stop(self):
+        """Stop listening for discovery events, the stored devices are kept"""
+
+        if self.__browser is None:
+            return
+        self.__browser.cancel()
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        self.__zeroconf.close()
+        self.__browser = self.__zeroconf = self.__executor = None
+
+    def close(self):
+        """Stop listening and close the database"""
+
+        self.stop()
+        with self.__lock:
+            self.__db.close()
+
+    def get(self, serial):
+        """Get a device by serial number
+
+        Returns
+        -------
+        AxisDevice
+            the device, None if it isn't in the inventory
+        """
+
+        return self.__by_serial.get(serial.upper())
+
+    def ip_for(self, serial):
+        """Get the IP address of a device by serial number
+
+        Returns
+        -------
+        str
+            IP address, None if the device isn't in the inventory
+        """
+
+        device = self.get(serial)
+        return device.ip if device is not None else None
+
+    def by_product(self, product):
+        """Get every device of a model
+
+        Parameters
+        ----------
+        product: str
+            short product name, i.e. 'M3106-L Mk II'
+
+        Returns
+        -------
+        list
+            AxisDevice for each device of the model
+        """
+
+        serials = self.__by_product.get(product, ())
+        return [self.__by_serial[serial] for serial in list(serials) if serial in self.__by_serial]
+
+    def add_or_update(self, device):
+        """Store a discovered device, replacing the previous record of its serial
+
+        Parameters
+        ----------
+        device: AxisDevice
+            device to store, ignored if it isn't an Axis device or has no serial
+
+        Returns
+        -------
+        bool
+            the device was stored
+        """
+
+        if not device.is_axis or not device.serial:
+            return False
+
+        device.serial = device.serial.upper()
+        with self.__lock:
+            previous = self.__by_serial.get(device.serial)
+            if previous is not None:
+                self.__unindex(previous)
+                # An update without identify shouldn't wipe what we already knew
+                device.product = device.product or previous.product
+                device.firmware = device.firmware or previous.firmware
+            stale_serial = self.__by_name.get(device.name)
+            if stale_serial is not None and stale_serial != device.serial:
+                self.__remove_serial(stale_serial)
+
+            self.__index(device)
+            self.__db.execute(
+                "INSERT OR REPLACE INTO devices "
+                "(serial, name, addresses, port, product, firmware, properties, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (device.serial, device.name, json.dumps(device.addresses), device.port, device.product,
+                 device.firmware, json.dumps(device.properties), time.time()))
+            self.__db.commit()
+        return True
+
+    def remove_name(self, name):
+        """Remove the device announced under an mDNS instance name
+
+        Parameters
+        ----------
+        name: str
+            instance name, i.e. 'AXIS M3106-L Mk II - ACCC8E123456'
+        """
+
+        with self.__lock:
+            serial = self.__by_name.get(name)
+            if serial is not None:
+                self.__remove_serial(serial)
+                self.__db.commit()
+
+    def remove(self, serial):
+        """Remove a device by serial number"""
+
+        with self.__lock:
+            self.__remove_serial(serial.upper())
+            self.__db.commit()
+
+    def __remove_serial(self, serial):
+        device = self.__by_serial.get(serial)
+        if device is not None:
+            self.__unindex(device)
+        self.__db.execute("DELETE FROM devices WHERE serial = ?", (serial,))
+
+    def __index(self, device):
+        self.__by_serial[device.serial] = device
+        self.__by_name[device.name] = device.serial
+        if device.product:
+            self.__by_product.setdefault(device.product, set()).add(device.serial)
+
+    def __unindex(self, device):
+        self.__by_serial.pop(device.serial, None)
+        if self.__by_name.get(device.name) == device.serial:
+            del self.__by_name[device.name]
+        if device.product in self.__by_product:
+            self.__by_product[device.product].discard(device.serial)
+            if not self.__by_product[device.product]:
+                del self.__by_product[device.product]
+
+    @staticmethod
+    def __device_from_row(row):
+        serial, name, addresses, port, product, firmware, properties, last_seen = row
+        device = AxisDevice(name, json.loads(addresses), json.loads(properties or '{}'), port=port or 80)
+        device.serial = serial
+        device.product = product
+        device.firmware = firmware
+        return device
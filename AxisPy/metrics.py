@@ -0,0 +1,215 @@
+import bisect
+import threading
+
+# Seconds, covers a fast param.cgi read up to a slow listdefinitions or upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Series:
+
+    def __init__(self, buckets):
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.statuses = dict()
+        self.errors = dict()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.auth_challenges = 0
+        self.timeouts = 0
+        self.validation_failures = 0
+
+
+class RequestMetrics:
+    """Latency histograms and counters for every request sent to a camera
+
+    One instance can be shared by any number of cameras, every series is
+    labelled by camera, endpoint and API method, plus any labels the camera
+    adds of its own. Read the numbers with prometheus() or snapshot(), or get
+    every request as it happens through the callback.
+
+    Parameters
+    ----------
+    buckets: tuple
+        upper bounds in seconds of the latency histogram buckets
+    callback: callable, optional
+        called with a dict describing every HTTP attempt: camera, endpoint,
+        method, labels, seconds, status, bytes_sent, bytes_received,
+        auth_challenges, error and timed_out. Runs on the calling thread, so
+        keep it quick
+
+    Example
+    -------
+    metrics = RequestMetrics()
+    with AxisFleet(ips, metrics=metrics, metrics_labels={'site': 'north'}) as fleet:
+        fleet.run_all('get_configuration_details')
+    print(metrics.prometheus())
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, callback=None):
+        self.buckets = tuple(sorted(buckets))
+        self.callback = callback
+        self.__series = dict()
+        self.__lock = threading.Lock()
+
+    def record(self, camera, endpoint, method, seconds, status=None, bytes_sent=0, bytes_received=0,
+               auth_challenges=0, error=None, timed_out=False, labels=None):
+        """Record one HTTP attempt
+
+        Parameters
+        ----------
+        camera: str
+            camera address
+        endpoint: str
+            endpoint under axis-cgi/, i.e. 'param.cgi'
+        method: str
+            JSON API method or param.cgi action, None if the request has neither
+        seconds: float
+            time until the answer, or until the attempt failed
+        status: int, optional
+            HTTP status of the answer, None if there was none
+        bytes_sent: int
+            request body bytes, every digest round trip included
+        bytes_received: int
+            response body bytes
+        auth_challenges: int
+            401 challenges answered on the way
+        error: str, optional
+            name of the exception the attempt failed with
+        timed_out: bool
+            the attempt ran out of time
+        labels: dict, optional
+            extra labels of the camera
+        """
+
+        key = (camera, endpoint, method or '', tuple(sorted((labels or {}).items())))
+        with self.__lock:
+            series = self.__series.get(key)
+            if series is None:
+                series = self.__series[key] = _Series(self.buckets)
+            series.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            series.count += 1
+            series.sum += seconds
+            if status is not None:
+                series.statuses[status] = series.statuses.get(status, 0) + 1
+            if error is not None:
+                series.errors[error] = series.errors.get(error, 0) + 1
+            series.bytes_sent += bytes_sent
+            series.bytes_received += bytes_received
+            series.auth_challenges += auth_challenges
+            series.timeouts += timed_out
+
+        if self.callback is not None:
+            self.callback({'camera': camera, 'endpoint': endpoint, 'method': method, 'labels': labels or {},
+                           'seconds': seconds, 'status': status, 'bytes_sent': bytes_sent,
+                           'bytes_received': bytes_received, 'auth_challenges': auth_challenges, 'error': error,
+                           'timed_out': timed_out})
+
+    def record_validation_failure(self, camera, endpoint, method, labels=None):
+        """Record an answer that check_response didn't accept"""
+
+        key = (camera, endpoint, method or '', tuple(sorted((labels or {}).items())))
+        with self.__lock:
+            series = self.__series.get(key)
+            if series is None:
+                series = self.__series[key] = _Series(self.buckets)
+            series.validation_failures += 1
+
+    def clear(self):
+        """Drop every recorded value"""
+
+        with self.__lock:
+            self.__series.clear()
+
+    def snapshot(self):
+        """Get the recorded values
+
+        Returns
+        -------
+        list
+            a dict per camera, endpoint and method with count, sum, buckets
+            (upper bound to cumulative count) and the counters
+        """
+
+        with self.__lock:
+            items = [(key, self.__copy(series)) for key, series in self.__series.items()]
+        snapshot = list()
+        for (camera, endpoint, method, labels), series in items:
+            cumulative = 0
+            buckets = dict()
+            for bound, count in zip(self.buckets + (float('inf'),), series.bucket_counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            snapshot.append({'camera': camera, 'endpoint': endpoint, 'method': method, 'labels': dict(labels),
+                             'count': series.count, 'sum': series.sum, 'buckets': buckets,
+                             'statuses': series.statuses, 'errors': series.errors,
+                             'bytes_sent': series.bytes_sent, 'bytes_received': series.bytes_received,
+                             'auth_challenges': series.auth_challenges, 'timeouts': series.timeouts,
+                             'validation_failures': series.validation_failures})
+        return snapshot
+
+    def prometheus(self, prefix='axispy'):
+        """Render the recorded values in the Prometheus text exposition format
+
+        Parameters
+        ----------
+        prefix: str
+            prefix of every metric name
+
+        Returns
+        -------
+        str
+            metrics text, ready to be served on a /metrics endpoint
+        """
+
+        families = {
+            'request_duration_seconds': ('histogram', 'Time until the camera answered', []),
+            'requests_total': ('counter', 'Answers by HTTP status', []),
+            'request_errors_total': ('counter', 'Attempts that got no answer, by exception', []),
+            'request_timeouts_total': ('counter', 'Attempts that ran out of time', []),
+            'auth_challenges_total': ('counter', 'Digest 401 challenges answered', []),
+            'request_sent_bytes_total': ('counter', 'Request body bytes sent', []),
+            'response_received_bytes_total': ('counter', 'Response body bytes received', []),
+            'validation_failures_total': ('counter', 'Answers check_response did not accept', []),
+        }
+        for entry in self.snapshot():
+            labels = {'camera': entry['camera'], 'endpoint': entry['endpoint'], 'method': entry['method'],
+                      **entry['labels']}
+            lines = families['request_duration_seconds'][2]
+            for bound, count in entry['buckets'].items():
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f"{prefix}_request_duration_seconds_bucket{self.__labels(labels, le=le)} {count}")
+            lines.append(f"{prefix}_request_duration_seconds_sum{self.__labels(labels)} {entry['sum']}")
+            lines.append(f"{prefix}_request_duration_seconds_count{self.__labels(labels)} {entry['count']}")
+            for status, count in entry['statuses'].items():
+                families['requests_total'][2].append(
+                    f"{prefix}_requests_total{self.__labels(labels, status=status)} {count}")
+            for error, count in entry['errors'].items():
+                families['request_errors_total'][2].append(
+                    f"{prefix}_request_errors_total{self.__labels(labels, error=error)} {count}")
+            for name, field in (('request_timeouts_total', 'timeouts'), ('auth_challenges_total', 'auth_challenges'),
+                                ('request_sent_bytes_total', 'bytes_sent'),
+                                ('response_received_bytes_total', 'bytes_received'),
+                                ('validation_failures_total', 'validation_failures')):
+                families[name][2].append(f"{prefix}_{name}{self.__labels(labels)} {entry[field]}")
+
+        text = list()
+        for name, (kind, description, lines) in families.items():
+            text.append(f"# HELP {prefix}_{name} {description}")
+            text.append(f"# TYPE {prefix}_{name} {kind}")
+            text.extend(lines)
+        return '\n'.join(text) + '\n'
+
+    @staticmethod
+    def __labels(labels, **extra):
+        labels = {**labels, **extra}
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for value in labels.values())
+        return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+    @staticmethod
+    def __copy(series):
+        copy = _Series(())
+        copy.__dict__.update(series.__dict__, bucket_counts=list(series.bucket_counts),
+                             statuses=dict(series.statuses), errors=dict(series.errors))
+        return copy
@@ -0,0 +1,206 @@
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+
+
+class CameraUnavailable(requests.exceptions.ConnectionError):
+    """The camera failed too many times in a row, calls fail until it is tried again"""
+
+
+# Requests that do something a second time if they are repeated
+_NON_IDEMPOTENT_ENDPOINTS = ('restart.cgi', 'firmwaremanagement.cgi', 'firmwareupgrade.cgi', 'pwdroot/pwdroot.cgi')
+_NON_IDEMPOTENT_METHODS = ('add', 'create', 'remove', 'delete', 'upgrade', 'restart', 'factorydefault', 'rollback')
+_NON_IDEMPOTENT_ACTIONS = ('add', 'remove')
+
+
+def is_idempotent(endpoint, kwargs):
+    """Work out if a request can safely be sent again after it failed
+
+    Reads and plain updates leave the camera in the same state however often
+    they are sent. Restarts, upgrades and anything that adds or removes, like
+    an overlay or a user, don't.
+
+    Parameters
+    ----------
+    endpoint: str
+        endpoint under axis-cgi/
+    kwargs: dict
+        request arguments as passed to _send_request
+
+    Returns
+    -------
+    bool
+        the request can be retried
+    """
+
+    if endpoint in _NON_IDEMPOTENT_ENDPOINTS:
+        return False
+    body = kwargs.get('json')
+    api_method = body.get('method', '') if isinstance(body, dict) else ''
+    if api_method.lower().startswith(_NON_IDEMPOTENT_METHODS):
+        return False
+    for values in (kwargs.get('params'), kwargs.get('data')):
+        if isinstance(values, dict) and values.get('action') in _NON_IDEMPOTENT_ACTIONS:
+            return False
+        if isinstance(values, str) and any(f'action={action}' in values for action in _NON_IDEMPOTENT_ACTIONS):
+            return False
+    return True
+
+
+class AdaptiveTimeout:
+    """Per-endpoint timeouts worked out from how long the camera takes to answer
+
+    Until an endpoint has enough samples it gets the default timeout. After
+    that it gets a multiple of its p99 latency, never less than the default.
+    A request that times out doubles the timeout of its endpoint, so a slow
+    endpoint that never answers in time still gets a chance to.
+
+    Parameters
+    ----------
+    default: float
+        seconds to wait for an endpoint without enough samples
+    multiplier: float
+        timeout as a multiple of the p99 latency
+    maximum: float
+        longest timeout ever given
+    window: int
+        number of latest samples kept per endpoint
+    min_samples: int
+        samples needed before the latency is trusted
+    """
+
+    def __init__(self, default=0.5, multiplier=3, maximum=30, window=100, min_samples=10):
+        self.default = default
+        self.multiplier = multiplier
+        self.maximum = maximum
+        self.window = window
+        self.min_samples = min_samples
+        self.__samples = dict()
+        self.__floors = dict()
+        self.__lock = threading.Lock()
+
+    def timeout(self, endpoint):
+        """Get the timeout for the next request to an endpoint
+
+        Returns
+        -------
+        float
+            seconds
+        """
+
+        with self.__lock:
+            floor = self.__floors.get(endpoint, self.default)
+            samples = self.__samples.get(endpoint)
+            if not samples or len(samples) < self.min_samples:
+                return min(floor, self.maximum)
+            ordered = sorted(samples)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return min(max(floor, p99 * self.multiplier), self.maximum)
+
+    def record(self, endpoint, seconds):
+        """Record how long a request that got an answer took"""
+
+        with self.__lock:
+            samples = self.__samples.get(endpoint)
+            if samples is None:
+                samples = self.__samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+            # An answer shows the endpoint doesn't need the raised floor any more
+            if endpoint in self.__floors and seconds * self.multiplier < self.__floors[endpoint]:
+                self.__floors[endpoint] = max(self.default, seconds * self.multiplier)
+
+    def record_timeout(self, endpoint, timeout):
+        """Record that a request ran out of time, the next one gets twice as long"""
+
+        with self.__lock:
+            self.__floors[endpoint] = min(max(self.__floors.get(endpoint, self.default), timeout) * 2, self.maximum)
+
+
+class CircuitBreaker:
+    """Stops calls to a camera that keeps failing
+
+    After failure_threshold connection failures in a row the breaker opens
+    and every call fails straight away with CameraUnavailable. Once
+    reset_timeout has passed a single call is let through; if it succeeds the
+    breaker closes again, otherwise it stays open for another reset_timeout.
+
+    Parameters
+    ----------
+    failure_threshold: int
+        connection failures in a row that open the breaker
+    reset_timeout: float
+        seconds the breaker stays open before a call is tried again
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.__failures = 0
+        self.__opened_at = None
+        self.__trial = False
+        self.__lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.__opened_at is not None
+
+    def before_call(self, name=''):
+        """Check the breaker before a call
+
+        Raises
+        ------
+        CameraUnavailable
+            the breaker is open and it isn't time to try the camera again
+        """
+
+        with self.__lock:
+            if self.__opened_at is None:
+                return
+            if not self.__trial and time.monotonic() - self.__opened_at >= self.reset_timeout:
+                # Let this one call through to find out if the camera is back
+                self.__trial = True
+                return
+        raise CameraUnavailable(f"{name} failed {self.__failures} times in a row, not trying again for now")
+
+    def record_success(self):
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial = False
+
+    def record_failure(self):
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial or self.__failures >= self.failure_threshold:
+                self.__opened_at = time.monotonic()
+                self.__trial = False
+
+    def cancel_trial(self):
+        """Let another call try the camera, after a call that ended without an answer either way"""
+
+        with self.__lock:
+            self.__trial = False
+
+
+def backoff_delay(attempt, initial_delay=0.2, max_delay=2):
+    """Exponential backoff with full jitter
+
+    Parameters
+    ----------
+    attempt: int
+        number of retries made so far
+    initial_delay: float
+        upper bound of the first delay
+    max_delay: float
+        upper bound of any delay
+
+    Returns
+    -------
+    float
+        seconds to wait before the next try
+    """
+
+    return random.uniform(0, min(max_delay, initial_delay * 2 ** attempt))
@@ -0,0 +1,33 @@
+class PendingRestart:
+    """Collects restart requests so a camera is restarted once for all of them
+
+    Attributes
+    ----------
+    requested: list
+        what asked for a restart, in order, i.e. ['capture mode', 'restart']
+    result: bool
+        outcome of the single restart, and of the readiness wait if one was
+        made. None until the block exits, and if nothing asked for a restart
+    """
+
+    def __init__(self):
+        self.requested = list()
+        self.result = None
+
+    def __bool__(self):
+        return self.pending
+
+    @property
+    def pending(self):
+        return bool(self.requested) and self.result is None
+
+    def add(self, reason='restart'):
+        """Record that a change needs a restart to take effect
+
+        Parameters
+        ----------
+        reason: str
+            what needs the restart, kept for logging
+        """
+
+        self.requested.append(reason)
@@ -0,0 +1,240 @@
+import mmap
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from AxisPy.fleet import FleetResult
+
+
+class RolloutAborted(Exception):
+    """The rollout stopped before this camera was upgraded"""
+
+
+class FirmwareRollout:
+    """Upgrade the firmware of a fleet a few cameras at a time
+
+    The image is memory-mapped once and every upload reads from that mapping.
+    A camera counts as upgraded once it answers systemready.cgi again and
+    basicdeviceinfo.cgi reports the new firmware version. Cameras rebooting
+    don't take up an upload slot, so the next uploads start straight away.
+
+    The number of uploads at once (the window) follows the measured upload
+    bandwidth: it grows while adding an upload still raises the combined
+    throughput and shrinks once uploads only split the same bandwidth.
+
+    Parameters
+    ----------
+    fleet: AxisFleet
+        cameras to upgrade
+    firmware_file: str or os.PathLike
+        path of the .bin image
+    version: str, optional
+        firmware version the image contains, i.e. '11.11.73'. If not given,
+        any version other than the one before the upgrade counts as success
+    window: int
+        number of uploads started at once to begin with
+    max_window: int
+        most uploads ever run at once
+    max_failure_rate: float
+        stop starting new upgrades once more than this fraction of the
+        finished cameras failed
+    min_sample: int
+        number of cameras that have to finish before the failure rate counts,
+        unless the failures alone already exceed the rate for the whole fleet
+    ready_timeout: float
+        seconds a camera gets to come back after its upload
+    poll_interval: float
+        seconds between firmware version checks of a camera that is ready
+        but hasn't rebooted into the new firmware yet
+    upload_timeout: float
+        seconds an upload may take to connect and to get an answer
+    progress: callable, optional
+        called as progress(ip, bytes_sent, total_bytes, bytes_per_second)
+        during every upload
+    max_waits: int
+        most cameras waited on at once after their upload, the others queue
+        and their ready_timeout starts once they are waited on
+
+    Attributes
+    ----------
+    aborted: bool
+        the failure rate went over max_failure_rate
+    window: int
+        current number of uploads allowed at once
+
+    Example
+    -------
+    with AxisFleet(ips, password='pass') as fleet:
+        for result in FirmwareRollout(fleet, 'M3106_11_11_73.bin', version='11.11.73').run():
+            print(result)
+    """
+
+    def __init__(self, fleet, firmware_file, version=None, window=2, max_window=16, max_failure_rate=0.1,
+                 min_sample=5, ready_timeout=900, poll_interval=10, upload_timeout=300, progress=None, max_waits=32):
+        self.fleet = fleet
+        self.firmware_file = firmware_file
+        self.version = version
+        self.window = max(1, min(window, max_window))
+        self.max_window = max_window
+        self.max_failure_rate = max_failure_rate
+        self.min_sample = min_sample
+        self.ready_timeout = ready_timeout
+        self.max_waits = max_waits
+        self.poll_interval = poll_interval
+        self.upload_timeout = upload_timeout
+        self.progress = progress
+        self.aborted = False
+
+        self.__lock = threading.Lock()
+        self.__bytes_sent = 0
+        self.__sample_start = (time.monotonic(), 0)
+        self.__best_bandwidth = 0.0
+        self.__best_window = self.window
+        self.__finished = 0
+        self.__failed = 0
+
+    def run(self):
+        """Upgrade every camera, yielding results as cameras finish
+
+        Yields
+        ------
+        FleetResult
+            result for each camera, value is the firmware version it came
+            back with. Cameras skipped after an abort get a RolloutAborted
+            error
+        """
+
+        ips = iter(self.fleet.ips)
+        uploads = dict()
+        waits = set()
+        with open(self.firmware_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image, \
+                ThreadPoolExecutor(max_workers=self.max_window) as upload_executor, \
+                ThreadPoolExecutor(max_workers=max(1, min(self.max_waits, len(self.fleet)))) as wait_executor:
+            try:
+                while True:
+                    while not self.aborted and len(uploads) < self.window:
+                        ip = next(ips, None)
+                        if ip is None:
+                            break
+                        uploads[upload_executor.submit(self.__upload, ip, image)] = ip
+
+                    if not uploads and not waits:
+                        break
+                    done, _ = wait(set(uploads) | waits, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in uploads:
+                            del uploads[future]
+                            result = future.result()
+                            if isinstance(result, FleetResult):
+                                yield self.__record(result)
+                            else:
+                                waits.add(wait_executor.submit(self.__wait_until_upgraded, *result))
+                        else:
+                            waits.discard(future)
+                            yield self.__record(future.result())
+            finally:
+                for future in list(uploads) + list(waits):
+                    future.cancel()
+
+            for ip in ips:
+                yield FleetResult(ip, error=RolloutAborted(f"Rollout aborted after {self.__failed} failures"))
+
+    def run_all(self):
+        """Upgrade every camera and wait for all of them
+
+        Returns
+        -------
+        dict
+            ip to FleetResult
+        """
+
+        return {result.ip: result for result in self.run()}
+
+    def __upload(self, ip, image):
+        # Returns a FleetResult if the camera already failed, otherwise what the readiness wait needs
+        start = time.perf_counter()
+        last_sent = 0
+
+        def progress(sent, total, rate):
+            nonlocal last_sent
+            with self.__lock:
+                # A rewound body (digest retry) starts counting from zero again
+                self.__bytes_sent += max(sent - last_sent, 0)
+            last_sent = sent
+            if self.progress is not None:
+                self.progress(ip, sent, total, rate)
+
+        try:
+            camera = self.fleet.camera(ip)
+            previous = self.__firmware_version(camera)
+            response = camera.upgrade_firmware(image, progress=progress, timeout=self.upload_timeout)
+            if response.status_code >= 400 or 'error' in self.__json(response):
+                raise RuntimeError(f"Upgrade rejected: {response.status_code} {response.text[:200]}")
+        except Exception as e:
+            return FleetResult(ip, error=e, elapsed=time.perf_counter() - start)
+        finally:
+            self.__adapt_window()
+        return ip, camera, previous, start, time.time()
+
+    def __wait_until_upgraded(self, ip, camera, previous, start, uploaded):
+        deadline = time.monotonic() + self.ready_timeout
+        version = None
+        while camera.wait_until_ready(deadline - time.monotonic(), since=uploaded):
+            # A version cached before the reboot would hide the new one
+            camera.clear_cache()
+            try:
+                version = self.__firmware_version(camera)
+            except Exception:
+                version = None
+            if version is not None and (version == self.version if self.version else version != previous):
+                return FleetResult(ip, value=version, elapsed=time.perf_counter() - start)
+            # Ready but still on the old firmware, so it hasn't started flashing yet
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+
+        error = TimeoutError(f"{ip} didn't come back with firmware {self.version or 'newer than ' + str(previous)} "
+                             f"within {self.ready_timeout} s, last seen {version}")
+        return FleetResult(ip, error=error, elapsed=time.perf_counter() - start)
+
+    def __record(self, result):
+        self.__finished += 1
+        if not result.ok:
+            self.__failed += 1
+        rate = self.__failed / self.__finished
+        if self.__failed > self.max_failure_rate * len(self.fleet) or \
+                (self.__finished >= self.min_sample and rate > self.max_failure_rate):
+            self.aborted = True
+        return result
+
+    def __adapt_window(self):
+        # Called as each upload ends, with the combined rate of every upload since the last call
+        with self.__lock:
+            now = time.monotonic()
+            started, sent = self.__sample_start
+            if now - started < 0.05:
+                return
+            bandwidth = (self.__bytes_sent - sent) / (now - started)
+            self.__sample_start = (now, self.__bytes_sent)
+
+            if bandwidth > self.__best_bandwidth * 1.1:
+                # Still gaining from more uploads at once, try one more
+                self.__best_bandwidth = bandwidth
+                self.__best_window = self.window
+                self.window = min(self.window + 1, self.max_window)
+            else:
+                # More uploads only split the uplink, go back to the smallest window that filled it
+                self.window = self.__best_window
+                # Let the best rate fade so a faster uplink later on is noticed
+                self.__best_bandwidth *= 0.95
+
+    @staticmethod
+    def __firmware_version(camera):
+        return FirmwareRollout.__json(camera.get_device_information(auth=False)).get('data', {}) \
+            .get('propertyList', {}).get('Version')
+
+    @staticmethod
+    def __json(response):
+        try:
+            body = response.json()
+        except ValueError:
+            return {}
+        return body if isinstance(body, dict) else {}
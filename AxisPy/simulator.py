@@ -0,0 +1,863 @@
+"""Local VAPIX simulator hosting any number of virtual Axis cameras
+
+Every virtual camera is a small asyncio HTTP/1.1 server with digest auth that
+answers the endpoints AxisConfigure uses, so fleet code can be exercised and
+measured without real hardware.
+
+    python -m AxisPy.simulator --count 1000 --port 20000 --latency 0.02 --jitter 0.01
+"""
+import asyncio
+import hashlib
+import ipaddress
+import json
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+# Values a fresh virtual camera starts with, the names AxisConfigure reads and writes
+DEFAULT_PARAMETERS = {
+    'Brand.Brand': 'AXIS',
+    'Brand.ProdFullName': 'AXIS Q1656 Box Camera',
+    'Brand.ProdNbr': 'Q1656',
+    'Brand.ProdShortName': 'AXIS Q1656',
+    'Image.I0.Appearance.Compression': '30',
+    'Image.I0.Appearance.Resolution': '1920x1080',
+    'Image.I0.MPEG.ZFPSMode': 'fixed',
+    'Image.I0.MPEG.ZGOPMode': 'fixed',
+    'Image.I0.MPEG.ZMaxGopLength': '300',
+    'Image.I0.MPEG.ZStrength': '20',
+    'Image.I0.RateControl.Mode': 'vbr',
+    'Image.I0.Stream.FPS': '0',
+    'ImageSource.I0.DayNight.IrCutFilter': 'auto',
+    'ImageSource.I0.Sensor.Brightness': '50',
+    'ImageSource.I0.Sensor.CaptureMode': '1',
+    'ImageSource.I0.Sensor.ColorLevel': '50',
+    'ImageSource.I0.Sensor.Contrast': '50',
+    'ImageSource.I0.Sensor.Defog': 'off',
+    'ImageSource.I0.Sensor.DefogEffect': '50',
+    'ImageSource.I0.Sensor.Exposure': 'auto',
+    'ImageSource.I0.Sensor.ExposureValue': '50',
+    'ImageSource.I0.Sensor.ExposureWindow': 'auto',
+    'ImageSource.I0.Sensor.LocalContrast': '50',
+    'ImageSource.I0.Sensor.Sharpness': '50',
+    'ImageSource.I0.Sensor.Stabilizer': 'off',
+    'ImageSource.I0.Sensor.StabilizerMargin': '20',
+    'ImageSource.I0.Sensor.WDR': 'on',
+    'ImageSource.I0.Sensor.WhiteBalance': 'auto',
+    'Network.BootProto': 'dhcp',
+    'Network.DNSServer1': '0.0.0.0',
+    'Network.DNSServer2': '0.0.0.0',
+    'Network.DefaultRouter': '0.0.0.0',
+    'Network.IPAddress': '0.0.0.0',
+    'Network.Resolver.ObtainFromDHCP': 'yes',
+    'Network.SubnetMask': '255.255.255.0',
+    'PTZ.Limit.L1.MaxZoom': '9999',
+    'PTZ.Limit.L1.MinFocus': '1',
+    'PTZ.UserAdv.U1.AdjustableZoomSpeedEnabled': 'true',
+    'PTZ.UserAdv.U1.ImageFreeze': 'off',
+    'PTZ.Various.V1.MaxProportionalSpeed': '100',
+    'PTZ.Various.V1.ProportionalSpeedEnabled': 'true',
+    'PTZ.Various.V1.ReturnToOverview': '0',
+    'Time.ObtainFromDHCP': 'no',
+    'Time.SyncSource': 'NTP',
+}
+
+_GROUPS = ('admin', 'operator', 'viewer', 'ptz', 'users')
+_FAILURE_MODES = ('reset', 'error', 'hang')
+_PARAMETER_SCHEMA = 'http://www.axis.com/ParameterDefinitionsSchema'
+_AUTH_FIELD = re.compile(r'(\w+)=(?:"([^"]*)"|([^\s,]*))')
+
+# Bodies past this size are counted rather than kept, only the start of an upload is ever read
+_BODY_KEPT = 64 * 1024
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+class _Reply:
+
+    def __init__(self, status=200, body=b'', content_type='text/plain', headers=None):
+        self.status = status
+        self.body = body if isinstance(body, bytes) else body.encode()
+        self.content_type = content_type
+        self.headers = headers or dict()
+
+
+class _Request:
+
+    def __init__(self, method, target, headers, body, size):
+        self.method = method
+        self.target = target
+        self.headers = headers
+        self.body = body
+        self.size = size
+        url = urlsplit(target)
+        self.path = url.path
+        self.endpoint = url.path[len('/axis-cgi/'):] if url.path.startswith('/axis-cgi/') else url.path.lstrip('/')
+        self.query = dict(parse_qsl(url.query, keep_blank_values=True))
+
+    def json(self):
+        try:
+            body = json.loads(self.body or b'{}')
+        except ValueError:
+            return None
+        return body if isinstance(body, dict) else None
+
+    def form(self):
+        # param.cgi and pwdgrp.cgi take their arguments from the query, a form body or both
+        values = dict(self.query)
+        if self.body and not self.body.lstrip().startswith(b'{'):
+            values.update(parse_qsl(self.body.decode('utf-8', 'replace'), keep_blank_values=True))
+        return values
+
+
+class VirtualCamera:
+    """One simulated camera, change its attributes at any time to alter how it behaves
+
+    Attributes
+    ----------
+    host: str
+        address the camera listens on
+    port: int
+        port the camera listens on, the real one once it is started
+    latency: float
+        seconds every answer is held back
+    jitter: float
+        up to this many seconds are added to or taken from the latency at random
+    failure_rate: float
+        fraction of requests that fail the way failure_mode says
+    failure_mode: str
+        'reset' closes the connection without an answer, 'error' answers
+        HTTP 500 and 'hang' never answers
+    reboot_duration: float
+        seconds the camera can't be reached after a restart or an upgrade
+    startup_duration: float
+        seconds systemready.cgi answers 'no' once the camera is reachable again
+    nonce_lifetime: float
+        seconds a digest nonce is accepted, older ones get a stale challenge
+    parameters: dict
+        param.cgi values without the 'root.' prefix
+    users: dict
+        username to password, only these can authenticate
+    stats: dict
+        count of requests, auth_challenges, failures, restarts and upgrades
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, username='root', password='pass', serial=None, version='11.11.73',
+                 latency=0.0, jitter=0.0, failure_rate=0.0, failure_mode='reset', reboot_duration=5.0,
+                 startup_duration=0.0, nonce_lifetime=300, rng=None):
+        if failure_mode not in _FAILURE_MODES:
+            raise ValueError(f"failure_mode must be one of {_FAILURE_MODES}")
+        self.host = host
+        self.port = port
+        self.serial = serial or os.urandom(6).hex().upper()
+        self.version = version
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.reboot_duration = reboot_duration
+        self.startup_duration = startup_duration
+        self.nonce_lifetime = nonce_lifetime
+        self.parameters = dict(DEFAULT_PARAMETERS)
+        self.users = {username: password}
+        self.groups = {group: [username] for group in _GROUPS}
+        self.light_enabled = False
+        self.time_zone = 'Etc/UTC'
+        self.ntp_servers = list()
+        self.overlays = dict()
+        self.stats = {'requests': 0, 'auth_challenges': 0, 'failures': 0, 'restarts': 0, 'upgrades': 0}
+        self.realm = f"AXIS_{self.serial}"
+        self.__rng = rng or random.Random()
+        self.__nonces = dict()
+        self.__server = None
+        self.__connections = set()
+        # Connection handler tasks, cancelled on stop so none outlives the loop
+        self.__tasks = set()
+        # Cameras in the field have been up for a while, a restart shows up as the uptime dropping
+        self.__booted_at = time.time() - 86400
+        self.__ready_at = 0.0
+        self.__rebooting = None
+        self.__next_overlay = 1
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def reachable(self):
+        return self.__server is not None
+
+    @property
+    def ready(self):
+        return self.reachable and time.time() >= self.__ready_at
+
+    async def start(self):
+        """Start listening, picks a free port if none was given"""
+
+        self.__server = await asyncio.start_server(self.__serve, self.host, self.port, backlog=128)
+        self.port = self.__server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and drop every open connection"""
+
+        tasks = set(self.__tasks)
+        if self.__rebooting is not None:
+            self.__rebooting.cancel()
+            tasks.add(self.__rebooting)
+            self.__rebooting = None
+        await self.__go_down()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def reboot(self, delay=0.1):
+        """Go down for reboot_duration, as if the camera was restarted
+
+        Parameters
+        ----------
+        delay: float
+            seconds the camera stays up first, long enough to send its answer
+        """
+
+        self.stats['restarts'] += 1
+        if self.__rebooting is None:
+            self.__rebooting = asyncio.get_running_loop().create_task(self.__reboot(delay))
+
+    async def __reboot(self, delay):
+        try:
+            await asyncio.sleep(delay)
+            await self.__go_down()
+            await asyncio.sleep(self.reboot_duration)
+            self.__booted_at = time.time()
+            self.__ready_at = self.__booted_at + self.startup_duration
+            # A new boot forgets every nonce handed out before it
+            self.__nonces.clear()
+            await self.start()
+        finally:
+            self.__rebooting = None
+
+    async def __go_down(self):
+        server, self.__server = self.__server, None
+        if server is not None:
+            server.close()
+        for writer in list(self.__connections):
+            writer.transport.abort()
+        if server is not None:
+            await server.wait_closed()
+
+    async def __serve(self, reader, writer):
+        task = asyncio.current_task()
+        self.__tasks.add(task)
+        self.__connections.add(writer)
+        try:
+            while self.reachable:
+                request = await self.__read_request(reader)
+                if request is None:
+                    break
+                reply = await self.__answer(request)
+                if reply is None:
+                    # A reset: gone without a word
+                    writer.transport.abort()
+                    break
+                self.__write_reply(writer, reply)
+                await writer.drain()
+                if request.headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Stopped, end quietly since asyncio's streams report a cancelled handler as an error
+            pass
+        finally:
+            self.__connections.discard(writer)
+            self.__tasks.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def __read_request(reader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return None
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = dict()
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        kept = bytearray()
+        size = 0
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                length = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if length == 0:
+                    await reader.readuntil(b'\r\n')
+                    break
+                chunk = await reader.readexactly(length)
+                await reader.readexactly(2)
+                size += length
+                kept += chunk[:max(_BODY_KEPT - len(kept), 0)]
+        else:
+            remaining = int(headers.get('content-length') or 0)
+            size = remaining
+            while remaining:
+                chunk = await reader.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(bytes(kept), remaining)
+                remaining -= len(chunk)
+                kept += chunk[:max(_BODY_KEPT - len(kept), 0)]
+        return _Request(method, target, headers, bytes(kept), size)
+
+    @staticmethod
+    def __write_reply(writer, reply):
+        head = [f"HTTP/1.1 {reply.status} {_REASONS.get(reply.status, '')}",
+                f"Content-Type: {reply.content_type}", f"Content-Length: {len(reply.body)}"]
+        head.extend(f"{name}: {value}" for name, value in reply.headers.items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + reply.body)
+
+    async def __answer(self, request):
+        self.stats['requests'] += 1
+        delay = max(self.latency + self.__rng.uniform(-self.jitter, self.jitter), 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.failure_rate and self.__rng.random() < self.failure_rate:
+            self.stats['failures'] += 1
+            if self.failure_mode == 'error':
+                return _Reply(500, 'Internal Server Error')
+            if self.failure_mode == 'hang':
+                # Held until the client gives up or the camera goes down
+                while self.reachable:
+                    await asyncio.sleep(1)
+            return None
+
+        handler = self.__handlers.get(request.endpoint)
+        if handler is None:
+            return _Reply(404, 'Not Found')
+        if not self.__is_public(request):
+            authorized, stale = self.__authorized(request)
+            if not authorized:
+                return self.__challenge(stale)
+        return await handler(self, request)
+
+    # Digest auth, MD5 with qop=auth as the cameras use it
+
+    def __is_public(self, request):
+        if request.endpoint not in self.__public:
+            return False
+        methods = self.__public[request.endpoint]
+        return methods is None or (request.json() or dict()).get('method') in methods
+
+    def __authorized(self, request):
+        # Returns whether the request may go ahead, and whether only its nonce was wrong
+        header = request.headers.get('authorization', '')
+        if not header.lower().startswith('digest '):
+            return False, False
+        fields = {name: quoted or plain for name, quoted, plain in _AUTH_FIELD.findall(header[7:])}
+        password = self.users.get(fields.get('username'))
+        nonce = fields.get('nonce')
+        if password is None or fields.get('realm') != self.realm or fields.get('uri') != request.target:
+            return False, False
+
+        ha1 = _md5(f"{fields['username']}:{self.realm}:{password}")
+        ha2 = _md5(f"{request.method}:{fields['uri']}")
+        if fields.get('qop'):
+            expected = _md5(f"{ha1}:{nonce}:{fields.get('nc')}:{fields.get('cnonce')}:{fields['qop']}:{ha2}")
+        else:
+            expected = _md5(f"{ha1}:{nonce}:{ha2}")
+        if fields.get('response') != expected:
+            return False, False
+        issued = self.__nonces.get(nonce)
+        if issued is None or time.monotonic() - issued > self.nonce_lifetime:
+            # Right password on an old nonce, the client only needs a new one
+            self.__nonces.pop(nonce, None)
+            return False, True
+        return True, False
+
+    def __challenge(self, stale=False):
+        self.stats['auth_challenges'] += 1
+        nonce = os.urandom(16).hex()
+        now = time.monotonic()
+        self.__nonces[nonce] = now
+        if len(self.__nonces) > 1024:
+            self.__nonces = {key: issued for key, issued in self.__nonces.items()
+                             if now - issued <= self.nonce_lifetime}
+        challenge = f'Digest realm="{self.realm}", nonce="{nonce}", algorithm=MD5, qop="auth"'
+        if stale:
+            challenge += ', stale=TRUE'
+        return _Reply(401, 'Unauthorized', headers={'WWW-Authenticate': challenge})
+
+    # Endpoints
+
+    async def __param(self, request):
+        values = request.form()
+        action = values.pop('action', None)
+        if action == 'update':
+            errors = list()
+            for name, value in values.items():
+                key = _strip_root(name)
+                if key in self.parameters:
+                    self.parameters[key] = value
+                else:
+                    errors.append(f"# Error: Error setting 'root.{key}' to '{value}'!")
+            return _Reply(200, '\r\n'.join(errors) + '\r\n' if errors else 'OK')
+        if action == 'list':
+            lines = list()
+            for group in _split_groups(values.get('group')):
+                matched = self.__matching_parameters(group)
+                if not matched:
+                    lines.append(f"# Error: Error -1 getting param in group '{group}'")
+                lines.extend(f"root.{name}={self.parameters[name]}" for name in matched)
+            return _Reply(200, '\n'.join(lines) + '\n')
+        if action == 'listdefinitions':
+            names = list()
+            for group in _split_groups(values.get('group')):
+                names.extend(name for name in self.__matching_parameters(group) if name not in names)
+            return _Reply(200, self.__parameter_definitions(names), 'text/xml')
+        return _Reply(200, f"# Error: Unknown action '{action}'\r\n")
+
+    def __matching_parameters(self, group):
+        group = _strip_root(group)
+        if group in ('', 'root'):
+            return list(self.parameters)
+        return [name for name in self.parameters if name == group or name.startswith(group + '.')]
+
+    def __parameter_definitions(self, names):
+        tree = dict()
+        for name in names:
+            node = tree
+            *groups, leaf = name.split('.')
+            for group in groups:
+                node = node.setdefault(group, dict())
+            node[leaf] = self.parameters[name]
+
+        def render(node):
+            parts = list()
+            for name, value in node.items():
+                if isinstance(value, dict):
+                    parts.append(f'<group name="{_xml(name)}">{render(value)}</group>')
+                else:
+                    parts.append(f'<parameter name="{_xml(name)}" value="{_xml(value)}" securityLevel="7714">'
+                                 f'<type><string/></type></parameter>')
+            return ''.join(parts)
+
+        return (f'<?xml version="1.0"?><parameterDefinitions xmlns="{_PARAMETER_SCHEMA}" version="1.0">'
+                f'<model>{_xml(self.parameters["Brand.ProdNbr"])}</model>'
+                f'<firmwareVersion>{_xml(self.version)}</firmwareVersion>'
+                f'<group name="root">{render(tree)}</group></parameterDefinitions>')
+
+    async def __device_info(self, request):
+        body = request.json() or dict()
+        properties = {
+            'Architecture': 'aarch64', 'Brand': self.parameters['Brand.Brand'], 'BuildDate': 'Jan 01 2024 00:00',
+            'HardwareID': '9A1', 'ProdFullName': self.parameters['Brand.ProdFullName'],
+            'ProdNbr': self.parameters['Brand.ProdNbr'], 'ProdShortName': self.parameters['Brand.ProdShortName'],
+            'ProdType': 'Box Camera', 'ProdVariant': '', 'SerialNumber': self.serial, 'Soc': 'Axis Artpec-8',
+            'SocSerialNumber': self.serial, 'Version': self.version, 'WebURL': 'http://www.axis.com',
+        }
+        return _json_reply(body, {'propertyList': properties}, api_version='1.2')
+
+    async def __light_control(self, request):
+        body = request.json() or dict()
+        method = body.get('method')
+        if method == 'getLightInformation':
+            light = {'lightID': 'led0', 'lightType': 'IR', 'enabled': self.light_enabled, 'synchronizeDayNightMode': True,
+                     'lightState': self.light_enabled, 'automaticIntensityMode': True, 'automaticAngleOfIlluminationMode': False,
+                     'nrOfLEDs': 1, 'error': False, 'errorInfo': ''}
+            return _json_reply(body, {'items': [light]})
+        if method in ('enableLight', 'disableLight'):
+            self.light_enabled = method == 'enableLight'
+            return _json_reply(body, dict())
+        return _json_error(body, 2002, f"Method not supported: {method}")
+
+    async def __dynamic_overlay(self, request):
+        body = request.json() or dict()
+        method = body.get('method')
+        params = body.get('params') or dict()
+        if method == 'list':
+            return _json_reply(body, {'textOverlays': list(self.overlays.values()), 'imageOverlays': []})
+        if method == 'addText':
+            identity = self.__next_overlay
+            self.__next_overlay += 1
+            self.overlays[identity] = {'camera': params.get('camera', 1), 'identity': identity, **params}
+            return _json_reply(body, {'camera': params.get('camera', 1), 'identity': identity})
+        if method in ('setText', 'remove'):
+            overlay = self.overlays.get(params.get('identity'))
+            if overlay is None:
+                return _json_error(body, 2102, f"Invalid identity: {params.get('identity')}")
+            if method == 'remove':
+                del self.overlays[overlay['identity']]
+            else:
+                overlay.update(params)
+            return _json_reply(body, dict())
+        return _json_error(body, 2002, f"Method not supported: {method}")
+
+    async def __time(self, request):
+        body = request.json() or dict()
+        method = body.get('method')
+        if method == 'getAll':
+            now = time.gmtime()
+            return _json_reply(body, {'dateTime': time.strftime('%Y-%m-%dT%H:%M:%SZ', now),
+                                      'localDateTime': time.strftime('%Y-%m-%dT%H:%M:%S', now),
+                                      'dstEnabled': False, 'posixTimeZone': 'UTC0', 'timeZone': self.time_zone,
+                                      'maxSupportedYear': 2037})
+        if method == 'setTimeZone':
+            self.time_zone = (body.get('params') or dict()).get('timeZone', self.time_zone)
+            return _json_reply(body, dict())
+        return _json_error(body, 2002, f"Method not supported: {method}")
+
+    async def __ntp(self, request):
+        body = request.json() or dict()
+        method = body.get('method')
+        if method == 'setNTPClientConfiguration':
+            params = body.get('params') or dict()
+            self.ntp_servers = list(params.get('staticServersHostnames') or params.get('staticServers') or [])
+            return _json_reply(body, dict())
+        if method == 'getNTPInfo':
+            return _json_reply(body, {'timeSyncSource': 'static', 'servers': self.ntp_servers})
+        return _json_error(body, 2002, f"Method not supported: {method}")
+
+    async def __users(self, request):
+        values = request.json() or request.form()
+        action = values.get('action')
+        user = values.get('user')
+        if action == 'get':
+            lines = [f'{group}="{",".join(members)}"' for group, members in self.groups.items()]
+            return _Reply(200, '\r\n'.join(lines) + '\r\n')
+        if action == 'add':
+            if user in self.users:
+                return _html_reply(f"Error: account {user} already exist.")
+            self.users[user] = values.get('pwd', '')
+            for group in [values.get('grp', 'users')] + (values.get('sgrp') or '').split(':'):
+                if group:
+                    self.groups.setdefault(group, list()).append(user)
+            return _html_reply(f"Created account {user}.")
+        if action == 'update' and user in self.users:
+            self.users[user] = values.get('pwd', self.users[user])
+            return _html_reply(f"Modified account {user}.")
+        if action == 'remove' and user in self.users:
+            del self.users[user]
+            for members in self.groups.values():
+                if user in members:
+                    members.remove(user)
+            return _html_reply(f"Removed account {user}.")
+        return _html_reply("Error: unknown action or account.")
+
+    async def __disks(self, request):
+        return _Reply(200, '<?xml version="1.0"?><root><disks numberofdisks="1">'
+                           '<disk diskid="SD_DISK" name="" totalsize="62367744" freesize="62367744" cleanuplevel="90"'
+                           ' cleanupmaxage="7" cleanuppolicy="fifo" locked="no" full="no" readonly="no" status="OK"'
+                           ' filesystem="ext4" group="S0" requiredfilesystem="none" encryptionenabled="false"'
+                           ' diskencrypted="false"/></disks></root>', 'text/xml')
+
+    async def __capture_mode(self, request):
+        body = request.json() or dict()
+        method = body.get('method')
+        if method == 'setCaptureMode':
+            self.parameters['ImageSource.I0.Sensor.CaptureMode'] = str(body.get('captureModeId'))
+            return _json_reply(body, dict())
+        if method == 'getCaptureModes':
+            return _json_reply(body, [{'channel': 0, 'captureMode': [
+                {'captureModeId': 1, 'enabled': True, 'maxFPS': 30, 'description': '1920x1080 (16:9) @ 30 fps'}]}])
+        return _json_error(body, 2002, f"Method not supported: {method}")
+
+    async def __system_ready(self, request):
+        body = request.json() or dict()
+        timeout = float((body.get('params') or dict()).get('timeout') or 0)
+        wait = min(self.__ready_at - time.time(), timeout)
+        if wait > 0:
+            # Long poll, answer as soon as the camera is ready
+            await asyncio.sleep(wait)
+        return _json_reply(body, {'systemready': 'yes' if self.ready else 'no', 'needsetup': 'no',
+                                  'uptime': str(int(time.time() - self.__booted_at)),
+                                  'bootid': f"{self.__booted_at:.0f}", 'previewmode': -1}, api_version='1.1')
+
+    async def __restart(self, request):
+        self.reboot()
+        return _Reply(200, '<html><head><meta http-equiv="refresh" content="60;URL=/"></head>'
+                           '<body>Restarting camera, please wait...</body></html>', 'text/html')
+
+    async def __firmware(self, request):
+        # The JSON request is the whole body, or the 'data' part of a multipart upload with the image after it
+        body = request.json()
+        image_size = 0
+        if body is None:
+            body, image_size = _multipart_request(request)
+        method = (body or dict()).get('method')
+        if method == 'status':
+            return _json_reply(body, {'activeFirmwareVersion': self.version, 'activeFirmwarePart': 'A',
+                                      'inactiveFirmwarePart': 'B', 'isCommitted': True})
+        if method == 'upgrade':
+            if not image_size:
+                return _json_error(body, 400, "No firmware image in request")
+            self.stats['upgrades'] += 1
+            self.version = _next_version(self.version)
+            self.reboot()
+            return _json_reply(body, {'firmwareVersion': self.version})
+        return _json_error(body or dict(), 2002, f"Method not supported: {method}")
+
+    __handlers = {
+        'param.cgi': __param,
+        'basicdeviceinfo.cgi': __device_info,
+        'lightcontrol.cgi': __light_control,
+        'dynamicoverlay/dynamicoverlay.cgi': __dynamic_overlay,
+        'time.cgi': __time,
+        'ntp.cgi': __ntp,
+        'pwdgrp.cgi': __users,
+        'disks/list.cgi': __disks,
+        'capturemode.cgi': __capture_mode,
+        'systemready.cgi': __system_ready,
+        'restart.cgi': __restart,
+        'firmwaremanagement.cgi': __firmware,
+        'firmwareupgrade.cgi': __firmware,
+    }
+    # Endpoints answered without auth, None for every method
+    __public = {
+        'systemready.cgi': None,
+        'basicdeviceinfo.cgi': ('getAllUnrestrictedProperties',),
+    }
+
+
+class CameraSimulator:
+    """Hosts many virtual cameras in one asyncio loop
+
+    Each camera gets its own port on host, or with loopback_addresses its own
+    127.x.y.z address on the same port. Linux routes all of 127.0.0.0/8 to
+    loopback, other systems need the addresses added first.
+
+    Run it in the current loop with 'async with', or on a thread of its own
+    with a plain 'with' so blocking clients can use it.
+
+    Parameters
+    ----------
+    count: int
+        number of virtual cameras
+    host: str
+        address the cameras listen on, the first address with loopback_addresses
+    port: int
+        port of the first camera, the next cameras take the ports after it. 0
+        picks free ports. With loopback_addresses every camera uses this port
+    loopback_addresses: bool
+        give every camera its own loopback address instead of its own port
+    seed: int, optional
+        seed for latency jitter and failures, for repeatable runs
+    **camera_kwargs
+        passed to every VirtualCamera, i.e. latency=0.02, jitter=0.01,
+        failure_rate=0.01, reboot_duration=30, username or password
+
+    Example
+    -------
+    with CameraSimulator(1000, latency=0.02, jitter=0.01) as simulator:
+        with AxisFleet(simulator.devices) as fleet:
+            fleet.run_all('get_configuration_details')
+    """
+
+    def __init__(self, count=1, host='127.0.0.1', port=0, loopback_addresses=False, seed=None, **camera_kwargs):
+        if loopback_addresses and not port:
+            raise ValueError("loopback_addresses needs a port")
+        rng = random.Random(seed)
+        first = ipaddress.ip_address(host)
+        self.cameras = list()
+        for index in range(count):
+            camera_host = str(first + index) if loopback_addresses else host
+            camera_port = port if loopback_addresses or not port else port + index
+            self.cameras.append(VirtualCamera(camera_host, camera_port, serial=f"ACCC8E{index:06X}",
+                                              rng=random.Random(rng.random()), **camera_kwargs))
+        self.__loop = None
+        self.__thread = None
+
+    def __len__(self):
+        return len(self.cameras)
+
+    @property
+    def devices(self):
+        """Addresses of the cameras as AxisFleet devices, dicts of ip and port"""
+
+        return [{'ip': camera.host, 'port': camera.port} for camera in self.cameras]
+
+    @property
+    def stats(self):
+        """Totals of the stats of every camera"""
+
+        totals = dict()
+        for camera in self.cameras:
+            for name, value in camera.stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    async def start(self):
+        """Start every camera, a few hundred at a time"""
+
+        for index in range(0, len(self.cameras), 256):
+            await asyncio.gather(*(camera.start() for camera in self.cameras[index:index + 256]))
+
+    async def stop(self):
+        """Stop every camera"""
+
+        await asyncio.gather(*(camera.stop() for camera in self.cameras))
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def __enter__(self):
+        self.start_in_thread()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop_thread()
+
+    def start_in_thread(self):
+        """Run the cameras on a daemon thread, returns once they are all listening"""
+
+        self.__loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, args=(started,), name='CameraSimulator', daemon=True)
+        self.__thread.start()
+        started.wait()
+        # Surfaces any error the cameras hit while starting
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), self.__loop).result()
+
+    def stop_thread(self):
+        """Stop the cameras and the thread started by start_in_thread"""
+
+        if self.__loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self.__loop).result()
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__loop = self.__thread = None
+
+    def call(self, func, *args):
+        """Run a function on the simulator thread, i.e. to change a camera while it is serving
+
+        Returns
+        -------
+        object
+            what func returned, awaited first if it was a coroutine function
+        """
+
+        async def run():
+            result = func(*args)
+            return await result if asyncio.iscoroutine(result) else result
+
+        return asyncio.run_coroutine_threadsafe(run(), self.__loop).result()
+
+    def __run(self, started):
+        asyncio.set_event_loop(self.__loop)
+        try:
+            self.__loop.run_until_complete(self.start())
+        finally:
+            started.set()
+        self.__loop.run_forever()
+        self.__loop.run_until_complete(self.__loop.shutdown_asyncgens())
+        self.__loop.close()
+
+
+def _md5(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def _strip_root(name):
+    return name[len('root.'):] if name.startswith('root.') else name
+
+
+def _split_groups(groups):
+    return [group.strip() for group in (groups or '').split(',') if group.strip()]
+
+
+def _xml(value):
+    return str(value).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def _json_reply(request_body, data, api_version='1.0'):
+    body = {'apiVersion': request_body.get('apiVersion', api_version), 'method': request_body.get('method'),
+            'data': data}
+    if 'context' in request_body:
+        body['context'] = request_body['context']
+    return _Reply(200, json.dumps(body), 'application/json')
+
+
+def _json_error(request_body, code, message):
+    body = {'apiVersion': request_body.get('apiVersion', '1.0'), 'method': request_body.get('method'),
+            'error': {'code': code, 'message': message}}
+    return _Reply(200, json.dumps(body), 'application/json')
+
+
+def _html_reply(message):
+    return _Reply(200, f"<html><head><title>{message}</title></head><body><p>{message}</p></body></html>",
+                  'text/html')
+
+
+def _multipart_request(request):
+    # Returns the JSON of the 'data' part and roughly how much came after it, which is the image
+    match = re.search(r'boundary="?([^";]+)"?', request.headers.get('content-type', ''))
+    if match is None:
+        return None, 0
+    boundary = b'--' + match.group(1).encode()
+    for part in request.body.split(boundary):
+        head, _, content = part.partition(b'\r\n\r\n')
+        if b'name="data"' in head:
+            try:
+                body = json.loads(content.rstrip(b'\r\n'))
+            except ValueError:
+                return None, 0
+            return body, request.size - request.body.index(content) - len(content)
+    return None, 0
+
+
+def _next_version(version):
+    parts = version.split('.')
+    if parts[-1].isdigit():
+        parts[-1] = str(int(parts[-1]) + 1)
+    else:
+        parts.append('1')
+    return '.'.join(parts)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve virtual Axis cameras until interrupted")
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=20000)
+    parser.add_argument('--loopback-addresses', action='store_true')
+    parser.add_argument('--username', default='root')
+    parser.add_argument('--password', default='pass')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--failure-mode', choices=_FAILURE_MODES, default='reset')
+    parser.add_argument('--reboot-duration', type=float, default=5.0)
+    parser.add_argument('--startup-duration', type=float, default=0.0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    async def serve():
+        simulator = CameraSimulator(args.count, args.host, args.port, args.loopback_addresses, args.seed,
+                                    username=args.username, password=args.password, latency=args.latency,
+                                    jitter=args.jitter, failure_rate=args.failure_rate,
+                                    failure_mode=args.failure_mode, reboot_duration=args.reboot_duration,
+                                    startup_duration=args.startup_duration)
+        async with simulator:
+            first, last = simulator.cameras[0], simulator.cameras[-1]
+            print(f"{len(simulator)} cameras from {first.host}:{first.port} to {last.host}:{last.port}", flush=True)
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
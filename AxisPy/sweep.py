@@ -0,0 +1,149 @@
+import asyncio
+import ipaddress
+
+import httpx
+
+from AxisPy.axis_discovery import AxisDevice
+
+_DEVICE_INFO_URL = 'http://{}:{}/axis-cgi/basicdeviceinfo.cgi'
+_DEVICE_INFO_REQUEST = {'apiVersion': '1.2', 'method': 'getAllUnrestrictedProperties'}
+
+
+class _RateLimiter:
+    # Spaces probe starts evenly so at most `rate` begin per second
+
+    def __init__(self, rate):
+        self.__interval = 1 / rate if rate else 0
+        self.__next = 0
+        self.__lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.__interval:
+            return
+        async with self.__lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(self.__next, now)
+            self.__next = start + self.__interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def probe(client, ip, port=80):
+    """Ask one address for its Axis device information
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient
+        client to send the probe with
+    ip: str
+        address to probe
+    port: int
+        HTTP port
+
+    Returns
+    -------
+    AxisDevice
+        the device, None if nothing Axis answered
+    """
+
+    # IPv6 addresses need brackets in a URL
+    host = f"[{ip}]" if ':' in ip else ip
+    try:
+        response = await client.post(_DEVICE_INFO_URL.format(host, port), json=_DEVICE_INFO_REQUEST)
+        properties = response.json()['data']['propertyList']
+    except (httpx.HTTPError, OSError, ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(properties, dict):
+        return None
+    device = AxisDevice.from_properties(ip, properties)
+    device.port = port
+    return device
+
+
+async def sweep(network, port=80, concurrency=512, rate=None, connect_timeout=0.3, timeout=1.0):
+    """Find Axis devices by probing every address of a network over HTTP
+
+    For networks where multicast is filtered and mDNS discovery finds nothing.
+    Each address gets the unauthenticated basicdeviceinfo.cgi
+    getAllUnrestrictedProperties call, and devices are yielded as they answer.
+
+    Parameters
+    ----------
+    network: str
+        network in CIDR notation, i.e. '10.20.0.0/16'
+    port: int
+        HTTP port of the devices
+    concurrency: int
+        max number of probes in flight, keep it below the open file limit
+    rate: float, optional
+        max number of probes started per second, unlimited if None
+    connect_timeout: float
+        seconds to wait for a TCP connection, most addresses never answer so
+        this decides how long a sweep takes
+    timeout: float
+        seconds to wait for a device that did connect to answer
+
+    Yields
+    ------
+    AxisDevice
+        each device found, with serial, product and firmware filled in
+    """
+
+    addresses = iter(ipaddress.ip_network(network, strict=False).hosts())
+    found = asyncio.Queue()
+    limiter = _RateLimiter(rate)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    client_timeout = httpx.Timeout(timeout, connect=connect_timeout)
+
+    async with httpx.AsyncClient(limits=limits, timeout=client_timeout) as client:
+        async def worker():
+            # Workers share one address iterator, so a /16 never sits in memory as a list
+            for address in addresses:
+                await limiter.wait()
+                device = await probe(client, str(address), port)
+                if device is not None:
+                    await found.put(device)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        done = asyncio.ensure_future(asyncio.gather(*workers))
+        try:
+            while True:
+                getter = asyncio.ensure_future(found.get())
+                await asyncio.wait((getter, done), return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                while not found.empty():
+                    yield found.get_nowait()
+                done.result()
+                return
+        finally:
+            for task in workers:
+                task.cancel()
+            # Collecting done as well, a caller that stops early would leave its CancelledError unretrieved
+            await asyncio.gather(done, *workers, return_exceptions=True)
+
+
+def sweep_axis_devices(network, **kwargs):
+    """Sweep a network and return the devices the same way get_only_axis_devices does
+
+    Parameters
+    ----------
+    network: str
+        network in CIDR notation, i.e. '10.20.0.0/16'
+    **kwargs
+        passed on to sweep
+
+    Returns
+    -------
+    dict
+        device name to IP address
+    """
+
+    async def collect():
+        # The address that answered the probe, IPv6 ones included
+        return {device.name: device.addresses[0] async for device in sweep(network, **kwargs)}
+
+    return asyncio.run(collect())
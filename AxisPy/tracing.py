@@ -0,0 +1,344 @@
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Span of the call being run, _NOT_SAMPLED below a root span that lost the sampling draw
+_current_span = contextvars.ContextVar('axispy_current_span', default=None)
+_NOT_SAMPLED = object()
+
+# Methods left out of tracing: context managers would only time their own creation
+_UNTRACED = {'batch', 'deferred_restart', 'close'}
+
+
+class Span:
+    """One timed piece of work, written out as a Chrome trace event when it ends
+
+    Attributes
+    ----------
+    name: str
+        what was done, i.e. 'get_configuration_details' or 'POST param.cgi'
+    category: str
+        'method', 'http' or the phase of an HTTP attempt
+    args: dict
+        extra details shown with the span, add to it while the span runs
+    """
+
+    __slots__ = ('tracer', 'name', 'category', 'args', 'span_id', 'parent_id', 'lane', 'start')
+
+    def __init__(self, tracer, name, category, args, parent):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.span_id = tracer._next_id()
+        self.parent_id = parent.span_id if isinstance(parent, Span) else None
+        self.lane = _lane()
+        self.start = time.perf_counter()
+
+
+class Tracer:
+    """Records a tree of spans per sampled call and writes them to a trace file
+
+    The file uses the Chrome trace event format, open it in Perfetto
+    (ui.perfetto.dev) or chrome://tracing. Sampling is decided once per
+    outermost call, so a sampled call is always recorded with every call and
+    HTTP attempt inside it.
+
+    Parameters
+    ----------
+    path: str
+        file the trace events are written to, replaced when the tracer opens it
+    sample_rate: float
+        fraction of outermost calls that are recorded, 1 records everything
+
+    Example
+    -------
+    tracer = Tracer('commissioning.trace.json', sample_rate=1)
+    camera = AxisConfigure('192.168.0.90', tracer=tracer)
+    camera.get_configuration_details()
+    tracer.close()
+    """
+
+    def __init__(self, path='axispy.trace.json', sample_rate=0.01):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.__file = None
+        self.__lock = threading.Lock()
+        self.__ids = itertools.count(1)
+        self.__pid = os.getpid()
+        # Chrome timestamps are microseconds, anchored to the wall clock so separate files line up
+        self.__origin = time.perf_counter()
+        self.__epoch_us = time.time() * 1e6
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _next_id(self):
+        return next(self.__ids)
+
+    @contextmanager
+    def span(self, name, category='method', **args):
+        """Time a block as a child of the current span
+
+        Yields
+        ------
+        Span
+            the span, None if the call isn't sampled
+        """
+
+        parent = _current_span.get()
+        if parent is _NOT_SAMPLED or (parent is None and random.random() >= self.sample_rate):
+            token = _current_span.set(_NOT_SAMPLED)
+            try:
+                yield None
+            finally:
+                _current_span.reset(token)
+            return
+
+        span = Span(self, name, category, args, parent)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.args['error'] = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def finish(self, span, end=None):
+        """Write a span out"""
+
+        end = time.perf_counter() if end is None else end
+        event = {'name': span.name, 'cat': span.category, 'ph': 'X', 'pid': self.__pid, 'tid': span.lane,
+                 'ts': self.__timestamp(span.start), 'dur': max((end - span.start) * 1e6, 0),
+                 'args': {**span.args, 'span_id': span.span_id, 'parent_id': span.parent_id}}
+        line = json.dumps(event, default=str)
+        with self.__lock:
+            if self.__file is None:
+                self.__file = open(self.path, 'w')
+                self.__file.write('[\n')
+            else:
+                self.__file.write(',\n')
+            self.__file.write(line)
+
+    def close(self):
+        """Finish the trace file, the tracer opens a new one if it is used again"""
+
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.write('\n]\n')
+                self.__file.close()
+                self.__file = None
+
+    def __timestamp(self, perf_time):
+        return self.__epoch_us + (perf_time - self.__origin) * 1e6
+
+
+def record_phase(name, start, end=None, **args):
+    """Record a finished phase of the current span, if it is sampled
+
+    Parameters
+    ----------
+    name: str
+        phase, i.e. 'connect' or 'server'
+    start: float
+        time.perf_counter() the phase started at
+    end: float, optional
+        time.perf_counter() the phase ended at, now if not given
+    """
+
+    parent = _current_span.get()
+    if not isinstance(parent, Span):
+        return
+    span = Span(parent.tracer, name, 'phase', args, parent)
+    span.start = start
+    parent.tracer.finish(span, end)
+
+
+def current_span():
+    """Get the span being recorded, None if there is none or it isn't sampled"""
+
+    span = _current_span.get()
+    return span if isinstance(span, Span) else None
+
+
+def traced(func):
+    """Record a span for every call of a camera method while the camera has a tracer"""
+
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_inner(self, *args, **kwargs):
+            tracer = self.tracer
+            if tracer is None:
+                return await func(self, *args, **kwargs)
+            with tracer.span(name):
+                return await func(self, *args, **kwargs)
+        return async_inner
+
+    @functools.wraps(func)
+    def inner(self, *args, **kwargs):
+        tracer = self.tracer
+        if tracer is None:
+            return func(self, *args, **kwargs)
+        if inspect.iscoroutinefunction(self._send_request):
+            # A sync method inherited by the async client, its work happens when the result is awaited
+            result = func(self, *args, **kwargs)
+            return _traced_awaitable(tracer, name, result) if inspect.isawaitable(result) else result
+        with tracer.span(name):
+            return func(self, *args, **kwargs)
+    return inner
+
+
+async def _traced_awaitable(tracer, name, awaitable):
+    with tracer.span(name):
+        return await awaitable
+
+
+def trace_public_methods(cls):
+    """Class decorator applying traced to every public method defined on the class"""
+
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith('_') or name in _UNTRACED or not inspect.isfunction(attribute):
+            continue
+        setattr(cls, name, traced(attribute))
+    return cls
+
+
+def run_in_context(func):
+    """Wrap a callable so it runs inside the caller's span when handed to another thread"""
+
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
+
+
+def _lane():
+    # Chrome draws spans by thread, give every asyncio task its own row as well. No task can be running
+    # unless asyncio was imported, so it is looked up instead of imported with the sync client
+    asyncio = sys.modules.get('asyncio')
+    try:
+        task = asyncio.current_task() if asyncio is not None else None
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class _TracedConnectionMixin:
+    # Phases of each exchange, recorded under the HTTP attempt span when it is sampled
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            # Includes the DNS lookup, which is nothing for cameras addressed by IP
+            record_phase('connect', start, host=self.host)
+            self._axispy_connected = time.perf_counter()
+
+    def request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            super().request(*args, **kwargs)
+        finally:
+            # urllib3 connects inside request(), that part is already its own phase
+            record_phase('send', max(start, getattr(self, '_axispy_connected', 0)))
+            self._axispy_sent = time.perf_counter()
+
+    def getresponse(self, *args, **kwargs):
+        start = getattr(self, '_axispy_sent', None) or time.perf_counter()
+        response = super().getresponse(*args, **kwargs)
+        record_phase('auth challenge' if response.status == 401 else 'server', start, status=response.status)
+        return response
+
+
+class _TracedHTTPConnection(_TracedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TracedHTTPSConnection(_TracedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TracedHTTPConnection
+
+
+class _TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TracedHTTPSConnection
+
+
+_TRACED_POOL_CLASSES = {'http': _TracedHTTPConnectionPool, 'https': _TracedHTTPSConnectionPool}
+
+
+class TracingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report connect, send and server phases to the current span
+
+    Costs a context variable lookup per phase when nothing is being traced.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _TRACED_POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        # Requests sent through proxies= get their pools here, SOCKS managers keep their own connection classes
+        if not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = _TRACED_POOL_CLASSES
+        return manager
+
+
+class HttpxPhaseRecorder:
+    """httpx 'trace' extension turning httpcore events into phases of the current span"""
+
+    # Event that starts each phase and the event that ends it
+    __phases = {
+        'connection.connect_tcp': ('connect', 'connection.connect_tcp'),
+        'connection.start_tls': ('tls', 'connection.start_tls'),
+        'http11.send_request_headers': ('send', 'http11.send_request_body'),
+        'http11.receive_response_headers': ('server', 'http11.receive_response_headers'),
+        'http2.send_request_headers': ('send', 'http2.send_request_body'),
+        'http2.receive_response_headers': ('server', 'http2.receive_response_headers'),
+    }
+    __ends = {end: phase for phase, end in __phases.values()}
+
+    def __init__(self):
+        self.__started = dict()
+
+    async def __call__(self, event, info):
+        name, _, stage = event.rpartition('.')
+        if stage == 'started' and name in self.__phases:
+            self.__started[self.__phases[name][0]] = time.perf_counter()
+            return
+        phase = self.__ends.get(name)
+        if phase is None or stage == 'started':
+            return
+        start = self.__started.pop(phase, None)
+        if start is None:
+            return
+        args = dict()
+        if stage == 'failed':
+            args['error'] = repr(info.get('exception'))
+        elif phase == 'server':
+            status = info.get('return_value', (None, None))[1]
+            args['status'] = status
+            if status == 401:
+                phase = 'auth challenge'
+        record_phase(phase, start, **args)
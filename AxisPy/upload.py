@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import time
+
+
+class MultipartFileBody:
+    """multipart/form-data body that streams a file instead of loading it
+
+    The parts before and after the file are built up front, the file itself
+    is read a chunk at a time while the request is being sent, so memory use
+    doesn't grow with the size of the file. The body can be rewound, which
+    lets digest auth send it again after a 401.
+
+    Parameters
+    ----------
+    source: str, os.PathLike, mmap.mmap or bytes-like
+        file to send, or a buffer already holding it such as an mmap shared
+        between several uploads of the same image
+    fields: dict, optional
+        part name to JSON-serializable value, sent before the file as
+        application/json parts
+    file_field: str
+        part name of the file
+    filename: str, optional
+        file name sent with the file part, taken from source if it is a path
+    chunk_size: int
+        bytes read from the file at a time
+    progress: callable, optional
+        called as progress(bytes_sent, total_bytes, bytes_per_second) every
+        time a chunk is handed to the connection
+    use_mmap: bool
+        memory-map a file path instead of reading it, lets the OS share the
+        pages between uploads running at the same time
+
+    Attributes
+    ----------
+    content_type: str
+        value for the Content-Type header, including the boundary
+    """
+
+    def __init__(self, source, fields=None, file_field='fileData', filename=None, chunk_size=64 * 1024,
+                 progress=None, use_mmap=False):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.__file = None
+        self.__owned_buffer = None
+
+        if isinstance(source, (str, os.PathLike)):
+            filename = filename or os.path.basename(source)
+            self.__file = open(source, 'rb')
+            self.__size = os.fstat(self.__file.fileno()).st_size
+            if use_mmap and self.__size:
+                self.__buffer = self.__owned_buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.__file.close()
+                self.__file = None
+            else:
+                self.__buffer = None
+        else:
+            self.__buffer = memoryview(source).cast('B')
+            self.__size = len(self.__buffer)
+
+        boundary = os.urandom(16).hex()
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        head = b''
+        for name, value in (fields or {}).items():
+            head += (f'--{boundary}\r\n'
+                     f'Content-Disposition: form-data; name="{name}"\r\n'
+                     f'Content-Type: application/json\r\n\r\n'
+                     f'{json.dumps(value)}\r\n').encode()
+        head += (f'--{boundary}\r\n'
+                 f'Content-Disposition: form-data; name="{file_field}"; filename="{filename or file_field}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode()
+        self.__head = head
+        self.__tail = f'\r\n--{boundary}--\r\n'.encode()
+        self.__length = len(self.__head) + self.__size + len(self.__tail)
+        self.__position = 0
+        self.__started = None
+
+    def __len__(self):
+        return self.__length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        """Read the next part of the body
+
+        Parameters
+        ----------
+        size: int
+            max number of bytes to return, the rest of the body if negative
+
+        Returns
+        -------
+        bytes
+            the data, empty once the whole body has been read
+        """
+
+        if size is None or size < 0:
+            size = self.__length - self.__position
+        if self.__position == 0 or self.__started is None:
+            self.__started = time.monotonic()
+
+        chunk = b''
+        while size > 0 and self.__position < self.__length:
+            piece = self.__read_at(self.__position, size)
+            chunk += piece
+            self.__position += len(piece)
+            size -= len(piece)
+
+        if chunk and self.progress is not None:
+            elapsed = time.monotonic() - self.__started
+            self.progress(self.__position, self.__length, self.__position / elapsed if elapsed > 0 else 0.0)
+        return chunk
+
+    def tell(self):
+        return self.__position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.__position
+        elif whence == os.SEEK_END:
+            offset += self.__length
+        self.__position = min(max(offset, 0), self.__length)
+        # A rewind is a new attempt, so the throughput starts over
+        self.__started = None
+        return self.__position
+
+    def close(self):
+        """Close the file or mapping opened for the body
+
+        A buffer passed in as source is left open.
+        """
+
+        if self.__owned_buffer is not None:
+            self.__owned_buffer.close()
+            self.__owned_buffer = None
+        elif isinstance(self.__buffer, memoryview):
+            # Let the caller close their mmap once we are done with it
+            self.__buffer.release()
+        self.__buffer = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __read_at(self, position, size):
+        # Each read stays inside one of the three segments, read() joins them
+        file_start = len(self.__head)
+        file_end = file_start + self.__size
+        if position < file_start:
+            return self.__head[position:min(file_start, position + size)]
+        if position >= file_end:
+            offset = position - file_end
+            return self.__tail[offset:offset + size]
+
+        offset = position - file_start
+        size = min(size, self.__size - offset)
+        if self.__buffer is not None:
+            return bytes(self.__buffer[offset:offset + size])
+        self.__file.seek(offset)
+        return self.__file.read(size)
+
+
+class AsyncMultipartFileBody:
+    """Async iterable view of a MultipartFileBody for httpx
+
+    httpx sends sync iterables only from a sync client. Every iteration starts
+    from the beginning of the body, so digest auth can send it again.
+
+    Parameters
+    ----------
+    body: MultipartFileBody
+        body to send
+    """
+
+    def __init__(self, body):
+        self.body = body
+
+    async def __aiter__(self):
+        self.body.seek(0)
+        for chunk in self.body:
+            yield chunk
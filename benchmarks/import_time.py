@@ -0,0 +1,90 @@
+"""Import time benchmark for the AxisPy modules
+
+Imports each module in a fresh interpreter several times and reports the
+median wall time. Also fails if a module pulls in a heavy dependency it is
+supposed to load lazily.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-ms 250 --output import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported as a side effect of importing the key
+LAZY_DEPENDENCIES = {
+    'AxisPy.camera': ['asyncio', 'bs4', 'zeroconf', 'xml.etree.ElementTree', 'html.parser'],
+    'AxisPy.check_axis_response': ['bs4', 'xml.etree.ElementTree', 'html.parser'],
+    'AxisPy.axis_discovery': ['zeroconf'],
+}
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    """Import a module in fresh interpreters
+
+    Parameters
+    ----------
+    module: str
+        dotted module name
+    runs: int
+        number of interpreters to start
+
+    Returns
+    -------
+    dict
+        median and min milliseconds, and any lazy dependencies that got loaded
+    """
+
+    timings = list()
+    loaded = set()
+    code = _PROBE.format(module=module, lazy=LAZY_DEPENDENCIES.get(module, []))
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True, capture_output=True,
+                                text=True).stdout
+        result = json.loads(output)
+        timings.append(result['seconds'] * 1000)
+        loaded.update(result['loaded'])
+    return {'median_ms': statistics.median(timings), 'min_ms': min(timings), 'eagerly_loaded': sorted(loaded)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=list(LAZY_DEPENDENCIES))
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--max-ms', type=float, help='fail if any median import time is above this')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = dict()
+    failed = False
+    for module in args.modules:
+        result = results[module] = measure(module, args.runs)
+        print(f"{module:32} median {result['median_ms']:8.1f} ms   min {result['min_ms']:8.1f} ms")
+        if result['eagerly_loaded']:
+            print(f"    eagerly imports {', '.join(result['eagerly_loaded'])}")
+            failed = True
+        if args.max_ms is not None and result['median_ms'] > args.max_ms:
+            print(f"    slower than {args.max_ms} ms")
+            failed = True
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
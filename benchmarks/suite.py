@@ -0,0 +1,355 @@
+"""Benchmark suite for AxisPy against the bundled VAPIX simulator
+
+Each benchmark starts its own simulator (AxisPy.simulator) in a separate
+process, so the client doesn't share the GIL with the cameras it talks to.
+Results are printed and, with --output, written as JSON so runs of different
+releases can be compared.
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py calls parse --runs 200 --output results.json
+    python benchmarks/suite.py fleet --fleet-sizes 1000 10000
+
+The discovery benchmark gives every camera its own 127.0.3.x address, which
+needs Linux or loopback aliases added beforehand.
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from AxisPy import version as axispy_version  # noqa: E402
+from AxisPy.camera import CONFIGURATION_GROUPS, AxisConfigure  # noqa: E402
+from AxisPy.check_axis_response import check_response  # noqa: E402
+from AxisPy.fleet import AxisFleet  # noqa: E402
+
+# Representative calls, each a name, the method and its arguments
+CALLS = (
+    ('get_time_zone', 'get_time_zone', ()),
+    ('get_parameters', 'get_parameters', (['Image.I0.Stream.FPS'],)),
+    ('get_device_information', 'get_device_information', ()),
+    ('get_dynamic_overlays', 'get_dynamic_overlays', ()),
+    ('set_time_zone', 'set_time_zone', ('Etc/UTC',)),
+    ('set_wdr', 'set_wdr', (True,)),
+    ('set_ntp_server', 'set_ntp_server', ('pool.ntp.org',)),
+)
+
+
+# Cameras served by one simulator process, each needs a listening socket and a connection
+CAMERAS_PER_PROCESS = 2000
+
+
+@contextmanager
+def simulated_cameras(count, port, loopback_addresses=False, host='127.0.0.1', **options):
+    """Run the VAPIX simulator in child processes
+
+    Large fleets are split over several processes, so no process runs out of
+    file descriptors and the simulator gets more than one core.
+
+    Parameters
+    ----------
+    count: int
+        number of virtual cameras
+    port: int
+        port of the first camera, every camera's port with loopback_addresses
+    loopback_addresses: bool
+        give every camera its own address, counting up from host
+    host: str
+        address of the first camera
+    **options
+        simulator options, i.e. latency=0.02
+
+    Yields
+    ------
+    list
+        AxisFleet devices, dicts of ip and port
+    """
+
+    first = ipaddress.ip_address(host)
+    if loopback_addresses:
+        devices = [{'ip': str(first + index), 'port': port} for index in range(count)]
+    else:
+        devices = [{'ip': host, 'port': port + index} for index in range(count)]
+
+    processes = list()
+    try:
+        for index in range(0, count, CAMERAS_PER_PROCESS):
+            shard = devices[index:index + CAMERAS_PER_PROCESS]
+            command = [sys.executable, '-m', 'AxisPy.simulator', '--count', str(len(shard)),
+                       '--port', str(shard[0]['port']), '--host', shard[0]['ip']]
+            if loopback_addresses:
+                command.append('--loopback-addresses')
+            for name, value in options.items():
+                command.extend((f"--{name.replace('_', '-')}", str(value)))
+            processes.append(subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.PIPE,
+                                              stderr=subprocess.PIPE, text=True))
+        for process in processes:
+            # The simulator prints its address range once every camera is listening
+            if not process.stdout.readline():
+                raise RuntimeError(f"simulator didn't start: {process.stderr.read().strip()}")
+        yield devices
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def summarize(samples):
+    """Summarize timings
+
+    Parameters
+    ----------
+    samples: list
+        seconds taken by each run
+
+    Returns
+    -------
+    dict
+        runs, median, p95, p99, min and max in milliseconds
+    """
+
+    ordered = sorted(samples)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+    return {'runs': len(ordered), 'median_ms': statistics.median(ordered) * 1000, 'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99), 'min_ms': ordered[0] * 1000, 'max_ms': ordered[-1] * 1000}
+
+
+def time_runs(func, runs, warmup=3):
+    # Warm up first, so connections and the digest nonce are already in place
+    for _ in range(warmup):
+        func()
+    samples = list()
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_calls(args):
+    """Latency of single calls to a camera with no latency of its own, the client's overhead"""
+
+    results = dict()
+    with simulated_cameras(1, args.port, seed=args.seed) as devices:
+        with AxisConfigure(devices[0]['ip'], port=devices[0]['port']) as camera:
+            for name, method, arguments in CALLS:
+                results[name] = time_runs(lambda: getattr(camera, method)(*arguments), args.runs)
+                _print(name, results[name])
+    return results
+
+
+def bench_parse(args):
+    """Cost of check_response for each kind of answer the cameras give"""
+
+    with simulated_cameras(1, args.port, seed=args.seed, reboot_duration=0) as devices:
+        with AxisConfigure(devices[0]['ip'], port=devices[0]['port']) as camera:
+            responses = {
+                'ok_text': (camera.update_parameters({'Image.I0.Stream.FPS': 25}), 'param.cgi', None),
+                'json': (camera.get_date_time(), 'time.cgi', 'getAll'),
+                'json_list': (camera.get_overlay_list(), 'dynamicoverlay/dynamicoverlay.cgi', 'list'),
+                # Picked by Content-Type, param.cgi is registered for its plain text answers
+                'xml_definitions': (camera.get_parameter_definitions(CONFIGURATION_GROUPS), None, None),
+                'xml_disks': (camera.get_disk_list(), None, None),
+                'html_user_created': (camera._send_request('GET', 'pwdgrp.cgi', check=False, params={
+                    'action': 'add', 'user': 'benchmark', 'pwd': 'benchmark', 'grp': 'users'}), 'pwdgrp.cgi', None),
+                # Last, the camera restarts after answering
+                'html_restart': (camera._send_request('GET', 'restart.cgi', check=False), 'restart.cgi', None),
+            }
+
+    results = dict()
+    for name, (response, endpoint, api_method) in responses.items():
+        number = 200
+        samples = list()
+        for _ in range(max(args.runs // 10, 5)):
+            start = time.perf_counter()
+            for _ in range(number):
+                check_response(response, endpoint, api_method)
+            samples.append((time.perf_counter() - start) / number)
+        result = results[name] = {'median_us': statistics.median(samples) * 1e6, 'min_us': min(samples) * 1e6,
+                                  'bytes': len(response.content)}
+        print(f"{name:32} median {result['median_us']:9.1f} us   min {result['min_us']:9.1f} us"
+              f"   {result['bytes']} bytes")
+    return results
+
+
+def bench_configuration(args):
+    """get_configuration_details end to end, its sections read concurrently and one after another"""
+
+    results = dict()
+    with simulated_cameras(1, args.port, seed=args.seed, latency=args.latency, jitter=args.jitter) as devices:
+        with AxisConfigure(devices[0]['ip'], port=devices[0]['port'], timeout=5) as camera:
+            for name, concurrent in (('concurrent', True), ('sequential', False)):
+                results[name] = time_runs(lambda: camera.get_configuration_details(concurrent=concurrent),
+                                          max(args.runs // 5, 5), warmup=1)
+                _print(f"get_configuration_details {name}", results[name])
+    return results
+
+
+def bench_upload(args):
+    """Firmware upload throughput, the image streamed from disk"""
+
+    size = args.firmware_mb * 1024 * 1024
+    with tempfile.NamedTemporaryFile(suffix='.bin') as image:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(args.firmware_mb):
+            image.write(chunk)
+        image.flush()
+
+        results = dict()
+        runs = 3
+        # A fresh camera for every upload, the one upgraded before is rebooting
+        with simulated_cameras(2 * runs, args.port, seed=args.seed) as devices:
+            devices = iter(devices)
+            for name, use_mmap in (('read', False), ('mmap', True)):
+                samples = list()
+                for _ in range(runs):
+                    device = next(devices)
+                    with AxisConfigure(device['ip'], port=device['port']) as camera:
+                        start = time.perf_counter()
+                        response = camera.upgrade_firmware(image.name, use_mmap=use_mmap)
+                        samples.append(time.perf_counter() - start)
+                    if not response.ok:
+                        raise RuntimeError(f"upload failed: {response.text}")
+                result = results[name] = summarize(samples)
+                result['megabytes_per_second'] = size / 1024 / 1024 / (result['median_ms'] / 1000)
+                print(f"upload {args.firmware_mb} MB {name:18} median {result['median_ms']:8.1f} ms"
+                      f"   {result['megabytes_per_second']:8.1f} MB/s")
+    return results
+
+
+def bench_discovery(args):
+    """Time from the start of a network sweep until every camera is identified"""
+
+    from AxisPy.sweep import sweep
+
+    async def run(network):
+        start = time.perf_counter()
+        first = None
+        found = 0
+        async for _ in sweep(network, port=args.port, connect_timeout=1.0, timeout=2.0):
+            found += 1
+            first = first or time.perf_counter() - start
+        return found, first, time.perf_counter() - start
+
+    count = args.discovery_count
+    with simulated_cameras(count, args.port, loopback_addresses=True, host='127.0.3.1', seed=args.seed,
+                           latency=args.latency, jitter=args.jitter):
+        found, first, elapsed = asyncio.run(run('127.0.3.0/24'))
+    result = {'cameras': count, 'found': found, 'first_ms': (first or 0) * 1000, 'all_ms': elapsed * 1000}
+    print(f"sweep of 127.0.3.0/24            found {found}/{count}   first {result['first_ms']:8.1f} ms"
+          f"   all {result['all_ms']:8.1f} ms")
+    return result
+
+
+def bench_fleet(args):
+    """Operations per second across a fleet, the first pass connects and authenticates, the second reuses both"""
+
+    results = dict()
+    for size in args.fleet_sizes:
+        result = results[str(size)] = dict()
+        with simulated_cameras(size, args.port, seed=args.seed, latency=args.latency, jitter=args.jitter) as devices:
+            with AxisFleet(devices, max_workers=args.max_workers, timeout=10) as fleet:
+                for name in ('cold', 'warm'):
+                    start = time.perf_counter()
+                    outcomes = list(fleet.run('get_time_zone'))
+                    elapsed = time.perf_counter() - start
+                    errors = dict()
+                    for outcome in outcomes:
+                        if not outcome.ok:
+                            kind = type(outcome.error).__name__
+                            errors[kind] = errors.get(kind, 0) + 1
+                    failed = sum(errors.values())
+                    result[name] = {'seconds': elapsed, 'operations_per_second': size / elapsed, 'failed': failed,
+                                    'errors': errors, 'latency': summarize([outcome.elapsed for outcome in outcomes])}
+                    print(f"fleet of {size:<6} {name:14} {result[name]['operations_per_second']:9.1f} ops/s"
+                          f"   p99 {result[name]['latency']['p99_ms']:8.1f} ms   {failed} failed")
+    return results
+
+
+BENCHMARKS = {
+    'calls': bench_calls,
+    'parse': bench_parse,
+    'configuration': bench_configuration,
+    'upload': bench_upload,
+    'discovery': bench_discovery,
+    'fleet': bench_fleet,
+}
+
+
+def _print(name, result):
+    print(f"{name:32} median {result['median_ms']:8.2f} ms   p95 {result['p95_ms']:8.2f} ms"
+          f"   p99 {result['p99_ms']:8.2f} ms")
+
+
+def _raise_open_file_limit():
+    # A fleet of 10k cameras keeps a connection open to each of them, in the client and in the simulator
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else 65536, hard))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmarks', nargs='*', default=list(BENCHMARKS), help=', '.join(BENCHMARKS))
+    parser.add_argument('--runs', type=int, default=100, help='timed runs of each call')
+    parser.add_argument('--latency', type=float, default=0.02, help='camera latency in seconds, for end to end runs')
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--port', type=int, default=20000, help='first port the simulated cameras use')
+    parser.add_argument('--firmware-mb', type=int, default=64)
+    parser.add_argument('--discovery-count', type=int, default=200, help='cameras on 127.0.3.0/24 to discover')
+    parser.add_argument('--fleet-sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--max-workers', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    _raise_open_file_limit()
+
+    results = dict()
+    for name in args.benchmarks:
+        print(f"== {name}")
+        results[name] = BENCHMARKS[name](args)
+
+    if args.output:
+        report = {
+            'axispy': axispy_version, 'commit': _git_commit(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'settings': {name: value for name, value in vars(args).items() if name not in ('benchmarks', 'output')},
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
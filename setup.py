@@ -16,6 +16,9 @@ setup(
     install_requires=[
         "requests"
     ],
+    extras_require={
+        "async": ["httpx>=0.26"],
+    },
     classifiers=[
         "Intended Audience :: Developers",
         "Programming Language :: Python :: 3.10",
@@ -0,0 +1,23 @@
+import pytest
+
+from AxisPy.simulator import CameraSimulator
+
+
+@pytest.fixture
+def simulator():
+    """Start a CameraSimulator in a background thread, stopped after the test
+
+    Call it with the number of cameras and any VirtualCamera options.
+    """
+
+    started = list()
+
+    def start(count=1, **options):
+        simulator = CameraSimulator(count, seed=0, **options)
+        simulator.start_in_thread()
+        started.append(simulator)
+        return simulator
+
+    yield start
+    for simulator in started:
+        simulator.stop_thread()
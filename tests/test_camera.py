@@ -0,0 +1,25 @@
+import time
+
+import pytest
+
+from AxisPy.camera import AxisConfigure
+
+
+class JsonReply:
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+@pytest.mark.parametrize('body', [[], 'starting', {'data': 'yes'}, {'data': {'systemready': 'no'}}])
+def test_unexpected_systemready_bodies_are_not_ready(body):
+    assert not AxisConfigure._is_system_ready(JsonReply(body))
+
+
+def test_systemready_body_after_the_restart_is_ready():
+    body = {'data': {'systemready': 'yes', 'uptime': '5'}}
+    assert AxisConfigure._is_system_ready(JsonReply(body), since=time.time() - 10)
+    assert not AxisConfigure._is_system_ready(JsonReply(body), since=time.time())
@@ -0,0 +1,109 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from AxisPy.camera import AxisConfigure
+from AxisPy.cassette import Cassette, CassetteMiss
+
+
+class GzipHandler(BaseHTTPRequestHandler):
+    # Answers every POST with a gzip encoded systemready reply
+    body = {'apiVersion': '1.0', 'data': {'systemready': 'yes', 'uptime': '3600'}}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        content = gzip.compress(json.dumps(self.body).encode())
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gzip_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GzipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def test_replay_answers_without_the_camera(simulator, tmp_path):
+    sim = simulator(latency=0.05)
+    device = sim.devices[0]
+    path = tmp_path / 'configuration.cassette.gz'
+
+    with Cassette(path, mode='record') as cassette:
+        details = AxisConfigure(device['ip'], port=device['port'], timeout=5,
+                                cassette=cassette).get_configuration_details()
+    sim.stop_thread()
+
+    for pace in (False, True):
+        cassette = Cassette(path, pace=pace)
+        camera = AxisConfigure(device['ip'], port=device['port'], timeout=5, cassette=cassette)
+        started = time.perf_counter()
+        assert camera.get_configuration_details(concurrent=False) == details
+        elapsed = time.perf_counter() - started
+        if pace:
+            # Seven sections, each at least one recorded exchange of 50 ms
+            assert elapsed >= 0.35
+        else:
+            assert elapsed < 0.35
+
+    with pytest.raises(CassetteMiss):
+        AxisConfigure(device['ip'], port=device['port'], cassette=Cassette(path)).get_device_information()
+
+
+def test_async_replay_answers_without_the_camera(simulator, tmp_path):
+    pytest.importorskip('httpx')
+    from AxisPy.async_camera import AsyncAxisConfigure
+
+    sim = simulator()
+    device = sim.devices[0]
+    path = tmp_path / 'configuration.cassette'
+
+    async def read(cassette):
+        async with AsyncAxisConfigure(device['ip'], port=device['port'], timeout=5, cassette=cassette) as camera:
+            return await camera.get_configuration_details()
+
+    with Cassette(path, mode='record') as cassette:
+        details = asyncio.run(read(cassette))
+    sim.stop_thread()
+
+    assert asyncio.run(read(Cassette(path))) == details
+
+
+def test_replay_of_gzip_encoded_responses(gzip_server, tmp_path):
+    host, port = gzip_server
+    path = tmp_path / 'gzip.cassette'
+
+    with Cassette(path, mode='record') as cassette:
+        assert AxisConfigure(host, port=port, cassette=cassette).get_system_ready().json() == GzipHandler.body
+
+    assert AxisConfigure(host, port=port, cassette=Cassette(path)).get_system_ready().json() == GzipHandler.body
+
+
+def test_async_replay_of_gzip_encoded_responses(gzip_server, tmp_path):
+    pytest.importorskip('httpx')
+    from AxisPy.async_camera import AsyncAxisConfigure
+
+    host, port = gzip_server
+    path = tmp_path / 'gzip.cassette'
+
+    async def read(cassette):
+        async with AsyncAxisConfigure(host, port=port, cassette=cassette) as camera:
+            return (await camera.get_system_ready()).json()
+
+    with Cassette(path, mode='record') as cassette:
+        assert asyncio.run(read(cassette)) == GzipHandler.body
+    assert asyncio.run(read(Cassette(path))) == GzipHandler.body
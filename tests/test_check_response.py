@@ -0,0 +1,111 @@
+import json
+
+import pytest
+import requests
+
+from AxisPy.check_axis_response import VapixResult, check_response
+
+
+def make_response(body, status=200, content_type=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body.encode()
+    response.encoding = 'utf-8'
+    if content_type is not None:
+        response.headers['Content-Type'] = content_type
+    return response
+
+
+def json_body(method, data=None, **extra):
+    return json.dumps({'apiVersion': '1.0', 'method': method, 'data': data, **extra})
+
+
+def test_param_cgi_ok():
+    result = check_response(make_response('OK'), 'param.cgi')
+    assert result
+    assert result.data == 'OK'
+    assert result.error is None
+
+
+def test_param_cgi_errors_are_collected():
+    body = "# Error: Error setting 'root.Image.I0.Stream.FPS' to '99'!\r\n"
+    result = check_response(make_response(body), 'param.cgi')
+    assert not result
+    assert result.error == "Error: Error setting 'root.Image.I0.Stream.FPS' to '99'!"
+
+
+def test_endpoint_picks_the_validator_over_the_body():
+    # A JSON body is no answer param.cgi gives on success
+    body = json_body('getAll', {})
+    assert not check_response(make_response(body, content_type='application/json'), 'param.cgi')
+    assert check_response(make_response(body, content_type='application/json'), 'time.cgi')
+
+
+@pytest.mark.parametrize('body, content_type, expected', [
+    (json_body('getAll', {}), 'application/json', True),
+    (json_body('getAll', {}), None, True),
+    ('<root><Success/></root>', 'text/xml', True),
+    ('<root><Error><ErrorDescription>No disk</ErrorDescription></Error></root>', None, False),
+    ('OK', 'text/plain', True),
+])
+def test_content_type_picks_the_validator_without_an_endpoint(body, content_type, expected):
+    assert bool(check_response(make_response(body, content_type=content_type))) is expected
+
+
+def test_xml_error_description():
+    body = '<root><Error><ErrorDescription>No disk</ErrorDescription></Error></root>'
+    result = check_response(make_response(body), 'disks/properties/setrequiredfs.cgi')
+    assert result.error == 'No disk'
+
+
+def test_json_errors_and_methods():
+    error = json_body('setText', error={'code': 2104, 'message': 'Invalid parameter'})
+    assert check_response(make_response(error), 'dynamicoverlay/dynamicoverlay.cgi').error == \
+        '2104: Invalid parameter'
+
+    body = make_response(json_body('enableLight', {}))
+    assert check_response(body, 'lightcontrol.cgi', 'enableLight')
+    assert check_response(body, 'lightcontrol.cgi', 'disableLight').error == \
+        'Expected method disableLight, got enableLight'
+    assert not check_response(make_response(json_body('list', {})), 'dynamicoverlay/dynamicoverlay.cgi')
+    assert not check_response(make_response('[]'), 'time.cgi')
+    assert not check_response(make_response('not json'), 'time.cgi')
+
+
+def test_html_answers():
+    restart = '<html><head><meta http-equiv="refresh" content="60"></head><body>Restarting</body></html>'
+    assert check_response(make_response(restart, content_type='text/html'), 'restart.cgi')
+    assert not check_response(make_response('<html><body>Busy</body></html>'), 'restart.cgi')
+
+    created = '<html><head><title>Created account bob.</title></head></html>'
+    assert check_response(make_response(created), 'pwdgrp.cgi')
+    assert check_response(make_response('OK'), 'pwdgrp.cgi')
+
+
+def test_http_errors_and_missing_responses_fail():
+    result = check_response(make_response('Unauthorized', status=401), 'param.cgi')
+    assert not result
+    assert result.error == 'HTTP 401'
+    assert check_response(None).error == 'No response'
+
+
+def test_results_compare_like_the_bools_they_replace():
+    assert VapixResult(True) == True  # noqa: E712
+    assert VapixResult(False) == False  # noqa: E712
+    assert VapixResult(True) != False  # noqa: E712
+    assert bool(VapixResult(False, error='x')) is False
+
+
+def test_failed_results_are_not_none():
+    # The old cascade returned None for error statuses, a VapixResult never compares equal to it
+    result = check_response(make_response('Server error', status=500), 'time.cgi')
+    assert result is not None
+    assert not result == None  # noqa: E711
+    assert result != None  # noqa: E711
+    assert not result
+
+
+def test_results_stay_hashable():
+    result = VapixResult(True)
+    assert {result: 1}[result] == 1
+    assert repr(VapixResult(False, error='HTTP 500')) == "VapixResult(success=False, error='HTTP 500')"
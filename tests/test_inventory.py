@@ -0,0 +1,90 @@
+import sqlite3
+
+from AxisPy.axis_discovery import AxisDevice
+from AxisPy.inventory import DeviceInventory
+
+
+def make_device(serial, address, port=80, product=None, firmware=None, name=None):
+    device = AxisDevice(name or f"AXIS M3106-L Mk II - {serial}", [address], port=port)
+    device.serial = serial
+    device.product = product
+    device.firmware = firmware
+    return device
+
+
+def test_devices_are_reloaded_by_serial(tmp_path):
+    path = str(tmp_path / 'inventory.db')
+    inventory = DeviceInventory(path, identify=False)
+    assert inventory.add_or_update(make_device('accc8e000001', '10.0.0.1', product='M3106-L Mk II',
+                                               firmware='11.11.73'))
+    assert inventory.add_or_update(make_device('ACCC8E000002', '10.0.0.2', port=8080, product='M3106-L Mk II'))
+    inventory.close()
+
+    inventory = DeviceInventory(path, identify=False)
+    assert len(inventory) == 2
+    assert 'accc8e000001' in inventory
+    first = inventory.get('accc8e000001')
+    assert (first.serial, first.product, first.firmware, first.port) == ('ACCC8E000001', 'M3106-L Mk II',
+                                                                          '11.11.73', 80)
+    assert inventory.ip_for('ACCC8E000002') == '10.0.0.2'
+    assert inventory.get('ACCC8E000002').port == 8080
+    assert {device.serial for device in inventory.by_product('M3106-L Mk II')} == {'ACCC8E000001',
+                                                                                  'ACCC8E000002'}
+    assert inventory.get('ACCC8E999999') is None
+    inventory.close()
+
+
+def test_updates_keep_what_was_known(tmp_path):
+    inventory = DeviceInventory(str(tmp_path / 'inventory.db'), identify=False)
+    inventory.add_or_update(make_device('ACCC8E000001', '10.0.0.1', product='M3106-L Mk II', firmware='11.11.73'))
+    inventory.add_or_update(make_device('ACCC8E000001', '10.0.0.9'))
+
+    device = inventory.get('ACCC8E000001')
+    assert device.ip == '10.0.0.9'
+    assert (device.product, device.firmware) == ('M3106-L Mk II', '11.11.73')
+    inventory.close()
+
+
+def test_removed_devices_stay_removed(tmp_path):
+    path = str(tmp_path / 'inventory.db')
+    inventory = DeviceInventory(path, identify=False)
+    device = make_device('ACCC8E000001', '10.0.0.1', product='M3106-L Mk II')
+    inventory.add_or_update(device)
+    inventory.add_or_update(make_device('ACCC8E000002', '10.0.0.2'))
+    inventory.remove_name(device.name)
+    inventory.remove('accc8e000002')
+    inventory.close()
+
+    inventory = DeviceInventory(path, identify=False)
+    assert len(inventory) == 0
+    assert inventory.by_product('M3106-L Mk II') == []
+    inventory.close()
+
+
+def test_non_axis_devices_and_devices_without_serial_are_ignored(tmp_path):
+    inventory = DeviceInventory(str(tmp_path / 'inventory.db'), identify=False)
+    assert not inventory.add_or_update(make_device('ACCC8E000001', '10.0.0.1', name='Printer'))
+    assert not inventory.add_or_update(make_device(None, '10.0.0.2', name='AXIS M3106-L Mk II'))
+    assert len(inventory) == 0
+    inventory.close()
+
+
+def test_inventories_without_a_port_column_are_migrated(tmp_path):
+    path = str(tmp_path / 'inventory.db')
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE devices (serial TEXT PRIMARY KEY, name TEXT, addresses TEXT, product TEXT, "
+               "firmware TEXT, properties TEXT, last_seen REAL)")
+    db.execute("INSERT INTO devices VALUES ('ACCC8E000001', 'AXIS M3106-L Mk II - ACCC8E000001', '[\"10.0.0.1\"]', "
+               "'M3106-L Mk II', '10.12.0', NULL, 0)")
+    db.commit()
+    db.close()
+
+    inventory = DeviceInventory(path, identify=False)
+    device = inventory.get('ACCC8E000001')
+    assert (device.ip, device.port, device.product) == ('10.0.0.1', 80, 'M3106-L Mk II')
+    inventory.add_or_update(make_device('ACCC8E000002', '10.0.0.2', port=8080))
+    inventory.close()
+
+    inventory = DeviceInventory(path, identify=False)
+    assert inventory.get('ACCC8E000002').port == 8080
+    inventory.close()
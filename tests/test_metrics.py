@@ -0,0 +1,86 @@
+import re
+
+from AxisPy.camera import AxisConfigure
+from AxisPy.metrics import RequestMetrics
+
+# A sample line of the Prometheus text format: name, optional labels, value
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\\n]|\\.)*",?)*\})? \S+$')
+
+
+def recorded_metrics():
+    metrics = RequestMetrics(buckets=(0.1, 1))
+    labels = {'site': 'north "2"'}
+    metrics.record('10.0.0.1', 'param.cgi', 'list', 0.05, status=200, bytes_sent=10, bytes_received=20,
+                   auth_challenges=1, labels=labels)
+    metrics.record('10.0.0.1', 'param.cgi', 'list', 0.5, status=200, labels=labels)
+    metrics.record('10.0.0.1', 'param.cgi', 'list', 2, error='ConnectTimeout', timed_out=True, labels=labels)
+    metrics.record_validation_failure('10.0.0.1', 'param.cgi', 'list', labels=labels)
+    return metrics
+
+
+def test_prometheus_text_format():
+    lines = recorded_metrics().prometheus().splitlines()
+
+    seen_types = set()
+    for line in lines:
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert kind in ('histogram', 'counter')
+            seen_types.add(name)
+        elif line.startswith('# HELP '):
+            continue
+        else:
+            assert SAMPLE.match(line), line
+            # Every sample follows the TYPE line of its family
+            assert any(line.startswith(name) for name in seen_types), line
+    assert len(seen_types) == 8
+
+
+def test_prometheus_histogram_and_counters():
+    text = recorded_metrics().prometheus()
+    labels = 'camera="10.0.0.1",endpoint="param.cgi",method="list",site="north \\"2\\""'
+
+    # Buckets are cumulative and end with +Inf
+    assert f'axispy_request_duration_seconds_bucket{{{labels},le="0.1"}} 1\n' in text
+    assert f'axispy_request_duration_seconds_bucket{{{labels},le="1.0"}} 2\n' in text
+    assert f'axispy_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3\n' in text
+    assert f'axispy_request_duration_seconds_sum{{{labels}}} 2.55\n' in text
+    assert f'axispy_request_duration_seconds_count{{{labels}}} 3\n' in text
+    assert f'axispy_requests_total{{{labels},status="200"}} 2\n' in text
+    assert f'axispy_request_errors_total{{{labels},error="ConnectTimeout"}} 1\n' in text
+    assert f'axispy_request_timeouts_total{{{labels}}} 1\n' in text
+    assert f'axispy_auth_challenges_total{{{labels}}} 1\n' in text
+    assert f'axispy_request_sent_bytes_total{{{labels}}} 10\n' in text
+    assert f'axispy_response_received_bytes_total{{{labels}}} 20\n' in text
+    assert f'axispy_validation_failures_total{{{labels}}} 1\n' in text
+
+
+def test_prometheus_prefix_and_empty_metrics():
+    text = RequestMetrics().prometheus(prefix='cameras')
+    assert '# TYPE cameras_request_duration_seconds histogram' in text
+    assert all(line.startswith('#') for line in text.splitlines())
+
+
+def test_camera_requests_are_recorded(simulator):
+    sim = simulator()
+    device = sim.devices[0]
+    attempts = list()
+    metrics = RequestMetrics(callback=attempts.append)
+    camera = AxisConfigure(device['ip'], port=device['port'], timeout=5, metrics=metrics,
+                           metrics_labels={'site': 'lab'})
+
+    camera.get_time_zone()
+    camera.get_time_zone()
+
+    [entry] = metrics.snapshot()
+    assert (entry['camera'], entry['endpoint'], entry['method']) == (f"{device['ip']}:{device['port']}",
+                                                                     'time.cgi', 'getAll')
+    assert entry['labels'] == {'site': 'lab'}
+    assert entry['count'] == 2
+    assert entry['statuses'] == {200: 2}
+    assert entry['auth_challenges'] == 1
+    assert entry['bytes_received'] > 0
+    assert [attempt['status'] for attempt in attempts] == [200, 200]
+
+    metrics.clear()
+    assert metrics.snapshot() == []
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from AxisPy.camera import AxisConfigure
+from AxisPy.restart import PendingRestart
+
+
+def connect(simulator):
+    device = simulator.devices[0]
+    return AxisConfigure(device['ip'], port=device['port'], timeout=5)
+
+
+def test_changes_in_the_block_share_one_restart(simulator):
+    sim = simulator(reboot_duration=0.2)
+    camera = connect(sim)
+
+    with camera.deferred_restart(deadline=30) as restart:
+        assert camera.set_capture_mode(1)
+        assert camera.restart() is True
+        with camera.deferred_restart() as inner:
+            camera.restart()
+        assert inner is restart
+        assert sim.stats['restarts'] == 0
+
+    assert restart.requested == ['capture mode', 'restart', 'restart']
+    assert restart.result is True
+    assert not restart
+    assert sim.stats['restarts'] == 1
+    assert sim.cameras[0].parameters['ImageSource.I0.Sensor.CaptureMode'] == '1'
+
+
+def test_a_block_without_restarts_restarts_nothing(simulator):
+    sim = simulator()
+    camera = connect(sim)
+
+    with camera.deferred_restart() as restart:
+        camera.set_fps(25)
+
+    assert restart.requested == []
+    assert restart.result is None
+    assert sim.stats['restarts'] == 0
+
+
+def test_a_failed_block_leaves_the_restart_pending(simulator):
+    sim = simulator()
+    camera = connect(sim)
+
+    with pytest.raises(RuntimeError):
+        with camera.deferred_restart() as restart:
+            camera.restart()
+            raise RuntimeError("changes went wrong")
+
+    assert restart
+    assert sim.stats['restarts'] == 0
+
+    # Outside the block restarts go out straight away again
+    assert camera.restart()
+    assert sim.stats['restarts'] == 1
+
+
+def test_async_changes_in_the_block_share_one_restart(simulator):
+    pytest.importorskip('httpx')
+    from AxisPy.async_camera import AsyncAxisConfigure
+
+    sim = simulator(reboot_duration=0.2)
+    device = sim.devices[0]
+
+    async def configure():
+        async with AsyncAxisConfigure(device['ip'], port=device['port'], timeout=5) as camera:
+            async with camera.deferred_restart(deadline=30) as restart:
+                await camera.set_capture_mode(1)
+                await camera.restart()
+            return restart
+
+    restart = asyncio.run(configure())
+    assert restart.requested == ['capture mode', 'restart']
+    assert restart.result is True
+    assert sim.stats['restarts'] == 1
+
+
+def test_pending_restart():
+    pending = PendingRestart()
+    assert not pending
+    pending.add('capture mode')
+    pending.add()
+    assert pending.pending
+    assert pending.requested == ['capture mode', 'restart']
+    pending.result = False
+    assert not pending
@@ -0,0 +1,212 @@
+import asyncio
+import gc
+import logging
+import time
+
+import pytest
+import requests
+
+from AxisPy.camera import AxisConfigure
+from AxisPy.fleet import AxisFleet
+from AxisPy.resilience import CameraUnavailable
+from AxisPy.rollout import FirmwareRollout
+
+
+def connect(simulator, index=0, **options):
+    device = simulator.devices[index]
+    return AxisConfigure(device['ip'], port=device['port'], **{'timeout': 5, **options})
+
+
+def test_batch_sends_one_update_and_parses_results(simulator):
+    sim = simulator()
+    camera = connect(sim)
+    before = sim.stats['requests']
+
+    with camera.batch() as batch:
+        assert camera.set_wdr(True) is None
+        assert camera.set_fps(25) is None
+        batch.add({'Image.I0.Stream.Unknown': 1})
+
+    assert batch.results == {'ImageSource.I0.Sensor.WDR': True, 'Image.I0.Stream.FPS': True,
+                             'Image.I0.Stream.Unknown': False}
+    parameters = sim.cameras[0].parameters
+    assert parameters['ImageSource.I0.Sensor.WDR'] == 'on'
+    assert parameters['Image.I0.Stream.FPS'] == '25'
+    # The first request takes the digest challenge, then the update goes through
+    assert sim.stats['requests'] - before == 2
+
+
+def test_batch_skips_parameters_the_camera_already_has(simulator):
+    sim = simulator()
+    camera = connect(sim)
+    camera.set_fps(25)
+
+    with camera.batch(only_if_changed=True) as batch:
+        camera.set_fps(25)
+        camera.set_wdr(False)
+
+    assert batch.skipped == ['Image.I0.Stream.FPS']
+    assert batch.results == {'Image.I0.Stream.FPS': True, 'ImageSource.I0.Sensor.WDR': True}
+    assert sim.cameras[0].parameters['ImageSource.I0.Sensor.WDR'] == 'off'
+
+
+def test_cached_reads_are_dropped_by_writes(simulator):
+    sim = simulator()
+    camera = connect(sim, cache_ttl=60)
+    time_zone = camera.get_time_zone()
+
+    before = sim.stats['requests']
+    assert camera.get_time_zone() == time_zone
+    assert sim.stats['requests'] == before
+
+    camera.set_time_zone('Europe/Stockholm')
+    assert camera.get_time_zone() == 'Europe/Stockholm'
+
+
+def test_time_writes_drop_cached_time_parameters(simulator):
+    sim = simulator()
+    camera = connect(sim, cache_ttl=60)
+    camera.get_parameters(['Time'])
+    camera.get_parameters(['Image.I0.Stream'])
+
+    assert camera.set_ntp_server('10.0.0.1')
+    before = sim.stats['requests']
+    assert camera.get_parameters(['Time'])['Time.SyncSource'] == 'NTP'
+    assert sim.stats['requests'] == before + 1
+    # Groups the NTP settings don't show stay cached
+    camera.get_parameters(['Image.I0.Stream'])
+    assert sim.stats['requests'] == before + 1
+
+
+def test_one_digest_challenge_per_camera(simulator):
+    sim = simulator(5)
+    cameras = [connect(sim, index) for index in range(5)]
+
+    details = [camera.get_configuration_details() for camera in cameras]
+    for camera in cameras:
+        camera.get_configuration_details()
+
+    assert all(details)
+    assert sim.stats['auth_challenges'] == 5
+
+
+def test_async_client_takes_one_digest_challenge_per_camera(simulator):
+    pytest.importorskip('httpx')
+    from AxisPy.async_camera import AsyncAxisConfigure
+
+    sim = simulator(5)
+
+    async def read_all():
+        cameras = [AsyncAxisConfigure(device['ip'], port=device['port'], timeout=5) for device in sim.devices]
+        try:
+            return await asyncio.gather(*(camera.get_configuration_details() for camera in cameras))
+        finally:
+            for camera in cameras:
+                await camera.close()
+
+    assert all(asyncio.run(read_all()))
+    assert sim.stats['auth_challenges'] == 5
+
+
+def test_breaker_opens_after_failures_in_a_row(simulator):
+    sim = simulator(failure_rate=1.0, failure_mode='reset')
+    camera = connect(sim, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            camera.get_time_zone()
+    reached = sim.stats['requests']
+
+    with pytest.raises(CameraUnavailable):
+        camera.get_time_zone()
+    assert sim.stats['requests'] == reached
+
+
+def test_async_open_breaker_is_an_httpx_transport_error(simulator):
+    httpx = pytest.importorskip('httpx')
+    from AxisPy.async_camera import AsyncAxisConfigure
+
+    sim = simulator(failure_rate=1.0, failure_mode='reset')
+    device = sim.devices[0]
+
+    async def read_time_zone():
+        async with AsyncAxisConfigure(device['ip'], port=device['port'], timeout=5, failure_threshold=2,
+                                      reset_timeout=60) as camera:
+            for _ in range(2):
+                with pytest.raises(httpx.TransportError):
+                    await camera.get_time_zone()
+            reached = sim.stats['requests']
+            with pytest.raises(httpx.TransportError) as raised:
+                await camera.get_time_zone()
+            assert sim.stats['requests'] == reached
+            return raised.value
+
+    error = asyncio.run(read_time_zone())
+    assert isinstance(error, CameraUnavailable)
+    assert error.request.url.path == '/axis-cgi/time.cgi'
+
+
+def test_rollout_upgrades_every_camera(simulator, tmp_path):
+    sim = simulator(4, reboot_duration=0.2)
+    image = tmp_path / 'firmware.bin'
+    image.write_bytes(bytes(range(256)) * 1024)
+
+    with AxisFleet(sim.devices, timeout=5) as fleet:
+        results = FirmwareRollout(fleet, image, version='11.11.74', window=2, max_waits=2,
+                                  poll_interval=0.1, ready_timeout=30).run_all()
+
+    assert {result.value for result in results.values()} == {'11.11.74'}
+    assert all(result.ok for result in results.values())
+    assert sim.stats['upgrades'] == 4
+    assert all(camera.version == '11.11.74' for camera in sim.cameras)
+
+
+def test_readiness_polls_dont_open_the_breaker(simulator):
+    sim = simulator(reboot_duration=2)
+    camera = connect(sim, failure_threshold=2, reset_timeout=60)
+
+    assert camera.restart(wait=True, deadline=30)
+    assert sim.stats['restarts'] == 1
+    assert camera.get_time_zone() is not None
+
+
+def test_stop_ends_connections_held_by_hanging_cameras(simulator, caplog):
+    sim = simulator(2, failure_rate=1.0, failure_mode='hang')
+    for index in range(2):
+        with pytest.raises(requests.Timeout):
+            connect(sim, index, timeout=0.2).get_time_zone()
+
+    with caplog.at_level(logging.ERROR, logger='asyncio'):
+        sim.stop_thread()
+        gc.collect()
+    assert not caplog.records
+
+
+def test_wait_until_ready_keeps_to_a_short_deadline(simulator):
+    sim = simulator(failure_rate=1.0, failure_mode='hang')
+    camera = connect(sim, timeout=0.5)
+
+    started = time.monotonic()
+    assert not camera.wait_until_ready(deadline=0.6)
+    assert time.monotonic() - started < 0.9
+
+
+
+def test_upload_sends_the_image_once(simulator, tmp_path):
+    sim = simulator(2, reboot_duration=0.2)
+    image = tmp_path / 'firmware.bin'
+    image.write_bytes(bytes(1024 * 1024))
+
+    # A fresh camera gets its challenge from a small status request, not the image
+    fresh = connect(sim, 0)
+    assert fresh.upgrade_firmware(image).status_code == 200
+    assert sim.cameras[0].stats['requests'] == 3
+    assert sim.cameras[0].stats['auth_challenges'] == 1
+
+    # With the challenge already taken the image goes out straight away
+    known = connect(sim, 1)
+    known.get_time_zone()
+    before = sim.cameras[1].stats['requests']
+    assert known.upgrade_firmware(image).status_code == 200
+    assert sim.cameras[1].stats['requests'] - before == 1
+    assert sim.stats['upgrades'] == 2
@@ -0,0 +1,31 @@
+import socket
+
+import pytest
+
+pytest.importorskip('httpx')
+
+from AxisPy.sweep import sweep_axis_devices  # noqa: E402
+
+
+def ipv6_loopback():
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as s:
+            s.bind(('::1', 0))
+    except OSError:
+        return False
+    return True
+
+
+def test_sweep_finds_the_simulated_cameras(simulator):
+    sim = simulator()
+    device = sim.devices[0]
+    found = sweep_axis_devices('127.0.0.1/32', port=device['port'], connect_timeout=2, timeout=5)
+    assert found == {f'AXIS Q1656 - {sim.cameras[0].serial}': '127.0.0.1'}
+
+
+@pytest.mark.skipif(not ipv6_loopback(), reason="no IPv6 loopback")
+def test_sweep_keeps_ipv6_addresses(simulator):
+    sim = simulator(host='::1')
+    device = sim.devices[0]
+    found = sweep_axis_devices('::1/128', port=device['port'], connect_timeout=2, timeout=5)
+    assert list(found.values()) == ['::1']
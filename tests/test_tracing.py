@@ -0,0 +1,123 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from AxisPy.camera import AxisConfigure, create_session
+from AxisPy.tracing import Tracer, current_span, record_phase
+
+
+def read_trace(path):
+    with open(path) as f:
+        events = json.load(f)
+    for event in events:
+        assert event['ph'] == 'X'
+        assert event['dur'] >= 0
+        assert {'name', 'cat', 'pid', 'tid', 'ts', 'args'} <= event.keys()
+    return events
+
+
+def children(events, parent):
+    return [event for event in events if event['args']['parent_id'] == parent['args']['span_id']]
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    # Answers every GET the way a forwarding proxy would after reaching the camera
+    def do_GET(self):
+        content = json.dumps({'proxied': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def proxy_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ProxyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def test_spans_nest_and_export_as_chrome_trace(tmp_path):
+    path = tmp_path / 'trace.json'
+    with Tracer(str(path), sample_rate=1) as tracer:
+        with tracer.span('outer', camera='10.0.0.1') as outer:
+            assert current_span() is outer
+            with tracer.span('inner', 'http') as inner:
+                record_phase('server', inner.start)
+        assert current_span() is None
+
+    events = read_trace(path)
+    assert [event['name'] for event in events] == ['server', 'inner', 'outer']
+    phase, inner, outer = events
+    assert outer['args']['parent_id'] is None
+    assert outer['args']['camera'] == '10.0.0.1'
+    assert children(events, outer) == [inner]
+    assert children(events, inner) == [phase]
+    assert (phase['cat'], inner['cat'], outer['cat']) == ('phase', 'http', 'method')
+    assert outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+
+
+def test_errors_are_recorded_on_the_span(tmp_path):
+    path = tmp_path / 'trace.json'
+    with Tracer(str(path), sample_rate=1) as tracer:
+        with pytest.raises(ValueError):
+            with tracer.span('failing'):
+                raise ValueError("bad reply")
+
+    [event] = read_trace(path)
+    assert event['args']['error'] == "ValueError('bad reply')"
+
+
+def test_unsampled_calls_write_nothing(tmp_path):
+    path = tmp_path / 'trace.json'
+    with Tracer(str(path), sample_rate=0) as tracer:
+        with tracer.span('outer') as outer:
+            with tracer.span('inner') as inner:
+                record_phase('server', 0)
+        assert outer is None and inner is None
+    assert not path.exists()
+
+
+def test_camera_calls_record_attempts_and_phases(simulator, tmp_path):
+    sim = simulator()
+    device = sim.devices[0]
+    path = tmp_path / 'trace.json'
+    with Tracer(str(path), sample_rate=1) as tracer:
+        camera = AxisConfigure(device['ip'], port=device['port'], timeout=5, tracer=tracer)
+        camera.get_time_zone()
+
+    events = read_trace(path)
+    [method] = [event for event in events if event['args']['parent_id'] is None]
+    assert method['name'] == 'get_time_zone'
+    # Public methods built on other public methods nest their spans
+    [inner] = children(events, method)
+    assert (inner['name'], inner['cat']) == ('get_date_time', 'method')
+    [attempt] = children(events, inner)
+    assert (attempt['name'], attempt['cat']) == ('POST time.cgi', 'http')
+    # The digest challenge and the authorized retry both happen inside the one attempt
+    assert [phase['name'] for phase in children(events, attempt)] == ['connect', 'send', 'auth challenge',
+                                                                     'send', 'server']
+
+
+def test_proxied_requests_record_phases(proxy_server, tmp_path):
+    path = tmp_path / 'trace.json'
+    proxy = 'http://{}:{}'.format(*proxy_server)
+    session = create_session(1)
+    with Tracer(str(path), sample_rate=1) as tracer:
+        with tracer.span('request', 'http'):
+            response = session.get('http://camera.invalid/axis-cgi/time.cgi', proxies={'http': proxy},
+                                   timeout=5)
+    session.close()
+
+    assert response.json() == {'proxied': 'http://camera.invalid/axis-cgi/time.cgi'}
+    events = read_trace(path)
+    assert [event['name'] for event in events] == ['connect', 'send', 'server', 'request']
+    assert events[0]['args']['host'] == '127.0.0.1'
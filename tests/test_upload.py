@@ -0,0 +1,101 @@
+import asyncio
+import email.parser
+import json
+import mmap
+import os
+
+import pytest
+
+from AxisPy.upload import AsyncMultipartFileBody, MultipartFileBody
+
+IMAGE = bytes(range(256)) * 300
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / 'M3106_11_11_73.bin'
+    path.write_bytes(IMAGE)
+    return path
+
+
+def parse_parts(body):
+    # Parse the multipart body the way a server would
+    message = email.parser.BytesParser().parsebytes(
+        f"Content-Type: {body.content_type}\r\n\r\n".encode() + body.read())
+    return {part.get_param('name', header='Content-Disposition'): part for part in message.get_payload()}
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_body_from_a_path(image_path, use_mmap):
+    with MultipartFileBody(image_path, {'data': {'method': 'upgrade'}}, use_mmap=use_mmap) as body:
+        length = len(body)
+        parts = parse_parts(body)
+        assert body.tell() == length
+
+    assert json.loads(parts['data'].get_payload()) == {'method': 'upgrade'}
+    assert parts['fileData'].get_filename() == 'M3106_11_11_73.bin'
+    assert parts['fileData'].get_payload(decode=True) == IMAGE
+
+
+def test_body_from_a_shared_mmap_leaves_it_open(image_path):
+    with open(image_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+        with MultipartFileBody(image, filename='image.bin') as body:
+            assert parse_parts(body)['fileData'].get_payload(decode=True) == IMAGE
+        assert image[:4] == IMAGE[:4]
+
+
+def test_length_matches_what_is_sent(image_path):
+    with MultipartFileBody(image_path, {'data': {}}) as body:
+        assert len(body) == len(body.read())
+        assert body.read() == b''
+
+
+def test_seek_and_tell(image_path):
+    with MultipartFileBody(image_path) as body:
+        whole = body.read()
+        assert body.seek(0) == 0
+        assert body.tell() == 0
+        assert body.seek(-10, os.SEEK_END) == len(body) - 10
+        assert body.read() == whole[-10:]
+        assert body.seek(100) == 100
+        assert body.seek(50, os.SEEK_CUR) == 150
+        assert body.read(20) == whole[150:170]
+        # Out of range positions are clamped to the body
+        assert body.seek(-1) == 0
+        assert body.seek(len(body) + 100) == len(body)
+
+
+def test_iteration_reads_a_chunk_at_a_time(image_path):
+    with MultipartFileBody(image_path, chunk_size=4096) as body:
+        chunks = list(body)
+        assert all(len(chunk) <= 4096 for chunk in chunks)
+        body.seek(0)
+        assert b''.join(chunks) == body.read()
+
+
+def test_progress_reports_every_chunk_and_restarts_on_rewind(image_path):
+    calls = list()
+    with MultipartFileBody(image_path, chunk_size=8192, progress=lambda *args: calls.append(args)) as body:
+        total = len(body)
+        list(body)
+        sent = [call[0] for call in calls]
+        assert sent == sorted(sent)
+        assert sent[-1] == total
+        assert all(call[1] == total and call[2] >= 0 for call in calls)
+
+        # A digest retry sends the body again from the start
+        calls.clear()
+        body.seek(0)
+        body.read(100)
+        assert calls == [(100, total, calls[0][2])]
+
+
+def test_async_view_starts_over_on_every_iteration(image_path):
+    async def collect(body):
+        return b''.join([chunk async for chunk in body])
+
+    with MultipartFileBody(image_path) as body:
+        async_body = AsyncMultipartFileBody(body)
+        first = asyncio.run(collect(async_body))
+        assert len(first) == len(body)
+        assert asyncio.run(collect(async_body)) == first